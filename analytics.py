@@ -0,0 +1,398 @@
+# Analiza szeregów czasowych stacji (NumPy)
+# analytics.py
+#
+# Pomiary z okresu retencji trzymane są w pamięci jako tablica (parametr, stacja, godzina)
+# z NaN w miejscu brakujących pomiarów. Wszystkie obliczenia wykonywane są naraz
+# dla wszystkich wybranych stacji i parametrów.
+
+import logging
+import threading
+import time
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from columnar import ColdStore
+from config import DEFAULT_TEMPERATURE_COLOR, Config
+from database import MEASUREMENT_COLUMNS, DatabaseManager
+from metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+WIND_SECTORS = (
+    "N", "NNE", "NE", "ENE", "E", "ESE", "SE", "SSE",
+    "S", "SSW", "SW", "WSW", "W", "WNW", "NW", "NNW"
+)
+# Dolne granice przedziałów prędkości wiatru (m/s)
+WIND_SPEED_BINS = (0, 2, 4, 6, 8, 10)
+DEFAULT_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Pola pochodne dodawane do rekordów na żądanie (derived=true)
+DERIVED_FIELDS = ("kierunek_wiatru_nazwa", "kolor_temperatury")
+
+# Tablice Config z dodatkową pozycją dla wartości nieprawidłowych (ostatni indeks)
+_WIND_DIRECTION_NAMES = np.array(Config.WIND_DIRECTION_TABLE + ("N/A",), dtype=object)
+_TEMPERATURE_COLORS = np.array(Config.TEMPERATURE_COLOR_TABLE + (DEFAULT_TEMPERATURE_COLOR,), dtype=object)
+
+
+class SeriesBlock(NamedTuple):
+    """Wycinek danych: values[parametr, stacja, godzina], godziny od start_hour co 1 h"""
+    station_ids: List[str]
+    parameters: List[str]
+    start_hour: int
+    values: np.ndarray
+
+    @property
+    def hours(self) -> np.ndarray:
+        return np.arange(self.start_hour, self.start_hour + self.values.shape[-1], dtype=np.int64)
+
+    def timestamps(self) -> List[str]:
+        return self.hours.astype("datetime64[h]").astype("datetime64[s]").astype(str).tolist()
+
+
+class SeriesStore:
+    """Pomiary z ostatnich `days` dni w pamięci, uzupełniane przyrostowo po zapisie nowych danych
+
+    Zmiany wykrywane są po wersji danych w bazie (także zapisane przez inny proces);
+    wczytywane są ponownie tylko godziny od najwcześniejszej zmienionej. Tablica zawiera
+    zapisane wartości niezależnie od qc_flags - także oznaczone jako skok (wartości spoza
+    zakresu są w bazie jako NULL, więc tu jako NaN).
+    """
+
+    def __init__(self, db_manager: DatabaseManager, days: int = Config.DATA_RETENTION_DAYS,
+                 check_interval: float = Config.CHANGE_POLL_INTERVAL,
+                 cold_store: Optional[ColdStore] = None):
+        self.db_manager = db_manager
+        # Okresy dłuższe niż `days` czytane są na żądanie z archiwum kolumnowego
+        self.cold_store = cold_store
+        self.days = days
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._block: Optional[SeriesBlock] = None
+        self._generation: Optional[int] = None
+        self._checked_at = 0.0
+        self.full_loads = 0
+        self.partial_loads = 0
+
+    def block(self) -> SeriesBlock:
+        """Aktualny blok danych (tablice nie są później modyfikowane - można je czytać bez blokady)"""
+        with self._lock:
+            now = time.monotonic()
+            if self._block is None or now - self._checked_at >= self.check_interval:
+                self._checked_at = now
+                CACHE_REQUESTS.inc("analytics", self._refresh())
+            else:
+                CACHE_REQUESTS.inc("analytics", "hit")
+            return self._block
+
+    def _refresh(self) -> str:
+        """Wczytuje zmienione godziny; zwraca rodzaj odczytu: hit, partial lub miss (pełne wczytanie)"""
+        generation, _ = self.db_manager.get_data_version()
+        if self._block is not None and generation == self._generation:
+            return "hit"
+        end_hour = int(time.time()) // 3600
+        start_hour = end_hour - self.days * 24 + 1
+
+        if self._block is None or self._generation is None:
+            changed_from = start_hour
+            self.full_loads += 1
+            result = "miss"
+        else:
+            changed_from = max(self.db_manager.get_changed_from(self._generation), start_hour)
+            self.partial_loads += 1
+            result = "partial"
+
+        started = time.perf_counter()
+        station_ids, rows = self._load(changed_from)
+        self._block = self._merge(station_ids, rows, start_hour, end_hour, changed_from)
+        self._generation = generation
+        logger.info(
+            f"Wczytano dane analityczne od godziny {changed_from} "
+            f"({sum(len(station_rows) for station_rows in rows.values())} rekordów, "
+            f"{time.perf_counter() - started:.2f} s)"
+        )
+        return result
+
+    def _load(self, since_hour: int, until_hour: Optional[int] = None):
+        """Surowe wiersze (observed_at, parametry...) jako tablice NumPy, osobno dla każdej stacji"""
+        rows = {}
+        until_hour = until_hour if until_hour is not None else 2 ** 62
+        with self.db_manager.pool.reader() as conn:
+            station_ids = [row[0] for row in conn.execute("SELECT id_stacji FROM stations ORDER BY id_stacji")]
+            cursor = conn.cursor()
+            cursor.row_factory = None
+            for station_id in station_ids:
+                fetched = cursor.execute(f'''
+                    SELECT observed_at, {", ".join(MEASUREMENT_COLUMNS)}
+                    FROM weather_data
+                    WHERE id_stacji = ? AND observed_at >= ? AND observed_at < ?
+                ''', (station_id, since_hour, until_hour)).fetchall()
+                if fetched:
+                    rows[station_id] = np.array(fetched, dtype=np.float64)
+        return station_ids, rows
+
+    def _merge(self, station_ids: List[str], rows: Dict[str, np.ndarray],
+               start_hour: int, end_hour: int, changed_from: int) -> SeriesBlock:
+        """Nowa tablica: niezmienione godziny z poprzedniego bloku + świeżo wczytane wiersze"""
+        hours = end_hour - start_hour + 1
+        # float32 - dwukrotnie mniej pamięci; obliczenia i tak wykonywane są w float64
+        values = np.full((len(MEASUREMENT_COLUMNS), len(station_ids), hours), np.nan, dtype=np.float32)
+
+        previous = self._block
+        if previous is not None:
+            keep_until = min(changed_from, previous.start_hour + previous.values.shape[-1]) - start_hour
+            offset = previous.start_hour - start_hour
+            if keep_until > 0:
+                old_index = {station_id: i for i, station_id in enumerate(previous.station_ids)}
+                src_from = max(0, -offset)
+                dst_from = max(0, offset)
+                length = keep_until - dst_from
+                if length > 0:
+                    for i, station_id in enumerate(station_ids):
+                        j = old_index.get(station_id)
+                        if j is not None:
+                            values[:, i, dst_from:dst_from + length] = \
+                                previous.values[:, j, src_from:src_from + length]
+
+        self._scatter(values, station_ids, rows, start_hour)
+        return SeriesBlock(station_ids, list(MEASUREMENT_COLUMNS), start_hour, values)
+
+    @staticmethod
+    def _scatter(values: np.ndarray, station_ids: Sequence[str], rows: Dict[str, np.ndarray], start_hour: int):
+        """Wpisuje wiersze _load do tablicy values[parametr, stacja, godzina - start_hour]"""
+        hours = values.shape[-1]
+        for i, station_id in enumerate(station_ids):
+            station_rows = rows.get(station_id)
+            if station_rows is None:
+                continue
+            positions = station_rows[:, 0].astype(np.int64) - start_hour
+            inside = (positions >= 0) & (positions < hours)
+            values[:, i, positions[inside]] = station_rows[inside, 1:].T
+
+    def _older(self, start_hour: int, end_hour: int, station_ids: List[str]) -> np.ndarray:
+        """Godziny sprzed bloku w pamięci: archiwum kolumnowe, a od jego granicy SQLite"""
+        values = np.full((len(MEASUREMENT_COLUMNS), len(station_ids), end_hour - start_hour), np.nan, dtype=np.float32)
+        boundary = self.cold_store.boundary_hour() or start_hour
+        if boundary > start_hour:
+            self.cold_store.fill_series(values, start_hour, min(boundary, end_hour), station_ids)
+        if boundary < end_hour:
+            _, rows = self._load(max(boundary, start_hour), end_hour)
+            self._scatter(values, station_ids, rows, start_hour)
+        return values
+
+    def select(self, days: int, stations: Optional[Sequence[str]] = None,
+               parameters: Optional[Sequence[str]] = None) -> SeriesBlock:
+        """Wycinek ostatnich `days` dni dla wybranych stacji i parametrów (kopia w float64)"""
+        block = self.block()
+        hours = min(days * 24, block.values.shape[-1])
+        older = days * 24 - hours if self.cold_store is not None and self.cold_store.enabled else 0
+        station_index = list(range(len(block.station_ids)))
+        if stations:
+            wanted = set(stations)
+            station_index = [i for i, station_id in enumerate(block.station_ids) if station_id in wanted]
+        parameter_index = list(range(len(block.parameters)))
+        if parameters:
+            parameter_index = [block.parameters.index(parameter) for parameter in parameters]
+
+        values = block.values[np.ix_(parameter_index, station_index)][..., -hours:] if hours else \
+            np.empty((len(parameter_index), len(station_index), 0), dtype=np.float32)
+        station_ids = [block.station_ids[i] for i in station_index]
+        if older > 0:
+            previous = self._older(block.start_hour - older, block.start_hour, station_ids)
+            values = np.concatenate([previous[parameter_index], values], axis=-1)
+        return SeriesBlock(
+            station_ids,
+            [block.parameters[i] for i in parameter_index],
+            block.start_hour + block.values.shape[-1] - hours - older,
+            values.astype(np.float64)
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            block = self._block
+            return {
+                "loaded": block is not None,
+                "memory_bytes": int(block.values.nbytes) if block is not None else 0,
+                "full_loads": self.full_loads,
+                "partial_loads": self.partial_loads
+            }
+
+
+def rolling_mean(values: np.ndarray, window: int, min_periods: Optional[int] = None) -> np.ndarray:
+    """Średnia krocząca z `window` ostatnich godzin wzdłuż ostatniej osi (z pominięciem NaN)"""
+    min_periods = max(1, window // 2) if min_periods is None else min_periods
+    valid = ~np.isnan(values)
+    zeros = np.zeros(values.shape[:-1] + (1,))
+    sums = np.concatenate([zeros, np.cumsum(np.where(valid, values, 0.0), axis=-1)], axis=-1)
+    counts = np.concatenate([zeros, np.cumsum(valid, axis=-1)], axis=-1)
+
+    upper = np.arange(1, values.shape[-1] + 1)
+    lower = np.maximum(upper - window, 0)
+    window_sums = sums[..., upper] - sums[..., lower]
+    window_counts = counts[..., upper] - counts[..., lower]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(window_counts >= min_periods, window_sums / window_counts, np.nan)
+
+
+def climatology_groups(hours: np.ndarray) -> np.ndarray:
+    """Numer grupy klimatologicznej (miesiąc * 24 + godzina UTC) dla każdej godziny"""
+    months = hours.astype("datetime64[h]").astype("datetime64[M]").astype(np.int64) % 12
+    return months * 24 + hours % 24
+
+
+def climatology(values: np.ndarray, hours: np.ndarray) -> np.ndarray:
+    """Średnia dla każdego miesiąca i godziny doby: wynik (..., 12 * 24)"""
+    groups = climatology_groups(hours)
+    group_count = 12 * 24
+    flat = values.reshape(-1, values.shape[-1])
+    valid = ~np.isnan(flat)
+    # Jeden bincount dla wszystkich szeregów: numer szeregu * liczba grup + grupa
+    index = (np.arange(flat.shape[0])[:, None] * group_count + groups[None, :])
+    sums = np.bincount(index[valid], weights=flat[valid], minlength=flat.shape[0] * group_count)
+    counts = np.bincount(index[valid], minlength=flat.shape[0] * group_count)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = sums / counts
+    return means.reshape(values.shape[:-1] + (group_count,))
+
+
+def anomalies(values: np.ndarray, hours: np.ndarray, baseline: np.ndarray) -> np.ndarray:
+    """Odchylenie od średniej klimatologicznej (wynik climatology) dla tej samej pory roku i doby"""
+    return values - baseline[..., climatology_groups(hours)]
+
+
+def trend_per_day(values: np.ndarray, hours: np.ndarray) -> np.ndarray:
+    """Nachylenie prostej najmniejszych kwadratów (jednostka parametru na dobę)"""
+    valid = ~np.isnan(values)
+    filled = np.where(valid, values, 0.0)
+    days = (hours - hours[0]) / 24.0
+    n = valid.sum(axis=-1)
+    sum_t = (valid * days).sum(axis=-1)
+    sum_x = filled.sum(axis=-1)
+    sum_tt = (valid * days ** 2).sum(axis=-1)
+    sum_tx = (filled * days).sum(axis=-1)
+    denominator = n * sum_tt - sum_t ** 2
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(denominator > 0, (n * sum_tx - sum_t * sum_x) / denominator, np.nan)
+
+
+def percentiles(values: np.ndarray, qs: Sequence[float]) -> np.ndarray:
+    """Percentyle (interpolacja liniowa) z pominięciem NaN: wynik (..., len(qs))
+
+    Jedno sortowanie dla wszystkich szeregów zamiast np.nanpercentile liczonego wierszami.
+    """
+    ordered = np.sort(values, axis=-1)  # NaN trafiają na koniec
+    n = (~np.isnan(values)).sum(axis=-1, keepdims=True)
+    positions = np.asarray(qs, dtype=np.float64) / 100.0 * np.maximum(n - 1, 0)
+    lower = np.floor(positions).astype(np.int64)
+    upper = np.minimum(lower + 1, np.maximum(n - 1, 0))
+    fraction = positions - lower
+    low_values = np.take_along_axis(ordered, lower, axis=-1)
+    high_values = np.take_along_axis(ordered, upper, axis=-1)
+    result = low_values + (high_values - low_values) * fraction
+    return np.where(n > 0, result, np.nan)
+
+
+def summary(block: SeriesBlock, qs: Sequence[float] = DEFAULT_PERCENTILES) -> Dict[str, np.ndarray]:
+    """Statystyki opisowe każdego szeregu (parametr, stacja)"""
+    values = block.values
+    valid = ~np.isnan(values)
+    count = valid.sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(valid, values, 0.0).sum(axis=-1) / count
+        deviation = np.where(valid, values - mean[..., None], 0.0)
+        std = np.sqrt((deviation ** 2).sum(axis=-1) / count)
+    empty = count == 0
+    return {
+        "count": count,
+        "mean": mean,
+        "std": std,
+        "min": np.where(empty, np.nan, np.where(valid, values, np.inf).min(axis=-1)),
+        "max": np.where(empty, np.nan, np.where(valid, values, -np.inf).max(axis=-1)),
+        "percentiles": percentiles(values, qs),
+        "trend_per_day": trend_per_day(values, block.hours)
+    }
+
+
+def wind_rose(direction: np.ndarray, speed: np.ndarray,
+              speed_bins: Sequence[float] = WIND_SPEED_BINS):
+    """Histogram kierunku (16 sektorów) i prędkości wiatru dla każdej stacji
+
+    direction, speed: (stacja, godzina). Zwraca (counts[stacja, sektor, przedział], calm[stacja]).
+    Cisza (prędkość 0) liczona jest osobno.
+    """
+    stations = direction.shape[0]
+    sectors = len(WIND_SECTORS)
+    bins = len(speed_bins)
+    valid = ~np.isnan(direction) & ~np.isnan(speed)
+    calm = (valid & (speed == 0)).sum(axis=-1)
+    moving = valid & (speed > 0)
+
+    sector = ((np.where(moving, direction, 0.0) % 360 + 11.25) // 22.5).astype(np.int64) % sectors
+    speed_bin = np.clip(np.searchsorted(speed_bins, np.where(moving, speed, 0.0), side="right") - 1, 0, bins - 1)
+    index = (np.arange(stations)[:, None] * sectors + sector) * bins + speed_bin
+    counts = np.bincount(index[moving], minlength=stations * sectors * bins)
+    return counts.reshape(stations, sectors, bins), calm
+
+
+def to_json_values(values: np.ndarray, decimals: int = 2) -> list:
+    """Lista liczb zaokrąglonych do `decimals` miejsc; NaN zamieniane na None"""
+    # + 0.0 zamienia -0.0 na 0.0
+    rounded = (np.round(values, decimals) + 0.0).astype(object)
+    rounded[np.isnan(values)] = None
+    return rounded.tolist()
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def as_float_array(values) -> np.ndarray:
+    """Tablica float64 z liczb, tekstów (jak w bazie) lub None; wartości nieliczbowe jako NaN"""
+    if isinstance(values, np.ndarray) and values.dtype.kind in "fiu":
+        return values.astype(np.float64, copy=False)
+    values = list(values)
+    return np.fromiter((_to_float(value) for value in values), dtype=np.float64, count=len(values))
+
+
+def wind_direction_names(degrees) -> np.ndarray:
+    """Wektorowa wersja Config.get_wind_direction_name - tablica nazw kierunków"""
+    deg = as_float_array(degrees)
+    valid = np.isfinite(deg)
+    index = np.clip(np.trunc(np.where(valid, deg, 0.0)), 0, 360).astype(np.intp)
+    index[~valid] = len(_WIND_DIRECTION_NAMES) - 1
+    return _WIND_DIRECTION_NAMES[index]
+
+
+def temperature_colors(temperatures) -> np.ndarray:
+    """Wektorowa wersja Config.get_temperature_color - tablica kolorów"""
+    offset = np.floor(as_float_array(temperatures)) - Config.TEMPERATURE_COLOR_OFFSET
+    outside = len(_TEMPERATURE_COLORS) - 1
+    valid = (offset >= 0) & (offset < outside)
+    index = np.where(valid, offset, outside).astype(np.intp)
+    return _TEMPERATURE_COLORS[index]
+
+
+def add_derived_fields(records: List[dict]) -> List[dict]:
+    """Dodaje do rekordów nazwę kierunku wiatru i kolor temperatury (w miejscu)"""
+    if not records:
+        return records
+    names = wind_direction_names([record.get("kierunek_wiatru") for record in records]).tolist()
+    colors = temperature_colors([record.get("temperatura") for record in records]).tolist()
+    for record, name, color in zip(records, names, colors):
+        record["kierunek_wiatru_nazwa"] = name
+        record["kolor_temperatury"] = color
+    return records
+
+
+def iter_with_derived_fields(records: Iterable[dict], batch_size: int = 1000) -> Iterator[dict]:
+    """add_derived_fields dla strumienia rekordów, paczkami po `batch_size`"""
+    records = iter(records)
+    while True:
+        batch = list(islice(records, batch_size))
+        if not batch:
+            return
+        yield from add_derived_fields(batch)
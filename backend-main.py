@@ -1,33 +1,63 @@
 # Backend aplikacji IMGW - FastAPI + SQLite
 # main.py
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+import time
+
+# Początek importu modułu - raportowany jako etap startu "import"
+IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, FileResponse, PlainTextResponse, Response, StreamingResponse
 import sqlite3
-import requests
+import csv
+import io
+import gzip
+import hashlib
 import json
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import logging
 import asyncio
 import os
-from typing import List, Optional
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Union
 from pydantic import BaseModel
-import schedule
-import time
 import threading
 
-# Konfiguracja logowania
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('weather_app.log'),
-        logging.StreamHandler()
-    ]
+try:
+    import orjson
+except ImportError:  # serializacja przez json ze standardowej biblioteki
+    orjson = None
+
+from config import Config, Constants
+from database import (
+    AGGREGATE_RESOLUTIONS, MEASUREMENT_COLUMNS, DatabaseManager, decode_cursor, encode_cursor
 )
+import analytics
+import metrics
+from metrics import CACHE_REQUESTS, SERIALIZATION_SECONDS, MetricsMiddleware
+from analytics import SeriesStore
+from columnar import ColdStore
+from stations import StationDirectory
+from broadcast import WeatherBroadcaster
+from fetcher import WeatherDataFetcher
+from ingest import IngestService, request_refresh
+from maintenance import MaintenanceJob
+from quality import QC_FILTERS, describe_flags
+
 logger = logging.getLogger(__name__)
 
+def configure_logging():
+    """Konfiguracja logowania (przy starcie serwera - sam import modułu nie tworzy pliku logu)"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('weather_app.log'),
+            logging.StreamHandler()
+        ]
+    )
+
 # Modele Pydantic
 class WeatherStation(BaseModel):
     id_stacji: str
@@ -41,233 +71,419 @@ class WeatherStation(BaseModel):
     suma_opadu: Optional[str] = None
     cisnienie: Optional[str] = None
 
+class WeatherStationDerived(WeatherStation):
+    """Pomiar z polami wyliczanymi po stronie serwera (derived=true)"""
+    kierunek_wiatru_nazwa: str
+    kolor_temperatury: str
+
 class WeatherResponse(BaseModel):
     stations: List[WeatherStation]
     total_count: int
     last_update: str
 
+class WeatherDerivedResponse(WeatherResponse):
+    stations: List[WeatherStationDerived]
+
+class HistoricalResponse(WeatherResponse):
+    next_cursor: Optional[str] = None
+
+class HistoricalDerivedResponse(HistoricalResponse):
+    stations: List[WeatherStationDerived]
+
+STATION_FIELDS = tuple(WeatherStation.model_fields)
+STATION_DERIVED_FIELDS = tuple(WeatherStationDerived.model_fields)
+
+def dump_json(value) -> bytes:
+    """JSON w postaci zgodnej z model_dump_json (bez spacji, UTF-8)"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def encode_weather_response(records: List[dict], derived: bool, last_update: str, **extra) -> bytes:
+    """Serializuje WeatherResponse/HistoricalResponse bez tworzenia modelu Pydantic dla każdego pomiaru
+    
+    Rekordy pochodzą z bazy, do której trafiają tylko pomiary sprawdzone przy zapisie (parse_record),
+    więc wystarczy ułożyć pola w kolejności modelu - wynik jest taki sam jak z model_dump_json.
+    Schemat OpenAPI nadal opisują modele podane w response_model.
+    """
+    fields = STATION_DERIVED_FIELDS if derived else STATION_FIELDS
+    stations = [{name: record.get(name) for name in fields} for record in records]
+    return dump_json({"stations": stations, "total_count": len(stations), "last_update": last_update, **extra})
+
+class FlaggedStation(WeatherStation):
+    """Pomiar oznaczony przez kontrolę jakości; qc - parametry według kontroli (range, spike)"""
+    qc_flags: int
+    qc: Dict[str, List[str]]
+
+class QualityResponse(BaseModel):
+    stations: List[FlaggedStation]
+    total_count: int
+
+class AggregateBucket(BaseModel):
+    id_stacji: str
+    parameter: str
+    period: str
+    count: int
+    mean: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    sum: Optional[float] = None
+
+class AggregatesResponse(BaseModel):
+    resolution: str
+    source: str
+    buckets: List[AggregateBucket]
+    total_count: int
+    last_update: str
+
+class SeriesStatistics(BaseModel):
+    id_stacji: str
+    parameter: str
+    count: int
+    mean: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    percentiles: Dict[str, Optional[float]]
+    trend_per_day: Optional[float] = None
+
+class AnalyticsSummaryResponse(BaseModel):
+    days: int
+    statistics: List[SeriesStatistics]
+    total_count: int
+    last_update: str
+
+class TimeSeries(BaseModel):
+    id_stacji: str
+    parameter: str
+    values: List[Optional[float]]
+
+class AnalyticsSeriesResponse(BaseModel):
+    kind: str
+    window: Optional[int] = None
+    timestamps: List[str]
+    series: List[TimeSeries]
+    total_count: int
+    last_update: str
+
+class WindRose(BaseModel):
+    id_stacji: str
+    observations: int
+    calm: int
+    counts: List[List[int]]
+
+class WindRoseResponse(BaseModel):
+    sectors: List[str]
+    speed_bins: List[float]
+    stations: List[WindRose]
+    total_count: int
+    last_update: str
+
+class StationInfo(BaseModel):
+    id_stacji: str
+    stacja: str
+    lat: float
+    lon: float
+    distance_km: Optional[float] = None
+
+class StationsResponse(BaseModel):
+    stations: List[StationInfo]
+    total_count: int
+
+class InterpolationStation(StationInfo):
+    value: float
+
+class InterpolationResponse(BaseModel):
+    lat: float
+    lon: float
+    parameter: str
+    unit: str
+    value: Optional[float]
+    power: float
+    stations: List[InterpolationStation]
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start serwera: baza danych i komponenty, po czym serwer przyjmuje zapytania
+    
+    Aktualizacja schematu i odbudowy tabel pomocniczych (lider), pierwsze pobranie z IMGW
+    i wypełnienie pamięci podręcznych odbywają się w tle - zapytania obsługiwane są od razu
+    na podstawie danych zapisanych w bazie.
+    """
+    global server_loop
+    configure_logging()
+    with startup_phase("database"):
+        open_database()
+    with startup_phase("components"):
+        create_components()
+    server_loop = asyncio.get_running_loop()
+    broadcaster.attach(server_loop)
+    ingest_service.start(run_in_server_loop)
+    threading.Thread(target=prepare_in_background, daemon=True).start()
+    logger.info(
+        "Serwer gotowy: " + ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in startup_phases.items())
+    )
+    yield
+    await broadcaster.close()
+    await data_fetcher.close()
+    db_manager.close()
+
 # FastAPI aplikacja
 app = FastAPI(
     title="IMGW Weather API",
     description="System monitorowania danych meteorologicznych z API IMGW",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
+# Czas i kody odpowiedzi według tras (/metrics); strumień SSE trwa do rozłączenia - tylko liczony
+app.add_middleware(MetricsMiddleware, untimed=("/api/weather/stream",))
 
 # Konfiguracja bazy danych
-DATABASE_PATH = "weather_data.db"
-IMGW_API_URL = "https://danepubliczne.imgw.pl/api/data/synop"
+DATABASE_PATH = Config.DATABASE_PATH
+IMGW_API_URL = Config.IMGW_API_URL
+
+# Pliki frontendu obok modułu (niezależnie od katalogu roboczego)
+FRONTEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "frontend")
+
+# Zakresy zapytań o agregaty (dni)
+AGGREGATES_MAX_DAYS = 3660
+AGGREGATES_MAX_HOURLY_DAYS = 31
+
+# Zapytania o stacje: najwięcej sąsiadów w /nearest i /interpolate
+STATIONS_MAX_NEIGHBOURS = 50
 
-class DatabaseManager:
-    """Klasa do zarządzania bazą danych SQLite"""
+# Analizy: szeregi godzinowe zwracane są dla krótszych okresów niż statystyki
+ANALYTICS_MAX_SERIES_DAYS = 31
+ANALYTICS_MAX_WINDOW = 24 * 30
+
+class CachedResponse(NamedTuple):
+    """Gotowa (zserializowana) odpowiedź wraz z wersją skompresowaną i ETagami obu wariantów"""
+    body: bytes
+    gzip_body: bytes
+    etag: str
+    total_count: int
+
+    @property
+    def gzip_etag(self) -> str:
+        # Inna reprezentacja (Content-Encoding: gzip) - własny silny walidator (RFC 9110, 8.8.3)
+        return f'{self.etag[:-1]}-gz"'
+
+class CurrentWeatherCache:
+    """Pamięć podręczna odpowiedzi /api/weather/current, unieważniana po zapisie nowych danych
     
-    def __init__(self, db_path: str):
-        self.db_path = db_path
-        self.init_database()
+    Zapis w innym procesie wykrywany jest przez numer wersji danych w bazie,
+    sprawdzany nie częściej niż co `check_interval` sekund.
+    """
     
-    def init_database(self):
-        """Inicjalizacja bazy danych i utworzenie tabel"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS weather_data (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        id_stacji TEXT NOT NULL,
-                        stacja TEXT NOT NULL,
-                        data_pomiaru TEXT NOT NULL,
-                        godzina_pomiaru TEXT NOT NULL,
-                        temperatura TEXT,
-                        predkosc_wiatru TEXT,
-                        kierunek_wiatru TEXT,
-                        wilgotnosc_wzgledna TEXT,
-                        suma_opadu TEXT,
-                        cisnienie TEXT,
-                        timestamp_dodania TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        UNIQUE(id_stacji, data_pomiaru, godzina_pomiaru)
-                    )
-                ''')
-                
-                cursor.execute('''
-                    CREATE TABLE IF NOT EXISTS api_logs (
-                        id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        status TEXT,
-                        records_count INTEGER,
-                        error_message TEXT
-                    )
-                ''')
-                
-                conn.commit()
-                logger.info("Baza danych została zainicjalizowana")
-        except Exception as e:
-            logger.error(f"Błąd podczas inicjalizacji bazy danych: {str(e)}")
-    
-    def insert_weather_data(self, data: List[dict]) -> int:
-        """Wstawia dane pogodowe do bazy danych"""
-        inserted_count = 0
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                for record in data:
-                    try:
-                        cursor.execute('''
-                            INSERT OR REPLACE INTO weather_data 
-                            (id_stacji, stacja, data_pomiaru, godzina_pomiaru, 
-                             temperatura, predkosc_wiatru, kierunek_wiatru, 
-                             wilgotnosc_wzgledna, suma_opadu, cisnienie)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        ''', (
-                            record.get('id_stacji'),
-                            record.get('stacja'),
-                            record.get('data_pomiaru'),
-                            record.get('godzina_pomiaru'),
-                            record.get('temperatura'),
-                            record.get('predkosc_wiatru'),
-                            record.get('kierunek_wiatru'),
-                            record.get('wilgotnosc_wzgledna'),
-                            record.get('suma_opadu'),
-                            record.get('cisnienie')
-                        ))
-                        inserted_count += 1
-                    except sqlite3.IntegrityError:
-                        # Rekord już istnieje, pomijamy
-                        continue
-                
-                conn.commit()
-                logger.info(f"Wstawiono {inserted_count} nowych rekordów")
-                
-        except Exception as e:
-            logger.error(f"Błąd podczas wstawiania danych: {str(e)}")
-            
-        return inserted_count
-    
-    def get_latest_data(self, limit: int = 100) -> List[dict]:
-        """Pobiera najnowsze dane pogodowe"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    SELECT * FROM weather_data 
-                    WHERE (id_stacji, data_pomiaru, godzina_pomiaru) IN (
-                        SELECT id_stacji, data_pomiaru, godzina_pomiaru
-                        FROM weather_data
-                        GROUP BY id_stacji
-                        HAVING MAX(data_pomiaru || godzina_pomiaru)
-                    )
-                    ORDER BY stacja
-                    LIMIT ?
-                ''', (limit,))
-                
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
-                
-        except Exception as e:
-            logger.error(f"Błąd podczas pobierania danych: {str(e)}")
-            return []
-    
-    def get_historical_data(self, days_back: int = 7) -> List[dict]:
-        """Pobiera dane historyczne z określonego okresu"""
-        try:
-            start_date = (datetime.now() - timedelta(days=days_back)).strftime('%Y-%m-%d')
-            
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
-                cursor.execute('''
-                    SELECT * FROM weather_data 
-                    WHERE data_pomiaru >= ?
-                    ORDER BY data_pomiaru DESC, godzina_pomiaru DESC
-                ''', (start_date,))
-                
-                rows = cursor.fetchall()
-                return [dict(row) for row in rows]
-                
-        except Exception as e:
-            logger.error(f"Błąd podczas pobierania danych historycznych: {str(e)}")
-            return []
-    
-    def log_api_call(self, status: str, records_count: int = 0, error_message: str = None):
-        """Loguje wywołanie API"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    INSERT INTO api_logs (status, records_count, error_message)
-                    VALUES (?, ?, ?)
-                ''', (status, records_count, error_message))
-                conn.commit()
-        except Exception as e:
-            logger.error(f"Błąd podczas logowania API: {str(e)}")
-
-class WeatherDataFetcher:
-    """Klasa do pobierania danych z API IMGW"""
-    
-    def __init__(self, db_manager: DatabaseManager):
+    def __init__(self, db_manager: DatabaseManager, check_interval: float = Config.CHANGE_POLL_INTERVAL):
         self.db_manager = db_manager
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # Osobna odpowiedź dla wariantu z polami pochodnymi (klucz: derived)
+        self._snapshots: Dict[bool, CachedResponse] = {}
+        self._generation = 0
+        self._data_generation: Optional[int] = None
+        self._checked_at = 0.0
     
-    async def fetch_data_from_imgw(self) -> bool:
-        """Pobiera dane z API IMGW i zapisuje do bazy danych"""
-        try:
-            logger.info("Rozpoczynam pobieranie danych z API IMGW")
-            
-            response = requests.get(IMGW_API_URL, timeout=30)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if not data:
-                logger.warning("Brak danych w odpowiedzi API")
-                self.db_manager.log_api_call("WARNING", 0, "Brak danych w odpowiedzi")
-                return False
-            
-            inserted_count = self.db_manager.insert_weather_data(data)
-            
-            logger.info(f"Pomyślnie pobrano i zapisano {inserted_count} rekordów")
-            self.db_manager.log_api_call("SUCCESS", inserted_count)
-            
-            return True
-            
-        except requests.exceptions.RequestException as e:
-            error_msg = f"Błąd HTTP podczas pobierania danych: {str(e)}"
-            logger.error(error_msg)
-            self.db_manager.log_api_call("ERROR", 0, error_msg)
-            return False
-            
-        except json.JSONDecodeError as e:
-            error_msg = f"Błąd dekodowania JSON: {str(e)}"
-            logger.error(error_msg)
-            self.db_manager.log_api_call("ERROR", 0, error_msg)
-            return False
-            
-        except Exception as e:
-            error_msg = f"Nieoczekiwany błąd: {str(e)}"
-            logger.error(error_msg)
-            self.db_manager.log_api_call("ERROR", 0, error_msg)
-            return False
-
-# Inicjalizacja komponentów
-db_manager = DatabaseManager(DATABASE_PATH)
-data_fetcher = WeatherDataFetcher(db_manager)
-
-# Harmonogram automatycznego pobierania danych
-def schedule_data_fetching():
-    """Funkcja do harmonogramowania pobierania danych"""
-    def run_fetch():
-        asyncio.run(data_fetcher.fetch_data_from_imgw())
-    
-    # Pobieranie danych co godzinę
-    schedule.every().hour.do(run_fetch)
-    
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Sprawdzaj co minutę
-
-# Uruchom harmonogram w osobnym wątku
-threading.Thread(target=schedule_data_fetching, daemon=True).start()
+    def invalidate(self):
+        """Usuwa zapamiętaną odpowiedź - kolejne żądanie odczyta bazę"""
+        with self._lock:
+            self._snapshots = {}
+            self._generation += 1
+    
+    def _check_data_version(self):
+        now = time.monotonic()
+        with self._lock:
+            if not self._snapshots or now - self._checked_at < self.check_interval:
+                return
+            self._checked_at = now
+        data_generation, _ = self.db_manager.get_data_version()
+        with self._lock:
+            if data_generation != self._data_generation:
+                self._snapshots = {}
+                self._generation += 1
+    
+    def get(self, derived: bool = False) -> CachedResponse:
+        """Zwraca zapamiętaną odpowiedź lub buduje nową na podstawie bazy danych"""
+        self._check_data_version()
+        with self._lock:
+            snapshot = self._snapshots.get(derived)
+            if snapshot is not None:
+                CACHE_REQUESTS.inc("current", "hit")
+                return snapshot
+            CACHE_REQUESTS.inc("current", "miss")
+            generation = self._generation
+        
+        data_generation, updated_at = self.db_manager.get_data_version()
+        snapshot = self._build(updated_at, derived)
+        with self._lock:
+            # Nie zapamiętuj pustej odpowiedzi ani takiej, która zdezaktualizowała się w trakcie budowy
+            if snapshot.total_count and generation == self._generation:
+                self._snapshots[derived] = snapshot
+                self._data_generation = data_generation
+                self._checked_at = time.monotonic()
+        return snapshot
+    
+    def _build(self, updated_at: Optional[str] = None, derived: bool = False) -> CachedResponse:
+        data = self.db_manager.get_latest_data()
+        if derived:
+            data = analytics.add_derived_fields(data)
+        # Czas zmiany danych zamiast czasu budowy - wszystkie procesy zwracają te same bajty i ETag
+        with SERIALIZATION_SECONDS.time("current"):
+            body = encode_weather_response(data, derived, updated_at or datetime.now(timezone.utc).isoformat())
+        with SERIALIZATION_SECONDS.time("gzip"):
+            gzip_body = gzip.compress(body, compresslevel=6, mtime=0)
+        return CachedResponse(
+            body=body,
+            gzip_body=gzip_body,
+            etag=f'"{hashlib.sha1(body).hexdigest()}"',
+            total_count=len(data)
+        )
+    
+    def record_not_modified(self):
+        CACHE_REQUESTS.inc("current", "not_modified")
+    
+    def stats(self) -> dict:
+        counts = CACHE_REQUESTS.values()
+        return {
+            "hits": counts.get(("current", "hit"), 0),
+            "misses": counts.get(("current", "miss"), 0),
+            "not_modified": counts.get(("current", "not_modified"), 0)
+        }
+
+def cached_response(request: Request, snapshot: CachedResponse, cache: CurrentWeatherCache) -> Response:
+    """Odpowiedź 304 dla aktualnego ETagu lub gotowe bajty (gzip, jeśli klient go akceptuje)
+    
+    Każdy wariant ma własny ETag; If-None-Match z ETagiem dowolnego z nich oznacza te same dane.
+    """
+    use_gzip = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {
+        "ETag": snapshot.gzip_etag if use_gzip else snapshot.etag,
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding"
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if if_none_match:
+        # Porównanie słabe (RFC 9110, 13.1.2) - prefiks W/ pomijany
+        tags = {tag[2:] if tag.startswith("W/") else tag for tag in map(str.strip, if_none_match.split(","))}
+        if snapshot.etag in tags or snapshot.gzip_etag in tags or "*" in tags:
+            cache.record_not_modified()
+            return Response(status_code=304, headers=headers)
+    
+    if use_gzip:
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+# Komponenty tworzone przy starcie serwera (lifespan), a nie przy imporcie modułu
+db_manager: Optional[DatabaseManager] = None
+current_cache: Optional[CurrentWeatherCache] = None
+broadcaster: Optional[WeatherBroadcaster] = None
+data_fetcher: Optional[WeatherDataFetcher] = None
+cold_store: Optional[ColdStore] = None
+maintenance_job: Optional[MaintenanceJob] = None
+series_store: Optional[SeriesStore] = None
+station_directory: Optional[StationDirectory] = None
+ingest_service: Optional[IngestService] = None
+
+# Czasy etapów startu (sekundy): import, database, components, oczekiwanie na gotową bazę (schema)
+# i rozgrzewka w tle (warmup.*)
+startup_phases: Dict[str, float] = {}
+database_ready = threading.Event()
+warmed_up = threading.Event()
+
+@contextmanager
+def startup_phase(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        startup_phases[name] = round(time.perf_counter() - started, 4)
+
+def open_database():
+    """Baza tylko do odczytu - schemat i zapis przejmuje IngestService, gdy proces zostanie liderem"""
+    global db_manager
+    db_manager = DatabaseManager(DATABASE_PATH, read_only=True)
+
+def create_components():
+    global current_cache, broadcaster, data_fetcher, cold_store, maintenance_job
+    global series_store, station_directory, ingest_service
+    current_cache = CurrentWeatherCache(db_manager)
+    broadcaster = WeatherBroadcaster(db_manager)
+    data_fetcher = WeatherDataFetcher(db_manager, current_cache, broadcaster)
+    # Dane starsze niż okres retencji - z archiwum kolumnowego, jeśli jest włączone (COLD_STORE)
+    cold_store = ColdStore(db_manager)
+    maintenance_job = MaintenanceJob(db_manager, cold_store=cold_store)
+    series_store = SeriesStore(db_manager, cold_store=cold_store)
+    # Współrzędne z pliku stacji zapisuje lider (IngestService) - tu tylko odczyt tabeli stations
+    station_directory = StationDirectory(db_manager)
+    # Pobieranie danych i konserwację wykonuje tylko jeden proces (lider), pozostałe wyłącznie czytają
+    ingest_service = IngestService(db_manager, data_fetcher, maintenance_job)
+
+def prepare_in_background():
+    """Wątek w tle po starcie serwera: oczekiwanie na gotową bazę, potem rozgrzewka
+
+    Schemat i odbudowy tabel pomocniczych wykonuje lider (IngestService) - do ich zakończenia
+    /api/health zwraca status warming_up.
+    """
+    with startup_phase("schema"):
+        while not db_manager.is_ready():
+            time.sleep(Config.CHANGE_POLL_INTERVAL)
+    database_ready.set()
+    if Config.STARTUP_WARMUP:
+        warm_up()
+
+def warm_up():
+    """Wypełnia pamięci podręczne przed pierwszymi zapytaniami (po przygotowaniu bazy)
+
+    Tylko przyspiesza pierwsze zapytania - bez niej (STARTUP_WARMUP=false) każda pamięć
+    wypełniana jest przy pierwszym użyciu.
+    """
+    steps = (
+        ("stations", lambda: station_directory.index()),
+        ("current", lambda: current_cache.get()),
+        ("cold_store", lambda: cold_store.partitions()),
+        ("analytics", lambda: series_store.block()),
+    )
+    with startup_phase("warmup"):
+        for name, step in steps:
+            try:
+                with startup_phase(f"warmup.{name}"):
+                    step()
+            except Exception as e:
+                logger.error(f"Błąd podczas rozgrzewania pamięci podręcznej {name}: {str(e)}")
+    warmed_up.set()
+    logger.info(f"Pamięci podręczne gotowe po {startup_phases['warmup'] * 1000:.0f} ms")
+
+# Stan komponentów odczytywany przy pobraniu /metrics
+metrics.CallbackMetric(
+    "imgw_weather_data_rows", "Liczba wierszy weather_data (tabela row_counts)",
+    lambda: {(): db_manager.count_records()}
+)
+metrics.CallbackMetric(
+    "imgw_stream_subscribers", "Otwarte połączenia strumienia SSE",
+    lambda: {(): broadcaster.stats()["subscribers"]}
+)
+metrics.CallbackMetric(
+    "imgw_startup_phase_seconds", "Czas etapów startu procesu API",
+    lambda: {(phase,): seconds for phase, seconds in startup_phases.items()}, ("phase",)
+)
+
+# Pętla zdarzeń serwera - harmonogram zleca w niej pobieranie, aby współdzielić pulę połączeń HTTP
+server_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def run_in_server_loop(coroutine):
+    """Wykonuje korutynę w pętli serwera - pobieranie współdzieli pulę połączeń HTTP"""
+    if server_loop is not None and server_loop.is_running():
+        return asyncio.run_coroutine_threadsafe(coroutine, server_loop).result()
+    return asyncio.run(_run_and_close_client(coroutine))
+
+async def _run_and_close_client(coroutine):
+    # Pętla jednorazowa (serwer jeszcze nie działa) - klient HTTP zamykany przed jej końcem
+    try:
+        return await coroutine
+    finally:
+        await data_fetcher.close()
 
 # API Endpoints
 
@@ -275,122 +491,546 @@ threading.Thread(target=schedule_data_fetching, daemon=True).start()
 async def read_root():
     """Strona główna - zwraca frontend aplikacji"""
     try:
-        with open("frontend/index.html", "r", encoding="utf-8") as file:
+        with open(os.path.join(FRONTEND_DIR, "index.html"), "r", encoding="utf-8") as file:
             return HTMLResponse(content=file.read())
     except FileNotFoundError:
         return HTMLResponse(content="<h1>Frontend nie został znaleziony</h1>")
 
-@app.get("/api/weather/current", response_model=WeatherResponse)
-async def get_current_weather():
-    """Pobiera aktualne dane pogodowe"""
+@app.get("/api/weather/current", response_model=Union[WeatherResponse, WeatherDerivedResponse])
+async def get_current_weather(request: Request, background_tasks: BackgroundTasks, derived: bool = False):
+    """Pobiera aktualne dane pogodowe
+    
+    - **derived** - dodaje pola `kierunek_wiatru_nazwa` i `kolor_temperatury`
+    """
     try:
-        data = db_manager.get_latest_data()
-        
-        if not data:
-            # Jeśli brak danych w bazie, spróbuj pobrać z API
-            await data_fetcher.fetch_data_from_imgw()
-            data = db_manager.get_latest_data()
+        snapshot = current_cache.get(derived)
         
-        stations = [WeatherStation(**record) for record in data]
+        if not snapshot.total_count and ingest_service.is_leader:
+            # Brak danych w bazie (pierwsze uruchomienie) - pobieranie w tle zamiast czekania
+            # na IMGW; trwające pobranie jest współdzielone, a częstsze ograniczane przez fetcher
+            background_tasks.add_task(data_fetcher.refresh)
         
-        return WeatherResponse(
-            stations=stations,
-            total_count=len(stations),
-            last_update=datetime.now().isoformat()
-        )
+        return cached_response(request, snapshot, current_cache)
     
     except Exception as e:
         logger.error(f"Błąd podczas pobierania aktualnych danych: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/weather/historical")
-async def get_historical_weather(days: int = 7):
-    """Pobiera dane historyczne"""
+@app.get("/api/weather/stream")
+async def stream_weather(request: Request):
+    """Zmiany najnowszych pomiarów w czasie rzeczywistym (Server-Sent Events)
+    
+    Po połączeniu wysyłany jest pełny stan (`snapshot`), a po każdym zapisie nowych danych
+    tylko stacje, które się zmieniły (`delta`). Przy ponownym połączeniu z nagłówkiem
+    `Last-Event-ID` klient otrzymuje pominięte zmiany.
+    """
+    if broadcaster.is_full():
+        raise HTTPException(status_code=503, detail="Osiągnięto limit połączeń strumienia")
+    
+    last_event_id = request.headers.get("last-event-id")
+    return StreamingResponse(
+        broadcaster.subscribe(int(last_event_id) if last_event_id and last_event_id.isdigit() else None),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def parse_history_filters(days: int, stations: Optional[str], parameters: Optional[str],
+                          max_days: Optional[int] = None):
+    """Sprawdza parametry zapytań o dane historyczne; zwraca listy stacji i parametrów"""
+    if max_days is None:
+        # Z archiwum kolumnowego dostępne są także dane starsze niż okres retencji
+        max_days = Config.COLD_STORE_MAX_DAYS if cold_store.enabled else Config.DATA_RETENTION_DAYS
+    if not 1 <= days <= max_days:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Okres musi mieścić się w zakresie 1-{max_days} dni"
+        )
+    station_ids = [item.strip() for item in stations.split(",") if item.strip()] if stations else None
+    parameter_names = [item.strip() for item in parameters.split(",") if item.strip()] if parameters else None
+    if parameter_names:
+        unknown = set(parameter_names) - set(MEASUREMENT_COLUMNS)
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Nieznane parametry: {', '.join(sorted(unknown))}")
+    return station_ids, parameter_names
+
+def parse_qc_filter(qc: str) -> bool:
+    """Filtr kontroli jakości; True - tylko wiersze bez oznaczeń"""
+    if qc not in QC_FILTERS:
+        raise HTTPException(status_code=400, detail=f"Obsługiwane wartości qc: {', '.join(QC_FILTERS)}")
+    return qc == "clean"
+
+def stream_batches(lines: Iterator[str], header: Optional[str] = None, batch_size: int = 1000) -> Iterator[str]:
+    """Łączy linie w większe fragmenty, aby nie przełączać wątku dla każdego wiersza"""
+    batch = [header] if header else []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= batch_size:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+def csv_line(values: list) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(values)
+    return buffer.getvalue()
+
+@app.get("/api/weather/historical", response_model=Union[HistoricalResponse, HistoricalDerivedResponse])
+async def get_historical_weather(days: int = 7, stations: Optional[str] = None,
+                                 parameters: Optional[str] = None, cursor: Optional[str] = None,
+                                 limit: int = Config.MAX_RECORDS_PER_REQUEST, derived: bool = False,
+                                 qc: str = "all"):
+    """Pobiera dane historyczne (stronicowane, od najnowszych)
+    
+    - **stations** - identyfikatory stacji rozdzielone przecinkami
+    - **parameters** - podzbiór parametrów, np. `temperatura,cisnienie`
+    - **cursor** - wartość `next_cursor` z poprzedniej strony
+    - **limit** - rozmiar strony, najwyżej MAX_RECORDS_PER_REQUEST
+    - **derived** - dodaje pola `kierunek_wiatru_nazwa` i `kolor_temperatury`
+    - **qc** - `clean` pomija pomiary oznaczone przez kontrolę jakości (`/api/weather/quality`)
+    """
     try:
-        if days > 30:
-            raise HTTPException(status_code=400, detail="Maksymalny okres to 30 dni")
+        station_ids, parameter_names = parse_history_filters(days, stations, parameters)
+        clean_only = parse_qc_filter(qc)
+        if limit < 1:
+            raise HTTPException(status_code=400, detail="Rozmiar strony musi być dodatni")
+        limit = min(limit, Config.MAX_RECORDS_PER_REQUEST)
+        try:
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        data = db_manager.get_historical_data(days)
-        stations = [WeatherStation(**record) for record in data]
+        data, next_key = cold_store.historical_page(days, station_ids, parameter_names, after, limit, clean_only)
+        if derived:
+            data = analytics.add_derived_fields(data)
+        # Odpowiedź zserializowana od razu (bez walidacji przez response_model), postać jak HistoricalResponse
+        # lub HistoricalDerivedResponse
+        with SERIALIZATION_SECONDS.time("historical"):
+            body = encode_weather_response(
+                data, derived, datetime.now(timezone.utc).isoformat(),
+                next_cursor=encode_cursor(next_key) if next_key else None
+            )
+        return Response(content=body, media_type="application/json")
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Błąd podczas pobierania danych historycznych: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/weather/historical/export")
+async def export_historical_weather(days: int = 7, format: str = "ndjson",
+                                    stations: Optional[str] = None, parameters: Optional[str] = None,
+                                    derived: bool = False, qc: str = "all"):
+    """Strumieniowy eksport danych historycznych (NDJSON lub CSV) w stałej pamięci
+    
+    - **derived** - dodaje pola `kierunek_wiatru_nazwa` i `kolor_temperatury`
+    - **qc** - `clean` pomija pomiary oznaczone przez kontrolę jakości
+    """
+    station_ids, parameter_names = parse_history_filters(days, stations, parameters)
+    clean_only = parse_qc_filter(qc)
+    if format not in ("ndjson", "csv"):
+        raise HTTPException(status_code=400, detail="Obsługiwane formaty: ndjson, csv")
+    
+    records = cold_store.iter_historical_data(days, station_ids, parameter_names, clean_only=clean_only)
+    if derived:
+        records = analytics.iter_with_derived_fields(records)
+    if format == "csv":
+        columns = ["id_stacji", "stacja", "data_pomiaru", "godzina_pomiaru", *(parameter_names or MEASUREMENT_COLUMNS)]
+        if derived:
+            columns.extend(analytics.DERIVED_FIELDS)
+        return StreamingResponse(
+            stream_batches((csv_line([record.get(column) for column in columns]) for record in records),
+                           header=csv_line(columns)),
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="dane_historyczne_{days}d.csv"'}
+        )
+    return StreamingResponse(
+        stream_batches(json.dumps(record, ensure_ascii=False) + "\n" for record in records),
+        media_type="application/x-ndjson"
+    )
+
+@app.get("/api/weather/quality", response_model=QualityResponse)
+async def get_quality_flags(days: int = 7, stations: Optional[str] = None,
+                            limit: int = Config.MAX_RECORDS_PER_REQUEST):
+    """Pomiary oznaczone przez kontrolę jakości przy zapisie (od najnowszych)
+    
+    Wartości spoza Constants.PARAMETER_LIMITS zapisane są jako brak pomiaru (`range`),
+    podejrzane skoki względem poprzedniego pomiaru stacji pozostają (`spike`).
+    Obejmuje dane w bazie SQLite (okres DATA_RETENTION_DAYS).
+    """
+    try:
+        station_ids, _ = parse_history_filters(days, stations, None, max_days=Config.DATA_RETENTION_DAYS)
+        if limit < 1:
+            raise HTTPException(status_code=400, detail="Rozmiar strony musi być dodatni")
+        records = db_manager.get_flagged_records(days, station_ids, min(limit, Config.MAX_RECORDS_PER_REQUEST))
+        return QualityResponse(
+            stations=[FlaggedStation(**record, qc=describe_flags(record["qc_flags"])) for record in records],
+            total_count=len(records)
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Błąd podczas pobierania oznaczeń kontroli jakości: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/weather/aggregates", response_model=AggregatesResponse)
+async def get_weather_aggregates(resolution: str = "day", days: int = 30,
+                                 stations: Optional[str] = None, parameters: Optional[str] = None):
+    """Agregaty per stacja i parametr: liczba pomiarów, średnia, minimum, maksimum, suma
+    
+    - **resolution** - `hour`, `day`, `week`, `month` lub `year`; dane pochodzą z najgrubszej
+      tabeli agregatów, która spełnia rozdzielczość (dni/tygodnie z dziennych, miesiące/lata z miesięcznych)
+    - **stations**, **parameters** - jak w `/api/weather/historical`
+    
+    Agregaty obejmują pomiary oznaczone jako skok przez kontrolę jakości (zapisane wartości);
+    wartości spoza zakresu są zapisane jako brak pomiaru i nie są liczone.
+    """
+    try:
+        if resolution not in AGGREGATE_RESOLUTIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Obsługiwane rozdzielczości: {', '.join(AGGREGATE_RESOLUTIONS)}"
+            )
+        # Agregaty przechowujemy dłużej niż surowe dane; rozdzielczość godzinowa czyta surowe pomiary
+        max_days = AGGREGATES_MAX_HOURLY_DAYS if resolution == "hour" else AGGREGATES_MAX_DAYS
+        station_ids, parameter_names = parse_history_filters(days, stations, parameters, max_days)
         
-        return WeatherResponse(
-            stations=stations,
-            total_count=len(stations),
-            last_update=datetime.now().isoformat()
+        source, buckets = db_manager.get_aggregates(resolution, days, station_ids, parameter_names)
+        return AggregatesResponse(
+            resolution=resolution,
+            source=source,
+            buckets=[AggregateBucket(**bucket) for bucket in buckets],
+            total_count=len(buckets),
+            last_update=datetime.now(timezone.utc).isoformat()
         )
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Błąd podczas pobierania danych historycznych: {str(e)}")
+        logger.error(f"Błąd podczas pobierania agregatów: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def parse_percentiles(value: str) -> List[float]:
+    try:
+        qs = [float(item) for item in value.split(",") if item.strip()]
+    except ValueError:
+        qs = []
+    if not qs or any(not 0 <= q <= 100 for q in qs):
+        raise HTTPException(status_code=400, detail="Percentyle muszą być liczbami z zakresu 0-100")
+    return qs
+
+def build_summary(days: int, station_ids, parameter_names, qs: List[float]) -> AnalyticsSummaryResponse:
+    block = series_store.select(days, station_ids, parameter_names)
+    result = analytics.summary(block, qs)
+    columns = {name: analytics.to_json_values(result[name]) for name in ("mean", "std", "min", "max")}
+    columns["trend_per_day"] = analytics.to_json_values(result["trend_per_day"], decimals=4)
+    quantiles = analytics.to_json_values(result["percentiles"])
+    count = result["count"].tolist()
+    labels = [f"p{q:g}" for q in qs]
+    statistics = [
+        SeriesStatistics(
+            id_stacji=station_id,
+            parameter=parameter,
+            count=count[p][s],
+            percentiles=dict(zip(labels, quantiles[p][s])),
+            **{name: values[p][s] for name, values in columns.items()}
+        )
+        for p, parameter in enumerate(block.parameters)
+        for s, station_id in enumerate(block.station_ids)
+    ]
+    return AnalyticsSummaryResponse(
+        days=days,
+        statistics=statistics,
+        total_count=len(statistics),
+        last_update=datetime.now(timezone.utc).isoformat()
+    )
+
+def build_series(kind: str, days: int, station_ids, parameter_names, window: Optional[int] = None) -> AnalyticsSeriesResponse:
+    if kind == "rolling_mean":
+        # Dłuższy wycinek - pierwsze punkty okresu mają pełne okno
+        block = series_store.select(days + -(-window // 24), station_ids, parameter_names)
+        values = analytics.rolling_mean(block.values, window)
+    else:
+        baseline_block = series_store.select(series_store.days, station_ids, parameter_names)
+        baseline = analytics.climatology(baseline_block.values, baseline_block.hours)
+        block = series_store.select(days, station_ids, parameter_names)
+        values = analytics.anomalies(block.values, block.hours, baseline)
+    
+    hours = days * 24
+    values = values[..., -hours:]
+    rows = analytics.to_json_values(values)
+    series = [
+        TimeSeries(id_stacji=station_id, parameter=parameter, values=rows[p][s])
+        for p, parameter in enumerate(block.parameters)
+        for s, station_id in enumerate(block.station_ids)
+    ]
+    return AnalyticsSeriesResponse(
+        kind=kind,
+        window=window,
+        timestamps=block.timestamps()[-hours:],
+        series=series,
+        total_count=len(series),
+        last_update=datetime.now(timezone.utc).isoformat()
+    )
+
+def build_wind_rose(days: int, station_ids) -> WindRoseResponse:
+    block = series_store.select(days, station_ids, ["kierunek_wiatru", "predkosc_wiatru"])
+    counts, calm = analytics.wind_rose(block.values[0], block.values[1])
+    stations = [
+        WindRose(
+            id_stacji=station_id,
+            observations=int(counts[s].sum() + calm[s]),
+            calm=int(calm[s]),
+            counts=counts[s].tolist()
+        )
+        for s, station_id in enumerate(block.station_ids)
+    ]
+    return WindRoseResponse(
+        sectors=list(analytics.WIND_SECTORS),
+        speed_bins=[float(edge) for edge in analytics.WIND_SPEED_BINS],
+        stations=stations,
+        total_count=len(stations),
+        last_update=datetime.now(timezone.utc).isoformat()
+    )
+
+@app.get("/api/analytics/summary", response_model=AnalyticsSummaryResponse)
+async def get_analytics_summary(days: int = 30, stations: Optional[str] = None,
+                                parameters: Optional[str] = None, percentiles: str = "5,25,50,75,95"):
+    """Statystyki każdej pary stacja-parametr: liczba pomiarów, średnia, odchylenie standardowe,
+    minimum, maksimum, percentyle i trend liniowy (jednostka parametru na dobę)"""
+    try:
+        station_ids, parameter_names = parse_history_filters(days, stations, parameters)
+        qs = parse_percentiles(percentiles)
+        # Obliczenia NumPy w puli wątków, aby nie blokować pętli zdarzeń
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, build_summary, days, station_ids, parameter_names, qs)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Błąd podczas obliczania statystyk: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/rolling", response_model=AnalyticsSeriesResponse)
+async def get_analytics_rolling(days: int = 7, window: int = 24, stations: Optional[str] = None,
+                                parameters: Optional[str] = None):
+    """Średnia krocząca z `window` godzin dla każdej godziny okresu"""
+    try:
+        if not 1 <= window <= ANALYTICS_MAX_WINDOW:
+            raise HTTPException(status_code=400, detail=f"Okno musi mieścić się w zakresie 1-{ANALYTICS_MAX_WINDOW} godzin")
+        station_ids, parameter_names = parse_history_filters(days, stations, parameters, ANALYTICS_MAX_SERIES_DAYS)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, build_series, "rolling_mean", days, station_ids, parameter_names, window
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Błąd podczas obliczania średniej kroczącej: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/anomalies", response_model=AnalyticsSeriesResponse)
+async def get_analytics_anomalies(days: int = 7, stations: Optional[str] = None,
+                                  parameters: Optional[str] = None):
+    """Odchylenia od średniej klimatologicznej (ten sam miesiąc i godzina doby,
+    liczonej z całego okresu retencji danych)"""
+    try:
+        station_ids, parameter_names = parse_history_filters(days, stations, parameters, ANALYTICS_MAX_SERIES_DAYS)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, build_series, "anomaly", days, station_ids, parameter_names
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Błąd podczas obliczania anomalii: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/analytics/windrose", response_model=WindRoseResponse)
+async def get_analytics_wind_rose(days: int = 30, stations: Optional[str] = None):
+    """Róża wiatrów: liczba pomiarów w 16 sektorach kierunku i przedziałach prędkości (m/s);
+    cisza (prędkość 0) liczona osobno"""
+    try:
+        station_ids, _ = parse_history_filters(days, stations, None)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, build_wind_rose, days, station_ids)
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Błąd podczas obliczania róży wiatrów: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def parse_point(lat: float, lon: float):
+    if not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise HTTPException(status_code=400, detail="Współrzędne poza zakresem (lat -90..90, lon -180..180)")
+
+def parse_neighbours(k: int) -> int:
+    if not 1 <= k <= STATIONS_MAX_NEIGHBOURS:
+        raise HTTPException(status_code=400, detail=f"Liczba stacji musi mieścić się w zakresie 1-{STATIONS_MAX_NEIGHBOURS}")
+    return k
+
+def parse_bbox(bbox: str):
+    """`min_lon,min_lat,max_lon,max_lat` (kolejność jak w GeoJSON i Leaflet toBBoxString)"""
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(item) for item in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox musi mieć postać min_lon,min_lat,max_lon,max_lat")
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="bbox: wartości minimalne większe od maksymalnych")
+    return min_lat, min_lon, max_lat, max_lon
+
+def station_info(station, distance: Optional[float] = None) -> StationInfo:
+    return StationInfo(
+        id_stacji=station.id_stacji, stacja=station.stacja, lat=station.lat, lon=station.lon,
+        distance_km=round(distance, 3) if distance is not None else None
+    )
+
+@app.get("/api/stations", response_model=StationsResponse)
+async def get_stations(bbox: Optional[str] = None):
+    """Stacje ze współrzędnymi; **bbox** (`min_lon,min_lat,max_lon,max_lat`) ogranicza wynik
+    do prostokąta, np. widoku mapy"""
+    try:
+        index = station_directory.index()
+        stations = index.within(*parse_bbox(bbox)) if bbox else index.stations
+        return StationsResponse(stations=[station_info(station) for station in stations], total_count=len(stations))
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Błąd podczas pobierania stacji: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/stations/nearest", response_model=StationsResponse)
+async def get_nearest_stations(lat: float, lon: float, k: int = 5):
+    """k najbliższych stacji od punktu, z odległością w kilometrach"""
+    try:
+        parse_point(lat, lon)
+        nearest = station_directory.index().nearest(lat, lon, parse_neighbours(k))
+        return StationsResponse(
+            stations=[station_info(station, distance) for station, distance in nearest],
+            total_count=len(nearest)
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Błąd podczas wyszukiwania najbliższych stacji: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/stations/interpolate", response_model=InterpolationResponse)
+async def interpolate_parameter(lat: float, lon: float, parameter: str = "temperatura",
+                                k: int = 6, power: float = 2.0):
+    """Wartość parametru w dowolnym punkcie - interpolacja odwrotnych odległości (IDW)
+    z **k** najbliższych stacji z aktualnym pomiarem; **power** - wykładnik odległości"""
+    try:
+        parse_point(lat, lon)
+        if parameter not in MEASUREMENT_COLUMNS:
+            raise HTTPException(status_code=400, detail=f"Nieznany parametr: {parameter}")
+        if not 0 < power <= 10:
+            raise HTTPException(status_code=400, detail="Wykładnik musi mieścić się w zakresie (0, 10]")
+        value, used = station_directory.interpolate(lat, lon, parameter, parse_neighbours(k), power)
+        return InterpolationResponse(
+            lat=lat,
+            lon=lon,
+            parameter=parameter,
+            unit=Constants.PARAMETER_UNITS[parameter],
+            value=round(value, 2) if value is not None else None,
+            power=power,
+            stations=[
+                InterpolationStation(**station_info(station, distance).model_dump(), value=station_value)
+                for station, distance, station_value in used
+            ]
+        )
+    
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Błąd podczas interpolacji parametru: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/weather/refresh")
 async def refresh_weather_data(background_tasks: BackgroundTasks):
     """Wymusić odświeżenie danych z API IMGW"""
     try:
-        background_tasks.add_task(data_fetcher.fetch_data_from_imgw)
+        if not ingest_service.is_leader:
+            # Proces tylko do odczytu - zlecenie przejmuje proces pobierający dane
+            request_refresh(DATABASE_PATH)
+            return {"message": "Odświeżanie danych zostało zlecone procesowi pobierającemu"}
+        
+        # Kolejne kliknięcia dołączają do trwającego pobierania zamiast uruchamiać nowe
+        if data_fetcher.is_fetching():
+            return {"message": "Odświeżanie danych już trwa", "status": data_fetcher.status()}
+        if data_fetcher.is_throttled():
+            return {"message": "Dane zostały niedawno odświeżone", "status": data_fetcher.status()}
+        
+        background_tasks.add_task(data_fetcher.refresh)
         return {"message": "Odświeżanie danych zostało rozpoczęte w tle"}
     except Exception as e:
         logger.error(f"Błąd podczas odświeżania danych: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/weather/refresh/status")
+async def refresh_status():
+    """Stan pobierania danych z API IMGW (trwające i ostatnie pobranie)"""
+    status = ingest_service.status()
+    return {**(status["fetcher"] or {}), "ingest": {
+        "mode": status["mode"], "leader": status["leader"], "pid": status["pid"]
+    }}
+
 @app.get("/api/health")
 async def health_check():
-    """Sprawdzenie stanu aplikacji"""
+    """Sprawdzenie stanu aplikacji (warming_up do czasu przygotowania bazy przez lidera)"""
     try:
+        if not database_ready.is_set():
+            return {
+                "status": "warming_up",
+                "timestamp": datetime.now(timezone.utc).isoformat()
+            }
+        
         # Sprawdź połączenie z bazą danych
-        with sqlite3.connect(DATABASE_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM weather_data")
-            record_count = cursor.fetchone()[0]
+        record_count = db_manager.count_records()
         
         return {
             "status": "healthy",
             "database_records": record_count,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now(timezone.utc).isoformat()
         }
     except Exception as e:
         return {
             "status": "unhealthy",
             "error": str(e),
-            "timestamp": datetime.now().isoformat()
+            "timestamp": datetime.now(timezone.utc).isoformat()
         }
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """Metryki procesu w formacie tekstowym Prometheus"""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/api/stats")
 async def get_statistics():
-    """Pobiera statystyki aplikacji"""
+    """Pobiera statystyki aplikacji (liczniki procesu i utrzymywane liczby wierszy)"""
     try:
-        with sqlite3.connect(DATABASE_PATH) as conn:
-            cursor = conn.cursor()
-            
-            # Liczba rekordów
-            cursor.execute("SELECT COUNT(*) FROM weather_data")
-            total_records = cursor.fetchone()[0]
-            
-            # Liczba stacji
-            cursor.execute("SELECT COUNT(DISTINCT id_stacji) FROM weather_data")
-            stations_count = cursor.fetchone()[0]
-            
-            # Najnowsza aktualizacja
-            cursor.execute("SELECT MAX(data_pomiaru || ' ' || godzina_pomiaru) FROM weather_data")
-            last_update = cursor.fetchone()[0]
-            
-            # Ostatnie logi API
-            cursor.execute("""
-                SELECT status, COUNT(*) as count 
-                FROM api_logs 
-                WHERE timestamp > datetime('now', '-24 hours')
-                GROUP BY status
-            """)
-            api_logs = dict(cursor.fetchall())
-            
         return {
-            "total_records": total_records,
-            "stations_count": stations_count,
-            "last_update": last_update,
-            "api_calls_24h": api_logs,
-            "timestamp": datetime.now().isoformat()
+            **db_manager.get_statistics(),
+            "current_cache": current_cache.stats(),
+            "metrics": metrics.summary(),
+            "maintenance": ingest_service.status()["maintenance"],
+            "stream": broadcaster.stats(),
+            "analytics": series_store.stats(),
+            "stations": station_directory.stats(),
+            "cold_store": cold_store.stats(),
+            "startup": {
+                "phases": startup_phases,
+                "database_ready": database_ready.is_set(),
+                "warmed_up": warmed_up.is_set()
+            },
+            "timestamp": datetime.now(timezone.utc).isoformat()
         }
     
     except Exception as e:
@@ -398,19 +1038,20 @@ async def get_statistics():
         raise HTTPException(status_code=500, detail=str(e))
 
 # Serwowanie plików statycznych (frontend)
-app.mount("/static", StaticFiles(directory="frontend"), name="static")
+app.mount("/static", StaticFiles(directory=FRONTEND_DIR, check_dir=False), name="static")
+
+startup_phases["import"] = round(time.perf_counter() - IMPORT_STARTED, 4)
 
 if __name__ == "__main__":
     import uvicorn
     
-    # Pobierz dane przy starcie aplikacji
-    asyncio.run(data_fetcher.fetch_data_from_imgw())
-    
-    # Uruchom serwer
+    # Uruchom serwer (dane pobiera jeden z procesów - lider, pozostałe tylko czytają bazę)
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
         reload=False,
-        workers=1
+        workers=Config.WORKERS,
+        # Otwarte strumienie SSE nie kończą się same - nie czekaj na nie przy zamykaniu
+        timeout_graceful_shutdown=5
     )
\ No newline at end of file
@@ -0,0 +1,343 @@
+# Import historycznych danych IMGW z plików archiwum
+# backfill.py
+#
+# Bieżące API synop udostępnia tylko ostatnią godzinę, więc historię wczytuje się
+# z archiwum IMGW (dane_pomiarowo_obserwacyjne/dane_meteorologiczne/terminowe/synop):
+# spakowanych plików CSV pobranych do lokalnego katalogu.
+#
+#   python manage.py backfill <katalog> [--workers 4] [--batch-size 100000] [--replace] [--keep-index]
+#
+# Pliki są parsowane równolegle w puli procesów, a wiersze zapisywane przez jeden proces
+# w dużych transakcjach. Każda transakcja zapisuje też punkty kontrolne plików, których
+# wiersze zawiera - przerwany import wznawia się od pierwszego niezapisanego pliku.
+# Indeks po czasie pomiaru jest na czas importu usuwany - zapytania API o zakres czasu
+# przeglądają wtedy całą tabelę, więc import należy uruchamiać przy zatrzymanym API
+# albo z --keep-index (wolniejszy zapis, indeks zachowany).
+#
+# Obsługiwane formaty (wykrywane automatycznie po pierwszym wierszu):
+#   imgw - pliki terminowe synop "s_t_*.csv" bez nagłówka, kodowanie cp1250
+#   api  - CSV z nagłówkiem jak w API (id_stacji, stacja, data_pomiaru, godzina_pomiaru, ...),
+#          np. eksport /api/weather/historical/export?format=csv
+
+import csv
+import io
+import logging
+import os
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date, datetime, timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from config import Config
+from database import MEASUREMENT_COLUMNS, DatabaseManager, parse_record, parse_value
+from quality import QualityControl
+
+logger = logging.getLogger(__name__)
+
+IMPORT_FORMATS = ("auto", "imgw", "api")
+
+# Kolumny plików terminowych synop (numeracja od 0, wg s_t_format.txt IMGW):
+# parametr -> (kolumna wartości, kolumna statusu pomiaru)
+IMGW_SYNOP_COLUMNS: Dict[str, Tuple[int, int]] = {
+    "temperatura": (29, 30),
+    "predkosc_wiatru": (25, 26),
+    "kierunek_wiatru": (23, 24),
+    "wilgotnosc_wzgledna": (37, 38),
+    "suma_opadu": (48, 49),  # opad za 6 godzin
+    "cisnienie": (43, 44),  # ciśnienie zredukowane do poziomu morza
+}
+IMGW_STATUS_MISSING = "8"  # brak pomiaru
+IMGW_STATUS_NO_PHENOMENON = "9"  # brak zjawiska (np. opadu) - wartość 0
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+class SourceFile(NamedTuple):
+    """Plik CSV do importu: samodzielny lub element archiwum ZIP"""
+    path: str
+    member: Optional[str]
+    size: int
+    mtime: float
+    name: str  # ścieżka względem katalogu importu (z "/") - pliki o tej samej nazwie w podkatalogach
+
+    @property
+    def key(self) -> str:
+        return f"{self.name}:{self.member}" if self.member else self.name
+
+
+class ParsedFile(NamedTuple):
+    source: SourceFile
+    rows: List[tuple]
+    stations: Dict[str, str]
+    skipped: int
+
+
+def find_sources(directory: str) -> List[SourceFile]:
+    """Pliki CSV w katalogu (rekurencyjnie), także wewnątrz archiwów ZIP"""
+    sources = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            relative = os.path.relpath(path, directory).replace(os.sep, "/")
+            if name.lower().endswith(".zip"):
+                with zipfile.ZipFile(path) as archive:
+                    for member in sorted(archive.namelist()):
+                        if member.lower().endswith(".csv"):
+                            sources.append(SourceFile(path, member, stat.st_size, stat.st_mtime, relative))
+            elif name.lower().endswith(".csv"):
+                sources.append(SourceFile(path, None, stat.st_size, stat.st_mtime, relative))
+    return sources
+
+
+def _read_bytes(source: SourceFile) -> bytes:
+    if source.member is None:
+        with open(source.path, "rb") as file:
+            return file.read()
+    with zipfile.ZipFile(source.path) as archive:
+        return archive.read(source.member)
+
+
+def _decode(data: bytes) -> str:
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return data.decode("cp1250")
+
+
+def imgw_station_id(code: str) -> str:
+    """Kod stacji z archiwum (np. 352200375) -> identyfikator synop API (12375)"""
+    return f"12{code.strip()[-3:]}"
+
+
+def parse_imgw_rows(reader: Iterator[List[str]], stations: Dict[str, str]) -> Tuple[List[tuple], int]:
+    rows = []
+    skipped = 0
+    columns = [IMGW_SYNOP_COLUMNS[column] for column in MEASUREMENT_COLUMNS]
+    width = max(max(pair) for pair in columns) + 1
+    day_hours: Dict[Tuple[str, str, str], int] = {}
+    for row in reader:
+        if len(row) < width:
+            skipped += 1
+            continue
+        try:
+            day = (row[2], row[3], row[4])
+            start = day_hours.get(day)
+            if start is None:
+                start = day_hours[day] = (date(int(row[2]), int(row[3]), int(row[4])).toordinal() - EPOCH_ORDINAL) * 24
+            observed_at = start + int(row[5])
+        except ValueError:
+            skipped += 1
+            continue
+        station_id = imgw_station_id(row[0])
+        if station_id not in stations:
+            stations[station_id] = row[1].strip()
+        values = []
+        for value_column, status_column in columns:
+            status = row[status_column].strip()
+            if status == IMGW_STATUS_MISSING:
+                values.append(None)
+            elif status == IMGW_STATUS_NO_PHENOMENON:
+                values.append(0.0)
+            else:
+                values.append(parse_value(row[value_column].strip()))
+        rows.append((station_id, observed_at, *values))
+    return rows, skipped
+
+
+def parse_api_rows(reader: Iterator[dict], stations: Dict[str, str]) -> Tuple[List[tuple], int]:
+    rows = []
+    skipped = 0
+    for record in reader:
+        parsed = parse_record(record)
+        if parsed is None or not record.get("id_stacji") or not record.get("stacja"):
+            skipped += 1
+            continue
+        stations.setdefault(parsed[0], record["stacja"])
+        rows.append(parsed)
+    return rows, skipped
+
+
+def parse_source(source: SourceFile, file_format: str = "auto") -> ParsedFile:
+    """Parsuje jeden plik (wywoływane w procesie puli)"""
+    text = _decode(_read_bytes(source))
+    if file_format == "auto":
+        file_format = "api" if text.lstrip().startswith("id_stacji") else "imgw"
+    stations: Dict[str, str] = {}
+    if file_format == "api":
+        rows, skipped = parse_api_rows(csv.DictReader(io.StringIO(text)), stations)
+    else:
+        rows, skipped = parse_imgw_rows(csv.reader(io.StringIO(text)), stations)
+    # Kolejność klucza głównego - wstawianie do tabeli WITHOUT ROWID bez przeskoków po drzewie
+    rows.sort(key=lambda row: (row[0], row[1]))
+    return ParsedFile(source, rows, stations, skipped)
+
+
+class BackfillImporter:
+    """Import plików archiwum: równoległe parsowanie, zapis paczkami, punkty kontrolne"""
+
+    def __init__(self, db_manager: DatabaseManager, workers: Optional[int] = None,
+                 batch_size: int = 100000, replace: bool = False, file_format: str = "auto",
+                 progress_interval: float = 10.0, keep_index: bool = False):
+        if file_format not in IMPORT_FORMATS:
+            raise ValueError(f"Nieznany format: {file_format} (dostępne: {', '.join(IMPORT_FORMATS)})")
+        self.db_manager = db_manager
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.replace = replace
+        self.file_format = file_format
+        self.progress_interval = progress_interval
+        self.keep_index = keep_index
+        # Archiwum jest starsze niż dane w bazie - kontrola skoków tylko w obrębie importowanych plików
+        self.quality = QualityControl()
+        self._reset_counters()
+
+    def _reset_counters(self):
+        self.files_done = 0
+        self.files_skipped = 0
+        self.rows_parsed = 0
+        self.rows_written = 0
+        self.rows_invalid = 0
+        self.rows_flagged = 0
+        self.first_hour: Optional[int] = None
+        self._started = time.monotonic()
+        self._last_progress = self._started
+
+    def pending_sources(self, directory: str) -> List[SourceFile]:
+        """Pliki jeszcze niezaimportowane (lub zmienione od poprzedniego importu)"""
+        done = self.db_manager.get_import_checkpoints()
+        sources = []
+        for source in find_sources(directory):
+            if done.get(source.key) == (source.size, source.mtime):
+                self.files_skipped += 1
+            else:
+                sources.append(source)
+        return sources
+
+    def run(self, directory: str) -> dict:
+        """Importuje katalog; zwraca raport z przepustowością"""
+        self._reset_counters()
+        sources = self.pending_sources(directory)
+        logger.info(
+            f"Import archiwum z {directory}: {len(sources)} plików do wczytania, "
+            f"{self.files_skipped} już zaimportowanych, procesy: {self.workers}"
+        )
+        if sources and self.keep_index:
+            self._import(sources)
+        elif sources:
+            # Indeks po czasie budowany raz na końcu zamiast aktualizacji przy każdym wierszu
+            logger.warning(
+                "Indeks idx_weather_data_observed_at usunięty na czas importu - zapytania API o zakres czasu "
+                "będą do końca importu wolne; zatrzymaj API albo użyj --keep-index"
+            )
+            self.db_manager.drop_observed_at_index()
+            try:
+                self._import(sources)
+            finally:
+                logger.info("Tworzenie indeksu idx_weather_data_observed_at")
+                self.db_manager.create_observed_at_index()
+        if self.rows_written:
+            self._finish()
+        return self.report()
+
+    def _import(self, sources: List[SourceFile]):
+        batch = _Batch()
+        queue = iter(sources)
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            # Ograniczona liczba plików w toku - pamięć nie rośnie, gdy zapis nie nadąża
+            running = set()
+            for source in queue:
+                running.add(executor.submit(parse_source, source, self.file_format))
+                if len(running) >= self.workers * 2:
+                    break
+            while running:
+                done, running = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    batch.add(future.result())
+                    source = next(queue, None)
+                    if source is not None:
+                        running.add(executor.submit(parse_source, source, self.file_format))
+                if len(batch.rows) >= self.batch_size:
+                    self._write(batch)
+                    batch = _Batch()
+            self._write(batch)
+
+    def _write(self, batch: "_Batch"):
+        if not batch.files:
+            return
+        # Kontrola przed sortowaniem - wiersze w kolejności odczytu z plików leżą obok siebie w pamięci
+        rows = self.quality.check(batch.rows)
+        rows.sort(key=lambda row: (row[0], row[1]))
+        self.rows_flagged += sum(1 for row in rows if row[-1])
+        written = self.db_manager.import_batch(rows, batch.stations, batch.checkpoints(), self.replace)
+        self.files_done += len(batch.files)
+        self.rows_parsed += len(batch.rows)
+        self.rows_written += written
+        self.rows_invalid += batch.skipped
+        if batch.rows:
+            first = min(row[1] for row in batch.rows)
+            self.first_hour = first if self.first_hour is None else min(self.first_hour, first)
+        now = time.monotonic()
+        if now - self._last_progress >= self.progress_interval:
+            self._last_progress = now
+            logger.info(
+                f"Wczytano {self.files_done} plików, {self.rows_parsed} wierszy "
+                f"({self.rows_parsed / (now - self._started):.0f} wierszy/s)"
+            )
+
+    def _finish(self):
+        """Agregaty, najnowsze pomiary i nowa wersja danych - raz dla całego importu"""
+        logger.info("Przeliczanie agregatów i najnowszych pomiarów")
+        self.db_manager.rebuild_rollups()
+        # Zwiększa też wersję danych - procesy API przeładują analizy i pamięć podręczną
+        self.db_manager.rebuild_latest_observations()
+        if self.replace:
+            # Nadpisane wiersze nie zmieniają liczby wierszy, ale import nie odróżnia ich od nowych
+            self.db_manager.recount_rows()
+        retention_start = int(time.time()) // 3600 - Config.DATA_RETENTION_DAYS * 24
+        if self.first_hour is not None and self.first_hour < retention_start:
+            logger.warning(
+                f"Zaimportowano pomiary starsze niż DATA_RETENTION_DAYS ({Config.DATA_RETENTION_DAYS} dni) - "
+                f"najbliższa konserwacja przeniesie je do archiwum; zwiększ DATA_RETENTION_DAYS, aby je zachować"
+            )
+
+    def report(self) -> dict:
+        duration = time.monotonic() - self._started
+        return {
+            "files_imported": self.files_done,
+            "files_skipped": self.files_skipped,
+            "rows_parsed": self.rows_parsed,
+            "rows_written": self.rows_written,
+            "rows_invalid": self.rows_invalid,
+            "rows_flagged": self.rows_flagged,
+            "first_observation": (
+                datetime.fromtimestamp(self.first_hour * 3600, timezone.utc).strftime("%Y-%m-%dT%H:%M:%S")
+                if self.first_hour is not None else None
+            ),
+            "duration": round(duration, 2),
+            "rows_per_second": round(self.rows_parsed / duration) if duration > 0 else 0
+        }
+
+
+class _Batch:
+    """Wiersze kilku plików zapisywane w jednej transakcji"""
+
+    def __init__(self):
+        self.rows: List[tuple] = []
+        self.stations: Dict[str, str] = {}
+        self.files: List[ParsedFile] = []
+        self.skipped = 0
+
+    def add(self, parsed: ParsedFile):
+        self.rows.extend(parsed.rows)
+        for station_id, name in parsed.stations.items():
+            self.stations.setdefault(station_id, name)
+        self.files.append(parsed)
+        self.skipped += parsed.skipped
+
+    def checkpoints(self) -> List[tuple]:
+        return [
+            (parsed.source.key, parsed.source.size, parsed.source.mtime, len(parsed.rows))
+            for parsed in self.files
+        ]
@@ -0,0 +1,72 @@
+# Benchmark analiz NumPy: rok danych x wszystkie stacje x 6 parametrów
+# benchmarks/bench_analytics.py
+#
+# Mierzy pierwsze wczytanie danych do pamięci, przyrostowe uzupełnienie po nowym zapisie
+# oraz czas obliczeń, a dla porównania te same statystyki liczone pętlą w czystym Pythonie.
+#
+# Użycie: python benchmarks/bench_analytics.py [--days 365] [--db /tmp/bench_year.db]
+
+import argparse
+import logging
+import os
+import statistics
+import time
+
+from common import build_database, measure, synthetic_records
+
+import analytics
+from database import DatabaseManager
+
+
+def python_summary(block: analytics.SeriesBlock):
+    """Poprzedni sposób - pętla po szeregach i wartościach"""
+    result = []
+    for p in range(block.values.shape[0]):
+        for s in range(block.values.shape[1]):
+            values = sorted(v for v in block.values[p, s].tolist() if v == v)
+            if len(values) > 1:
+                result.append((statistics.fmean(values), statistics.pstdev(values),
+                               values[0], values[-1], statistics.quantiles(values, n=20)))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark analiz NumPy")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--db", default="/tmp/bench_year.db", help="Baza jest tworzona, jeśli nie istnieje")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    db_manager = DatabaseManager(args.db) if os.path.exists(args.db) else build_database(args.db, args.days)
+    store = analytics.SeriesStore(db_manager, days=args.days, check_interval=0)
+
+    started = time.perf_counter()
+    block = store.block()
+    print(f"wczytanie do pamięci: {time.perf_counter() - started:.2f} s, "
+          f"tablica {block.values.shape}, {block.values.nbytes / 2 ** 20:.1f} MB")
+
+    db_manager.insert_weather_data(list(synthetic_records(hours=3, seed=int(time.time()))))
+    started = time.perf_counter()
+    store.block()
+    print(f"uzupełnienie po zapisie 3 h danych: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    selected = store.select(args.days)
+    baseline = analytics.climatology(selected.values, selected.hours)
+    scenarios = [
+        ("wycinek (select)", lambda: store.select(args.days)),
+        ("statystyki + percentyle + trend", lambda: analytics.summary(selected)),
+        ("średnia krocząca 24 h", lambda: analytics.rolling_mean(selected.values, 24)),
+        ("klimatologia (miesiąc x godzina)", lambda: analytics.climatology(selected.values, selected.hours)),
+        ("anomalie", lambda: analytics.anomalies(selected.values, selected.hours, baseline)),
+        ("róża wiatrów", lambda: analytics.wind_rose(selected.values[2], selected.values[1])),
+    ]
+    print(f"{'operacja':<34} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, func in scenarios:
+        result = measure(func, repeat=10)
+        print(f"{name:<34} {result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+    result = measure(lambda: python_summary(selected), repeat=1)
+    print(f"{'statystyki - pętla Python':<34} {result['p50_ms']:>9.1f} {result['p99_ms']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Benchmark importu archiwum (manage.py backfill)
+# benchmarks/bench_backfill.py
+#
+# Generuje syntetyczne pliki terminowe synop w układzie archiwum IMGW (jeden ZIP na stację i rok,
+# CSV bez nagłówka, cp1250), importuje je do pustej bazy i podaje przepustowość. Drugi przebieg
+# sprawdza wznawianie - wszystkie pliki powinny zostać pominięte dzięki punktom kontrolnym.
+#
+# Użycie: python benchmarks/bench_backfill.py [--years 10] [--stations 60] [--workers 4]
+
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+import zipfile
+from datetime import datetime, timedelta, timezone
+
+from common import STATIONS_COUNT
+
+from backfill import IMGW_SYNOP_COLUMNS, BackfillImporter
+from database import DatabaseManager
+
+COLUMNS = 60
+
+
+def write_station_year(directory: str, station: int, year: int, rng: random.Random):
+    code = f"352{station:03d}{100 + station * 5 % 900:03d}"
+    name = f"STACJA-ŁĘG {station:02d}"
+    lines = []
+    moment = datetime(year, 1, 1)
+    while moment.year == year:
+        row = [""] * COLUMNS
+        row[0], row[1] = code, f'"{name}"'
+        row[2:6] = str(moment.year), str(moment.month), str(moment.day), str(moment.hour)
+        values = {
+            "temperatura": f"{rng.uniform(-15, 30):.1f}",
+            "predkosc_wiatru": str(rng.randint(0, 15)),
+            "kierunek_wiatru": str(rng.randrange(0, 360, 10)),
+            "wilgotnosc_wzgledna": f"{rng.uniform(30, 100):.0f}",
+            "suma_opadu": f"{max(0.0, rng.gauss(0, 1)):.1f}",
+            "cisnienie": f"{rng.uniform(990, 1035):.1f}",
+        }
+        for parameter, (value_column, _) in IMGW_SYNOP_COLUMNS.items():
+            row[value_column] = values[parameter]
+        lines.append(",".join(row))
+        moment += timedelta(hours=1)
+    member = f"s_t_{code[-3:]}_{year}.csv"
+    with zipfile.ZipFile(os.path.join(directory, f"{year}_{code[-3:]}_s.zip"), "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(member, ("\r\n".join(lines) + "\r\n").encode("cp1250"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark importu archiwum IMGW")
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--stations", type=int, default=STATIONS_COUNT)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=100000)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+
+    rng = random.Random(0)
+    last_year = datetime.now(timezone.utc).year - 1
+    with tempfile.TemporaryDirectory() as tmp:
+        archive_dir = os.path.join(tmp, "archiwum")
+        os.makedirs(archive_dir)
+        started = time.perf_counter()
+        for year in range(last_year - args.years + 1, last_year + 1):
+            for station in range(args.stations):
+                write_station_year(archive_dir, station, year, rng)
+        print(f"wygenerowano {args.years * args.stations} plików w {time.perf_counter() - started:.1f} s")
+
+        db_manager = DatabaseManager(os.path.join(tmp, "backfill.db"))
+        importer = BackfillImporter(db_manager, workers=args.workers, batch_size=args.batch_size)
+        report = importer.run(archive_dir)
+        print(f"import: {report}")
+        print(f"rozmiar bazy: {os.path.getsize(os.path.join(tmp, 'backfill.db')) / 2 ** 20:.0f} MB")
+
+        report = importer.run(archive_dir)
+        print(f"ponowny import (wznowienie): pominięto {report['files_skipped']} plików, "
+              f"wczytano {report['files_imported']}")
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Mikrobenchmark klasyfikacji: nazwa kierunku wiatru i kolor temperatury
+# benchmarks/bench_classify.py
+#
+# Porównuje poprzednie implementacje (min() po kluczach mapowania, przeszukiwanie zakresów)
+# z tablicami w Config i wersjami wektorowymi z analytics.py na milionie wartości.
+#
+# Użycie: python benchmarks/bench_classify.py [--values 1000000]
+
+import argparse
+import logging
+import random
+import time
+
+import common  # noqa: F401 - ścieżka repozytorium
+
+import analytics
+from config import Config
+
+
+def old_wind_direction_name(degrees: str) -> str:
+    try:
+        deg = int(float(degrees))
+        closest = min(Config.WIND_DIRECTIONS.keys(), key=lambda x: abs(int(x) - deg))
+        return Config.WIND_DIRECTIONS[closest]
+    except (ValueError, KeyError):
+        return "N/A"
+
+
+def old_temperature_color(temperature: float) -> str:
+    for _, config in Config.TEMPERATURE_COLORS.items():
+        if config["min"] <= temperature < config["max"]:
+            return config["color"]
+    return "#757575"
+
+
+def timed(func, *args) -> tuple:
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mikrobenchmark klasyfikacji kierunku wiatru i koloru temperatury")
+    parser.add_argument("--values", type=int, default=1_000_000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    rng = random.Random(0)
+    # Wartości jak w bazie (teksty), w tym nieprawidłowe
+    directions = [str(rng.randrange(0, 361)) for _ in range(args.values)]
+    directions[::1000] = [None] * len(directions[::1000])
+    temperatures = [rng.uniform(-40, 55) for _ in range(args.values)]
+    temperature_texts = [f"{value:.1f}" for value in temperatures]
+
+    print(f"{'klasyfikacja':<44} {'czas s':>8} {'ns/wartość':>11}")
+
+    def report(name, seconds):
+        print(f"{name:<44} {seconds:>8.3f} {seconds * 1e9 / args.values:>11.0f}")
+
+    expected, seconds = timed(lambda: [old_wind_direction_name(value) if value is not None else "N/A"
+                                       for value in directions])
+    report("kierunek - min() po kluczach", seconds)
+    result, seconds = timed(lambda: [Config.get_wind_direction_name(value) for value in directions])
+    report("kierunek - tablica 361 pozycji", seconds)
+    assert result == expected
+    result, seconds = timed(lambda: analytics.wind_direction_names(directions).tolist())
+    report("kierunek - wektorowo (teksty)", seconds)
+    assert result == expected
+
+    expected, seconds = timed(lambda: [old_temperature_color(value) for value in temperatures])
+    report("kolor - przeszukiwanie zakresów", seconds)
+    result, seconds = timed(lambda: [Config.get_temperature_color(value) for value in temperatures])
+    report("kolor - tablica pełnych stopni", seconds)
+    assert result == expected
+    result, seconds = timed(lambda: analytics.temperature_colors(temperature_texts).tolist())
+    report("kolor - wektorowo (teksty)", seconds)
+    array = analytics.as_float_array(temperatures)
+    result, seconds = timed(lambda: analytics.temperature_colors(array))
+    report("kolor - wektorowo (tablica float64)", seconds)
+    assert result.tolist() == expected
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Benchmark archiwum kolumnowego: dane zimne w plikach Arrow (mmap) zamiast w SQLite
+# benchmarks/bench_columnar.py
+#
+# Ta sama baza w dwóch wariantach: cała historia w SQLite oraz ostatnie --hot-days dni
+# w SQLite i starsze pełne miesiące w archiwum Arrow (jak po konserwacji z COLD_STORE=true).
+# Mierzy roczny skan szeregów (analizy), stronę danych historycznych z okresu archiwum,
+# rozmiary plików oraz eksport do Parquet. Wymaga pyarrow.
+#
+# Użycie: python benchmarks/bench_columnar.py [--days 400] [--hot-days 30] [--db /tmp/bench_columnar.db]
+
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from common import build_database, measure
+
+from analytics import SeriesStore
+from columnar import ColdStore, export_columnar
+from database import DatabaseManager
+from maintenance import MaintenanceJob
+
+
+def directory_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark archiwum kolumnowego")
+    parser.add_argument("--days", type=int, default=400)
+    parser.add_argument("--hot-days", type=int, default=30, help="Okres retencji w SQLite po archiwizacji")
+    parser.add_argument("--db", default="/tmp/bench_columnar.db", help="Baza jest tworzona, jeśli nie istnieje")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    if not os.path.exists(args.db):
+        build_database(args.db, args.days).close()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        hot_path = os.path.join(workdir, "hot.db")
+        shutil.copy(args.db, hot_path)
+        full = DatabaseManager(args.db)
+        hot = DatabaseManager(hot_path)
+        cold_store = ColdStore(hot, directory=os.path.join(workdir, "arrow"), enabled=True)
+        job = MaintenanceJob(hot, retention_days=args.hot_days, archive_dir=os.path.join(workdir, "csv"),
+                             backup_dir=os.path.join(workdir, "backup"), cold_store=cold_store)
+
+        started = time.perf_counter()
+        archived = job.archive_expired_rows()
+        job.incremental_vacuum()
+        stats = cold_store.stats()
+        print(f"archiwizacja: {archived} wierszy w {stats['partitions']} plikach miesięcy, "
+              f"{time.perf_counter() - started:.2f} s")
+        with hot.pool.writer() as conn:
+            conn.execute("VACUUM")
+        print(f"rozmiar: SQLite {os.path.getsize(args.db) / 2 ** 20:.1f} MB (cała historia) -> "
+              f"{os.path.getsize(hot_path) / 2 ** 20:.1f} MB + Arrow {stats['bytes'] / 2 ** 20:.1f} MB")
+
+        year = min(365, args.days)
+        cold_series = SeriesStore(hot, days=args.hot_days, check_interval=3600, cold_store=cold_store)
+        station_id = cold_series.block().station_ids[0]
+        scenarios = [
+            (f"skan {year} dni - SQLite (pełne wczytanie)", lambda: SeriesStore(full, days=year).block(), 3),
+            (f"skan {year} dni - Arrow + SQLite", lambda: cold_series.select(year), 3),
+            (f"skan {year} dni, 1 stacja - Arrow", lambda: cold_series.select(year, [station_id]), 10),
+        ]
+        old_hour = stats["boundary"] - 24 * 60
+        for label, func, repeat in scenarios:
+            print(f"{label:45s} {measure(func, repeat)}")
+        pages = [
+            ("strona 1000 wierszy z okresu archiwum - SQLite", lambda: full.get_historical_page(year, None, None, (old_hour, "9"), 1000)),
+            ("strona 1000 wierszy z okresu archiwum - Arrow", lambda: cold_store.historical_page(year, None, None, (old_hour, "9"), 1000)),
+        ]
+        for label, func in pages:
+            print(f"{label:45s} {measure(func, 30)}")
+
+        for file_format in ("parquet", "arrow"):
+            target = os.path.join(workdir, f"export_{file_format}")
+            started = time.perf_counter()
+            report = export_columnar(hot, cold_store, target, file_format)
+            print(f"eksport {file_format}: {report['rows']} wierszy, {report['files_written']} plików, "
+                  f"{directory_size(target) / 2 ** 20:.1f} MB, {time.perf_counter() - started:.2f} s")
+        full.close()
+        hot.close()
+
+
+if __name__ == "__main__":
+    main()
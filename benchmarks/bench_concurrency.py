@@ -0,0 +1,103 @@
+# Test obciążeniowy: odczyty najnowszych pomiarów w trakcie masowego zapisu
+# benchmarks/bench_concurrency.py
+#
+# Porównuje poprzedni tryb (nowe połączenie na każde zapytanie, dziennik rollback)
+# z pulą połączeń DatabaseManager (WAL, trwałe połączenia).
+#
+# Użycie: python benchmarks/bench_concurrency.py [--days 60] [--readers 4]
+
+import argparse
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from bench_ingest import legacy_insert
+from common import STATIONS_COUNT, chunks, synthetic_records
+
+from database import DatabaseManager, row_to_record
+
+LATEST_SQL = '''
+    SELECT s.stacja, l.* FROM latest_observation l
+    JOIN stations s ON s.id_stacji = l.id_stacji
+    ORDER BY s.stacja
+    LIMIT 100
+'''
+
+
+def legacy_read(db_path: str):
+    """Poprzedni sposób odczytu - nowe połączenie przy każdym żądaniu"""
+    with sqlite3.connect(db_path) as conn:
+        conn.row_factory = sqlite3.Row
+        return [row_to_record(row) for row in conn.execute(LATEST_SQL).fetchall()]
+
+
+def run_scenario(name: str, read, write, batches: list, readers: int):
+    done = threading.Event()
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def reader_loop():
+        local = []
+        while not done.is_set():
+            started = time.perf_counter()
+            try:
+                read()
+            except sqlite3.OperationalError:
+                with lock:
+                    errors[0] += 1
+                continue
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=reader_loop) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    started = time.perf_counter()
+    for batch in batches:
+        write(batch)
+    ingest_time = time.perf_counter() - started
+    done.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1000 if latencies else 0
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+    print(f"{name:<12} {ingest_time:>9.2f} {len(latencies) / ingest_time:>10.0f} "
+          f"{p50:>8.2f} {p99:>8.2f} {errors[0]:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Odczyty w trakcie masowego zapisu")
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    batches = list(chunks(synthetic_records(hours=args.days * 24), 24 * STATIONS_COUNT))
+    print(f"{'tryb':<12} {'zapis s':>9} {'odczyty/s':>10} {'p50 ms':>8} {'p99 ms':>8} {'błędy':>7}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        seed = DatabaseManager(legacy_path)
+        seed.insert_weather_data(batches[0])
+        seed.close()
+        with sqlite3.connect(legacy_path) as conn:
+            conn.execute("PRAGMA journal_mode = DELETE")
+        run_scenario("poprzedni", lambda: legacy_read(legacy_path),
+                     lambda batch: legacy_insert(legacy_path, batch), batches[1:], args.readers)
+
+        db_manager = DatabaseManager(os.path.join(tmp, "pool.db"))
+        db_manager.insert_weather_data(batches[0])
+        run_scenario("pula + WAL", db_manager.get_latest_data,
+                     db_manager.insert_weather_data, batches[1:], args.readers)
+        db_manager.close()
+
+
+if __name__ == "__main__":
+    main()
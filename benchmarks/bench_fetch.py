@@ -0,0 +1,77 @@
+# Benchmark asynchronicznego pobierania danych względem lokalnego zamiennika IMGW
+# benchmarks/bench_fetch.py
+#
+# Dla każdego scenariusza mierzy czas pobrania oraz największe opóźnienie pętli zdarzeń
+# (czy inne żądania byłyby obsługiwane w trakcie pobierania).
+#
+# Użycie: python benchmarks/bench_fetch.py
+
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from common import synthetic_records
+from imgw_stub import StubState, start_stub
+
+from database import DatabaseManager
+from fetcher import WeatherDataFetcher
+
+
+async def loop_lag_probe(stop: asyncio.Event, interval: float = 0.01) -> float:
+    """Zwraca największe opóźnienie budzenia się pętli zdarzeń (ms)"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst * 1000
+
+
+async def run_scenario(name: str, fetcher: WeatherDataFetcher, state: StubState):
+    stop = asyncio.Event()
+    probe = asyncio.create_task(loop_lag_probe(stop))
+    requests_before = state.requests
+    started = time.perf_counter()
+    ok = await fetcher.fetch_data_from_imgw()
+    elapsed = (time.perf_counter() - started) * 1000
+    stop.set()
+    lag = await probe
+    print(f"{name:<22} {str(ok):>6} {state.requests - requests_before:>8} {elapsed:>10.1f} {lag:>12.1f}")
+
+
+async def main():
+    logging.disable(logging.CRITICAL)
+    state = StubState()
+    server, url = start_stub(state)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_manager = DatabaseManager(os.path.join(tmp, "bench_fetch.db"))
+        fetcher = WeatherDataFetcher(db_manager, api_url=url, timeout=0.5,
+                                     max_retries=2, retry_backoff=0.05)
+
+        print(f"{'scenariusz':<22} {'wynik':>6} {'zapytań':>8} {'czas ms':>10} {'lag pętli ms':>12}")
+        await run_scenario("pierwsze pobranie", fetcher, state)
+        await run_scenario("bez zmian (304)", fetcher, state)
+
+        # Nowe dane (inne wartości) wymuszają pełną odpowiedź zamiast 304
+        state.set_payload(list(synthetic_records(seed=1)))
+        state.delay = 0.3
+        await run_scenario("wolna odpowiedź", fetcher, state)
+
+        state.delay = 0.0
+        state.fail_first, state.failures = 2, 0
+        state.set_payload(list(synthetic_records(seed=2)))
+        await run_scenario("2 błędy 503 + sukces", fetcher, state)
+
+        state.fail_first, state.failures = 0, 0
+        state.delay = 1.0
+        await run_scenario("przekroczony timeout", fetcher, state)
+
+        await fetcher.close()
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
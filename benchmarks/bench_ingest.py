@@ -0,0 +1,76 @@
+# Benchmark zapisu danych: pętla INSERT OR REPLACE vs paczkowy zapis z wykrywaniem zmian
+# benchmarks/bench_ingest.py
+#
+# Ładuje syntetyczny rok danych (~500 tys. rekordów), a następnie ładuje go ponownie
+# (dane bez zmian - typowy przypadek, gdy pobieramy częściej niż IMGW publikuje).
+#
+# Użycie: python benchmarks/bench_ingest.py [--days 365] [--batch-hours 24]
+
+import argparse
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+
+from common import STATIONS_COUNT, chunks, synthetic_records
+
+from database import (
+    MEASUREMENT_COLUMNS, UPSERT_LATEST_SQL, DatabaseManager, parse_record
+)
+
+
+def legacy_insert(db_path: str, data: list) -> int:
+    """Poprzednia ścieżka zapisu - po jednym INSERT OR REPLACE na rekord"""
+    inserted_count = 0
+    with sqlite3.connect(db_path) as conn:
+        cursor = conn.cursor()
+        for record in data:
+            parsed = parse_record(record)
+            cursor.execute('''
+                INSERT INTO stations (id_stacji, stacja) VALUES (?, ?)
+                ON CONFLICT (id_stacji) DO UPDATE SET stacja = excluded.stacja
+            ''', (parsed[0], record.get('stacja')))
+            cursor.execute(f'''
+                INSERT OR REPLACE INTO weather_data
+                (id_stacji, observed_at, {", ".join(MEASUREMENT_COLUMNS)})
+                VALUES (?, ?, {", ".join("?" for _ in MEASUREMENT_COLUMNS)})
+            ''', parsed)
+            cursor.execute(UPSERT_LATEST_SQL, parsed)
+            inserted_count += 1
+        conn.commit()
+    return inserted_count
+
+
+def run(name: str, insert, batches: list):
+    started = time.perf_counter()
+    for batch in batches:
+        insert(batch)
+    elapsed = time.perf_counter() - started
+    rows = sum(len(batch) for batch in batches)
+    print(f"{name:<36} {rows:>9} {elapsed:>9.2f} {rows / elapsed:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark zapisu danych")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--batch-hours", type=int, default=24)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    batches = list(chunks(synthetic_records(hours=args.days * 24), args.batch_hours * STATIONS_COUNT))
+
+    print(f"{'ścieżka':<36} {'rekordy':>9} {'czas s':>9} {'rekordy/s':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy.db")
+        DatabaseManager(legacy_path)
+        run("stara: nowe dane", lambda batch: legacy_insert(legacy_path, batch), batches)
+        run("stara: ponownie te same dane", lambda batch: legacy_insert(legacy_path, batch), batches)
+
+        db_manager = DatabaseManager(os.path.join(tmp, "bulk.db"))
+        run("nowa: nowe dane", db_manager.insert_weather_data, batches)
+        run("nowa: ponownie te same dane", db_manager.insert_weather_data, batches)
+
+
+if __name__ == "__main__":
+    main()
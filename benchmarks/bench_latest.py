@@ -0,0 +1,50 @@
+# Benchmark odczytu najnowszych pomiarów (/api/weather/current) w zależności od historii
+# benchmarks/bench_latest.py
+#
+# Użycie: python benchmarks/bench_latest.py [--days 1 30 365]
+
+import argparse
+import logging
+import os
+import sqlite3
+import tempfile
+
+from common import build_database, measure
+
+# Poprzednie zapytanie - skorelowany MAX(observed_at) po całej historii
+LEGACY_LATEST_SQL = '''
+    SELECT s.stacja, w.* FROM stations s
+    JOIN weather_data w ON w.id_stacji = s.id_stacji
+    WHERE w.observed_at = (
+        SELECT MAX(observed_at) FROM weather_data
+        WHERE id_stacji = s.id_stacji
+    )
+    ORDER BY s.stacja
+    LIMIT 100
+'''
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark get_latest_data")
+    parser.add_argument("--days", type=int, nargs="+", default=[1, 30, 365])
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    print(f"{'dni':>5} {'rekordy':>9} {'stare p50 ms':>13} {'latest p50 ms':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for days in args.days:
+            path = os.path.join(tmp, f"bench_{days}.db")
+            db_manager = build_database(path, days)
+
+            conn = sqlite3.connect(path)
+            conn.row_factory = sqlite3.Row
+            records = conn.execute("SELECT COUNT(*) FROM weather_data").fetchone()[0]
+            legacy = measure(lambda: conn.execute(LEGACY_LATEST_SQL).fetchall())
+            conn.close()
+            latest = measure(db_manager.get_latest_data)
+
+            print(f"{days:>5} {records:>9} {legacy['p50_ms']:>13} {latest['p50_ms']:>14}")
+
+
+if __name__ == "__main__":
+    main()
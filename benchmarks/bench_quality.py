@@ -0,0 +1,51 @@
+# Benchmark kontroli jakości przy zapisie (quality.py)
+# benchmarks/bench_quality.py
+#
+# Sprawdza paczki wierszy (id_stacji, observed_at, *pomiary) w rozmiarze pobrania z API
+# (jedna godzina wszystkich stacji) i paczki importu archiwum (--batch-size), kolejne paczki
+# z tą samą pamięcią ostatnich wartości. Podaje przepustowość i udział oznaczonych wierszy.
+# Dane syntetyczne są losowe z godziny na godzinę, więc większość wierszy ma oznaczony skok.
+#
+# Użycie: python benchmarks/bench_quality.py [--stations 1000] [--hours 500] [--batch-size 100000]
+
+import argparse
+import logging
+import time
+
+from common import chunks, measure, synthetic_records
+
+from database import parse_record
+from quality import QualityControl
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark kontroli jakości")
+    parser.add_argument("--stations", type=int, default=1000)
+    parser.add_argument("--hours", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=100000)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    records = list(synthetic_records(args.stations, args.hours))
+    # Co tysięczna temperatura poza zakresem PARAMETER_LIMITS
+    for record in records[::1000]:
+        record["temperatura"] = "99.9"
+    rows = [parse_record(record) for record in records]
+
+    quality = QualityControl()
+    hourly = [rows[i:i + args.stations] for i in range(0, len(rows), args.stations)]
+    batches = iter(hourly)
+    print(f"paczka pobrania ({args.stations} wierszy): {measure(lambda: quality.check(next(batches)), len(hourly))}")
+
+    quality = QualityControl()
+    flagged = 0
+    started = time.perf_counter()
+    for batch in chunks(iter(rows), args.batch_size):
+        flagged += sum(1 for row in quality.check(batch) if row[-1])
+    elapsed = time.perf_counter() - started
+    print(f"paczki importu ({args.batch_size} wierszy): {len(rows)} wierszy w {elapsed:.2f} s, "
+          f"{len(rows) / elapsed:.0f} wierszy/s, oznaczonych {flagged / len(rows):.1%}")
+
+
+if __name__ == "__main__":
+    main()
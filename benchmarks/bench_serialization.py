@@ -0,0 +1,97 @@
+# Serializacja odpowiedzi /api/weather/current i /api/weather/historical
+# benchmarks/bench_serialization.py
+#
+# Zapytania wykonywane są w procesie (ASGI, TestClient) na bazie z --days dniami danych.
+# Rozmiar strony historii zwiększony jest do całego okresu (MAX_RECORDS_PER_REQUEST), więc
+# odpowiedź za 30 dni to jedna strona ~43 tys. wierszy. Mierzy medianę i p99 czasu oraz
+# szczytową pamięć zaalokowaną przez Pythona w trakcie zapytania (tracemalloc).
+# Opcja --baseline wczytuje dodatkowo inną wersję backendu do porównania, np.:
+#   git show HEAD~1:backend-main.py > /tmp/old-main.py
+#   python benchmarks/bench_serialization.py --baseline /tmp/old-main.py
+#
+# Użycie: python benchmarks/bench_serialization.py [--days 30] [--repeat 10] [--db /tmp/bench_serialization.db]
+
+import argparse
+import importlib.util
+import logging
+import os
+import tracemalloc
+
+from fastapi.testclient import TestClient
+
+from common import build_database, measure
+from config import Config
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(path: str, name: str):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def peak_memory_mb(func) -> float:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 2 ** 20
+    finally:
+        tracemalloc.stop()
+
+
+def scenarios(module, client, days: int):
+    def current(derived: bool):
+        def request():
+            # Bez pamięci podręcznej - mierzona jest budowa odpowiedzi, nie odczyt gotowych bajtów
+            module.current_cache.invalidate()
+            client.get(f"/api/weather/current?derived={str(derived).lower()}").raise_for_status()
+        return request
+
+    def historical(period: int, derived: bool = False):
+        def request():
+            response = client.get(f"/api/weather/historical?days={period}&limit=1000000&derived={str(derived).lower()}")
+            response.raise_for_status()
+        return request
+
+    yield "current", current(False)
+    yield "current derived", current(True)
+    for period in sorted({1, 7, days}):
+        yield f"historical {period} d", historical(period)
+    yield f"historical {days} d derived", historical(days, True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark serializacji odpowiedzi")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--db", default="/tmp/bench_serialization.db", help="Baza jest tworzona, jeśli nie istnieje")
+    parser.add_argument("--baseline", help="Plik innej wersji backendu do porównania")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        build_database(args.db, args.days).close()
+    # Konfiguracja wczytana jest już przez common.py - ustawienia zmieniane są bezpośrednio
+    Config.DATABASE_PATH = args.db
+    Config.INGEST_MODE = "external"
+    Config.STARTUP_WARMUP = False
+    Config.MAX_RECORDS_PER_REQUEST = args.days * 24 * 1000
+
+    apps = [("obecna", os.path.join(REPO_DIR, "backend-main.py"))]
+    if args.baseline:
+        apps.append(("porównawcza", args.baseline))
+    for label, path in apps:
+        module = load_app(path, f"main_{len(label)}")
+        logging.disable(logging.CRITICAL)
+        with TestClient(module.app) as client:
+            print(f"wersja {label} ({path})")
+            for name, request in scenarios(module, client, args.days):
+                request()
+                timing = measure(request, args.repeat)
+                print(f"  {name:28s} p50 {timing['p50_ms']:9.2f} ms  p99 {timing['p99_ms']:9.2f} ms  "
+                      f"pamięć {peak_memory_mb(request):7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# Czas od uruchomienia procesu do pierwszych poprawnych odpowiedzi
+# benchmarks/bench_startup.py
+#
+# Uruchamia aplikację (uvicorn, 1 worker, proces-lider) z wolnym zamiennikiem IMGW i odpytuje
+# ją od chwili utworzenia procesu. Mierzy czas do pierwszej odpowiedzi /api/health,
+# /api/weather/current (i do pierwszej odpowiedzi z danymi) oraz /api/analytics/summary
+# wraz z czasem tego zapytania. Dwa scenariusze: baza z historią i pusta baza (pierwsze
+# uruchomienie). Opcja --app pozwala porównać inną wersję backendu, np.:
+#   git show HEAD~1:backend-main.py > /tmp/old-main.py
+#   python benchmarks/bench_startup.py --app /tmp/old-main.py
+#
+# Użycie: python benchmarks/bench_startup.py [--days 365] [--imgw-delay 5] [--db /tmp/bench_startup.db]
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from common import build_database
+from imgw_stub import StubState, start_stub
+from bench_stream import REPO_DIR, free_port
+
+ANALYTICS_PATH = "/api/analytics/summary?days=30"
+
+
+def start_app(tmp: str, app: str, port: int, imgw_url: str, db_path: str) -> subprocess.Popen:
+    """Uruchamia backend tak jak na serwerze (main.py + katalog frontend)"""
+    os.symlink(os.path.abspath(app), os.path.join(tmp, "main.py"))
+    os.symlink(os.path.join(REPO_DIR, "frontend"), os.path.join(tmp, "frontend"))
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, DATABASE_PATH=db_path, IMGW_API_URL=imgw_url,
+               INGEST_MODE="lock")
+    log = open(os.path.join(tmp, "server.log"), "wb")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=tmp, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def get(port: int, path: str, timeout: float = 60):
+    """Odpowiedź JSON lub None, gdy serwer jeszcze nie przyjmuje połączeń"""
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=timeout) as response:
+            return json.loads(response.read())
+    except (urllib.error.URLError, ConnectionError):
+        return None
+
+
+def timeline(port: int, started: float, deadline: float = 120.0) -> dict:
+    """Czasy (od utworzenia procesu) pierwszych poprawnych odpowiedzi"""
+    result = {}
+    while "health" not in result:
+        if get(port, "/api/health") is not None:
+            result["health"] = time.perf_counter() - started
+        elif time.perf_counter() - started > deadline:
+            raise RuntimeError("Serwer aplikacji nie wystartował")
+        else:
+            time.sleep(0.01)
+
+    body = get(port, "/api/weather/current")
+    result["current"] = time.perf_counter() - started
+    while not body or not body.get("total_count"):
+        if time.perf_counter() - started > deadline:
+            break
+        time.sleep(0.05)
+        body = get(port, "/api/weather/current")
+    if body and body.get("total_count"):
+        result["data"] = time.perf_counter() - started
+
+    request_started = time.perf_counter()
+    get(port, ANALYTICS_PATH)
+    result["analytics"] = time.perf_counter() - started
+    result["analytics_request"] = time.perf_counter() - request_started
+    return result
+
+
+def run_scenario(label: str, app: str, db_source: str, imgw_url: str):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "weather_data.db")
+        if db_source:
+            shutil.copy(db_source, db_path)
+        port = free_port()
+        started = time.perf_counter()
+        process = start_app(tmp, app, port, imgw_url, db_path)
+        try:
+            times = timeline(port, started)
+            stats = get(port, "/api/stats") or {}
+        finally:
+            process.terminate()
+            process.wait(timeout=15)
+
+    columns = [("health", "health"), ("current", "current"), ("data", "dane"),
+               ("analytics", "analizy"), ("analytics_request", "zapytanie analiz")]
+    print(f"{label:24s} " + "  ".join(
+        f"{name} {times[key] * 1000:6.0f} ms" if key in times else f"{name}      -"
+        for key, name in columns
+    ))
+    phases = (stats.get("startup") or {}).get("phases")
+    if phases:
+        print(f"{'':24s} etapy startu: " + ", ".join(f"{phase} {seconds * 1000:.0f} ms" for phase, seconds in phases.items()))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Czas startu aplikacji do pierwszych odpowiedzi")
+    parser.add_argument("--app", default=os.path.join(REPO_DIR, "backend-main.py"), help="Plik backendu")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--imgw-delay", type=float, default=5.0, help="Opóźnienie odpowiedzi zamiennika IMGW (s)")
+    parser.add_argument("--db", default="/tmp/bench_startup.db", help="Baza jest tworzona, jeśli nie istnieje")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    if not os.path.exists(args.db):
+        build_database(args.db, args.days).close()
+
+    stub, imgw_url = start_stub(StubState(delay=args.imgw_delay))
+    print(f"IMGW odpowiada po {args.imgw_delay:.0f} s, czasy od utworzenia procesu:")
+    run_scenario(f"baza {args.days} dni", args.app, args.db, imgw_url)
+    run_scenario("pusta baza", args.app, None, imgw_url)
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
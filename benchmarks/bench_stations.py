@@ -0,0 +1,56 @@
+# Benchmark indeksu przestrzennego stacji: prostokąt mapy, k najbliższych, interpolacja IDW
+# benchmarks/bench_stations.py
+#
+# Losowe stacje w granicach Polski; porównanie z przeglądem wszystkich stacji.
+#
+# Użycie: python benchmarks/bench_stations.py [--stations 500]
+
+import argparse
+import random
+
+from common import measure
+
+from stations import Station, StationIndex, haversine_km, idw
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark indeksu przestrzennego stacji")
+    parser.add_argument("--stations", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    stations = [
+        Station(str(12000 + number), f"Stacja {number}", rng.uniform(49.0, 54.9), rng.uniform(14.1, 24.1))
+        for number in range(args.stations)
+    ]
+    values = {station.id_stacji: rng.uniform(-10, 30) for station in stations}
+    points = [(rng.uniform(49.0, 54.9), rng.uniform(14.1, 24.1)) for _ in range(args.queries)]
+    index = StationIndex(stations)
+
+    def brute_nearest(lat, lon, k):
+        return sorted((haversine_km(lat, lon, s.lat, s.lon), s.id_stacji) for s in stations)[:k]
+
+    def brute_within(lat, lon):
+        return [s for s in stations if lat <= s.lat <= lat + 1.5 and lon <= s.lon <= lon + 2.5]
+
+    def interpolate(lat, lon):
+        nearest = index.nearest(lat, lon, 6)
+        return idw([distance for _, distance in nearest], [values[s.id_stacji] for s, _ in nearest])
+
+    scenarios = [
+        ("k=5 najbliższych - indeks", lambda: [index.nearest(lat, lon, 5) for lat, lon in points]),
+        ("k=5 najbliższych - wszystkie stacje", lambda: [brute_nearest(lat, lon, 5) for lat, lon in points]),
+        ("prostokąt mapy - indeks", lambda: [index.within(lat, lon, lat + 1.5, lon + 2.5) for lat, lon in points]),
+        ("prostokąt mapy - wszystkie stacje", lambda: [brute_within(lat, lon) for lat, lon in points]),
+        ("interpolacja IDW (k=6)", lambda: [interpolate(lat, lon) for lat, lon in points]),
+    ]
+    print(f"stacje: {args.stations}, zapytania: {args.queries}")
+    print(f"{'zapytanie':<38} {'µs/zapytanie':>13}")
+    for name, func in scenarios:
+        result = measure(func, repeat=5)
+        print(f"{name:<38} {result['p50_ms'] * 1000 / args.queries:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# Test obciążeniowy kanału /api/weather/stream (Server-Sent Events)
+# benchmarks/bench_stream.py
+#
+# Uruchamia aplikację (uvicorn, 1 worker) z lokalnym zamiennikiem IMGW, otwiera wielu
+# bezczynnych subskrybentów, a następnie kilka razy zmienia dane w zamienniku i wymusza
+# odświeżenie. Mierzy czas od zlecenia odświeżenia do odebrania zmiany przez każdego
+# subskrybenta oraz pamięć procesu serwera.
+#
+# Użycie: python benchmarks/bench_stream.py [--subscribers 2000] [--events 5]
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+from common import synthetic_records
+from imgw_stub import StubState, start_stub
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DELTA_MARKER = b"event: delta"
+SNAPSHOT_MARKER = b"event: snapshot"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def start_app(tmp: str, port: int, imgw_url: str) -> subprocess.Popen:
+    """Uruchamia backend tak jak na serwerze (main.py + katalog frontend)"""
+    os.symlink(os.path.join(REPO_DIR, "backend-main.py"), os.path.join(tmp, "main.py"))
+    os.symlink(os.path.join(REPO_DIR, "frontend"), os.path.join(tmp, "frontend"))
+    env = dict(
+        os.environ,
+        PYTHONPATH=REPO_DIR,
+        DATABASE_PATH=os.path.join(tmp, "stream.db"),
+        IMGW_API_URL=imgw_url,
+        MIN_REFRESH_INTERVAL="0",
+        STREAM_MAX_SUBSCRIBERS="100000"
+    )
+    log = open(os.path.join(tmp, "server.log"), "wb")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port),
+         "--log-level", "warning", "--backlog", "4096", "--timeout-graceful-shutdown", "2"],
+        cwd=tmp, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{port}/api/health", timeout=1)
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError("Serwer aplikacji nie wystartował")
+
+
+def trigger_refresh(port: int):
+    request = urllib.request.Request(f"http://127.0.0.1:{port}/api/weather/refresh", method="POST")
+    urllib.request.urlopen(request, timeout=10).read()
+
+
+class Subscriber:
+    """Minimalny klient SSE na surowym gnieździe - liczy odebrane zdarzenia delta"""
+
+    def __init__(self, port: int, arrivals: list):
+        self.port = port
+        self.arrivals = arrivals
+        self.ready = asyncio.Event()
+        self.deltas = 0
+
+    async def run(self):
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(
+            f"GET /api/weather/stream HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+            f"Accept: text/event-stream\r\n\r\n".encode()
+        )
+        buffer = b""
+        try:
+            while True:
+                chunk = await reader.read(65536)
+                if not chunk:
+                    break
+                buffer += chunk
+                if not self.ready.is_set() and SNAPSHOT_MARKER in buffer:
+                    self.ready.set()
+                    buffer = buffer[buffer.index(SNAPSHOT_MARKER) + len(SNAPSHOT_MARKER):]
+                while DELTA_MARKER in buffer:
+                    self.arrivals[self.deltas].append(time.perf_counter())
+                    self.deltas += 1
+                    buffer = buffer[buffer.index(DELTA_MARKER) + len(DELTA_MARKER):]
+                buffer = buffer[-len(SNAPSHOT_MARKER):]
+        finally:
+            writer.close()
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def run(port: int, state: StubState, subscribers_count: int, events: int, pid: int):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, trigger_refresh, port)
+    await asyncio.sleep(1)
+
+    rss_before = server_rss_mb(pid)
+    arrivals = [[] for _ in range(events)]
+    subscribers = [Subscriber(port, arrivals) for _ in range(subscribers_count)]
+    started = time.perf_counter()
+    tasks = []
+    for index, subscriber in enumerate(subscribers):
+        tasks.append(asyncio.create_task(subscriber.run()))
+        if index % 200 == 199:
+            await asyncio.sleep(0.05)
+    await asyncio.wait_for(asyncio.gather(*(s.ready.wait() for s in subscribers)), timeout=120)
+    connect_time = time.perf_counter() - started
+    await asyncio.sleep(1)
+    rss_after = server_rss_mb(pid)
+
+    print(f"subskrybenci: {subscribers_count}, połączenie wszystkich: {connect_time:.2f} s")
+    print(f"pamięć serwera: {rss_before:.1f} MB -> {rss_after:.1f} MB "
+          f"({(rss_after - rss_before) * 1024 / subscribers_count:.1f} kB na połączenie)")
+    print(f"{'zmiana':<8} {'odebrało':>9} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+
+    results = []
+    for event in range(events):
+        state.set_payload(list(synthetic_records(seed=event + 1)))
+        triggered = time.perf_counter()
+        await loop.run_in_executor(None, trigger_refresh, port)
+        deadline = time.perf_counter() + 30
+        while len(arrivals[event]) < subscribers_count and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+        latencies = [(moment - triggered) * 1000 for moment in arrivals[event]]
+        if latencies:
+            p50, p99, worst = percentile(latencies, 0.5), percentile(latencies, 0.99), max(latencies)
+        else:
+            p50 = p99 = worst = float("nan")
+        print(f"{event + 1:<8} {len(latencies):>9} {p50:>9.1f} {p99:>9.1f} {worst:>9.1f}")
+        results.append({"received": len(latencies), "p50_ms": p50, "p99_ms": p99, "max_ms": worst})
+        await asyncio.sleep(0.5)
+
+    stats = json.loads(urllib.request.urlopen(f"http://127.0.0.1:{port}/api/stats", timeout=10).read())
+    print(f"statystyki kanału: {stats.get('stream')}")
+
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test obciążeniowy strumienia SSE")
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    # Każdy subskrybent to deskryptor pliku po stronie klienta i serwera
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    if hard < args.subscribers + 256:
+        print(f"Uwaga: limit deskryptorów ({hard}) może nie wystarczyć dla {args.subscribers} połączeń")
+
+    state = StubState()
+    stub, imgw_url = start_stub(state)
+    with tempfile.TemporaryDirectory() as tmp:
+        port = free_port()
+        process = start_app(tmp, port, imgw_url)
+        try:
+            asyncio.run(run(port, state, args.subscribers, args.events, process.pid))
+        finally:
+            process.terminate()
+            process.wait(timeout=15)
+    stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# Zestaw benchmarków do porównywania wersji (bramka przed aktualizacją)
+# benchmarks/bench_suite.py
+#
+# Jeden przebieg w powtarzalnych warunkach (dane syntetyczne ze stałymi ziarnami):
+#   1. baza z --years latami godzinowych danych --stations stacji zapisana paczkami jak import
+#      archiwum (kontrola jakości + DatabaseManager.import_batch) - przepustowość zapisu masowego
+#   2. kolejne godziny danych pobierane przez WeatherDataFetcher z lokalnego zamiennika IMGW
+#      (imgw_stub) - czas jednego pobrania z kontrolą jakości i zapisem
+#   3. aplikacja w procesie (ASGI przez httpx, bez sieci) pod obciążeniem --concurrency
+#      równoległych klientów - p50/p99 i przepustowość /api/weather/current i /historical
+# Wyniki zapisywane są jako JSON (--output). Z --compare wyniki porównywane są z plikiem
+# poprzedniego przebiegu; kod wyjścia 1, gdy któraś wartość pogorszyła się o więcej niż
+# --tolerance (albo wystąpiły błędy odpowiedzi), np.:
+#   python benchmarks/bench_suite.py --output przed.json
+#   python benchmarks/bench_suite.py --output po.json --compare przed.json
+# Opcja --app uruchamia inną wersję backendu (np. git show HEAD~1:backend-main.py > /tmp/old-main.py).
+#
+# Użycie: python benchmarks/bench_suite.py [--years 2] [--stations 60] [--concurrency 16]
+#         [--requests 400] [--fetches 24] [--output bench_results.json] [--compare plik.json]
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List
+
+import httpx
+
+from common import chunks, percentiles, synthetic_records
+from imgw_stub import StubState, start_stub
+from bench_serialization import REPO_DIR, load_app
+
+from config import Config
+from database import DatabaseManager, encode_cursor, parse_record
+from fetcher import WeatherDataFetcher
+from quality import QualityControl
+
+SUITE_VERSION = 1
+HISTORY_SEED = 2024
+IMPORT_BATCH_SIZE = 100000
+
+
+def build_history(path: str, days: int, stations: int) -> dict:
+    """Baza z historią zapisaną paczkami; mierzony jest tylko zapis (bez generowania danych)"""
+    db_manager = DatabaseManager(path)
+    quality = QualityControl()
+    rows_total = 0
+    elapsed = 0.0
+    db_manager.drop_observed_at_index()
+    for batch in chunks(synthetic_records(stations, days * 24, seed=HISTORY_SEED), IMPORT_BATCH_SIZE):
+        names = {record["id_stacji"]: record["stacja"] for record in batch}
+        rows = [parse_record(record) for record in batch]
+        started = time.perf_counter()
+        rows = quality.check(rows)
+        rows.sort(key=lambda row: (row[0], row[1]))
+        rows_total += db_manager.import_batch(rows, names, [])
+        elapsed += time.perf_counter() - started
+    started = time.perf_counter()
+    db_manager.create_observed_at_index()
+    db_manager.rebuild_rollups()
+    db_manager.rebuild_latest_observations()
+    elapsed += time.perf_counter() - started
+    db_manager.close()
+    return {"rows": rows_total, "seconds": round(elapsed, 3), "rows_per_second": round(rows_total / elapsed)}
+
+
+async def fetch_ingest(db_path: str, stations: int, fetches: int) -> dict:
+    """Pobieranie kolejnych godzin z zamiennika IMGW: czas pobrania, kontroli jakości i zapisu"""
+    state = StubState(stations)
+    server, url = start_stub(state)
+    db_manager = DatabaseManager(db_path)
+    fetcher = WeatherDataFetcher(db_manager, api_url=url, min_refresh_interval=0)
+    now = datetime.now(timezone.utc)
+    samples = []
+    try:
+        for hour in range(fetches + 1):
+            state.set_payload(list(synthetic_records(stations, hours=1, end=now + timedelta(hours=hour + 1),
+                                                     seed=HISTORY_SEED + hour)))
+            started = time.perf_counter()
+            if not await fetcher.fetch_data_from_imgw():
+                raise RuntimeError("Pobieranie z serwera zastępczego IMGW nie powiodło się")
+            # Pierwsze pobranie wczytuje pamięć kontroli jakości - nie jest mierzone
+            if hour:
+                samples.append((time.perf_counter() - started) * 1000)
+    finally:
+        await fetcher.close()
+        server.shutdown()
+        db_manager.close()
+    return {**percentiles(samples), "records_per_second": round(stations * fetches / (sum(samples) / 1000))}
+
+
+async def load(client: httpx.AsyncClient, path: Callable[[int], str], requests: int, concurrency: int) -> dict:
+    """`requests` zapytań wysyłanych przez `concurrency` równoległych klientów"""
+    samples: List[float] = []
+    errors = 0
+    queue = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for number in queue:
+            started = time.perf_counter()
+            response = await client.get(path(number))
+            samples.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {**percentiles(samples), "requests_per_second": round(requests / elapsed, 1), "errors": errors}
+
+
+def http_scenarios(station_ids: List[str], days: int) -> Dict[str, Callable[[int], str]]:
+    """Ścieżki zapytań (numer zapytania -> URL); stacje i strony zmieniają się między zapytaniami"""
+    # Strona ze środka okresu - kursor jak z next_cursor wcześniejszych stron
+    middle_hour = int(time.time()) // 3600 - days * 12
+    middle_cursor = encode_cursor((middle_hour, "99999"))
+    return {
+        "http.current": lambda number: "/api/weather/current",
+        "http.current_derived": lambda number: "/api/weather/current?derived=true",
+        "http.historical_1d": lambda number: "/api/weather/historical?days=1",
+        "http.historical_7d_station": lambda number: (
+            f"/api/weather/historical?days=7&stations={station_ids[number % len(station_ids)]}"
+        ),
+        "http.historical_middle_page": lambda number: (
+            f"/api/weather/historical?days={days}&parameters=temperatura,cisnienie&cursor={middle_cursor}"
+        ),
+    }
+
+
+async def http_load(app_path: str, db_path: str, days: int, requests: int, concurrency: int) -> Dict[str, dict]:
+    # Konfiguracja wczytana jest już przez common.py - ustawienia zmieniane są bezpośrednio
+    Config.DATABASE_PATH = db_path
+    Config.INGEST_MODE = "external"
+    Config.STARTUP_WARMUP = False
+    Config.DATA_RETENTION_DAYS = days
+    module = load_app(app_path, "bench_suite_app")
+    results = {}
+    async with module.app.router.lifespan_context(module.app):
+        logging.disable(logging.CRITICAL)
+        with module.db_manager.pool.reader() as conn:
+            station_ids = [row[0] for row in conn.execute("SELECT id_stacji FROM latest_observation ORDER BY id_stacji")]
+        transport = httpx.ASGITransport(app=module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for name, path in http_scenarios(station_ids, days).items():
+                # Przebieg rozgrzewający: pamięci podręczne odpowiedzi i SQLite
+                await load(client, path, concurrency, concurrency)
+                results[name] = await load(client, path, requests, concurrency)
+    return results
+
+
+def environment(app_path: str) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "-C", REPO_DIR, "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "git_commit": commit,
+        "app": os.path.abspath(app_path),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> bool:
+    """Wypisuje zmiany względem poprzedniego przebiegu; zwraca False przy pogorszeniu ponad tolerancję"""
+    ok = True
+    print(f"\n{'wynik':32s} {'metryka':20s} {'poprzednio':>12s} {'teraz':>12s} {'zmiana':>8s}")
+    for name, metrics in results.items():
+        if metrics.get("errors"):
+            print(f"{name:32s} błędy odpowiedzi: {metrics['errors']}  POGORSZENIE")
+            ok = False
+        for metric, value in metrics.items():
+            previous = baseline.get(name, {}).get(metric)
+            if metric.endswith("_ms") or metric == "seconds":
+                worse = previous is not None and value > previous * (1 + tolerance)
+            elif metric.endswith("_per_second"):
+                worse = previous is not None and value < previous * (1 - tolerance)
+            else:
+                continue
+            if previous is None:
+                print(f"{name:32s} {metric:20s} {'-':>12s} {value:>12}")
+                continue
+            change = (value - previous) / previous if previous else 0.0
+            print(f"{name:32s} {metric:20s} {previous:>12} {value:>12} {change:>+8.1%}"
+                  f"{'  POGORSZENIE' if worse else ''}")
+            ok = ok and not worse
+    return ok
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Zestaw benchmarków z wynikami w JSON")
+    parser.add_argument("--years", type=int, default=2, help="Lata historii w bazie")
+    parser.add_argument("--stations", type=int, default=60)
+    parser.add_argument("--fetches", type=int, default=24, help="Liczba pobrań z zamiennika IMGW")
+    parser.add_argument("--requests", type=int, default=400, help="Zapytania HTTP na scenariusz")
+    parser.add_argument("--concurrency", type=int, default=16, help="Równolegli klienci HTTP")
+    parser.add_argument("--app", default=os.path.join(REPO_DIR, "backend-main.py"), help="Plik backendu")
+    parser.add_argument("--output", default="bench_results.json", help="Plik wyników JSON")
+    parser.add_argument("--compare", help="Wyniki poprzedniego przebiegu (JSON) do porównania")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Dopuszczalne pogorszenie (ułamek)")
+    args = parser.parse_args()
+    logging.disable(logging.CRITICAL)
+
+    days = args.years * 365
+    results: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench_suite.db")
+        print(f"baza: {args.years} lat, {args.stations} stacji")
+        results["ingest.bulk"] = build_history(db_path, days, args.stations)
+        print(f"  {'ingest.bulk':30s} {results['ingest.bulk']}")
+        results["ingest.fetch"] = asyncio.run(fetch_ingest(db_path, args.stations, args.fetches))
+        print(f"  {'ingest.fetch':30s} {results['ingest.fetch']}")
+        print(f"zapytania HTTP: {args.requests} na scenariusz, {args.concurrency} równoległych klientów")
+        for name, result in asyncio.run(http_load(args.app, db_path, days, args.requests, args.concurrency)).items():
+            results[name] = result
+            print(f"  {name:30s} {result}")
+
+    report = {
+        "suite_version": SUITE_VERSION,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(args.app),
+        "parameters": {
+            "years": args.years, "stations": args.stations, "fetches": args.fetches,
+            "requests": args.requests, "concurrency": args.concurrency,
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f"wyniki zapisano w {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if baseline.get("parameters") != report["parameters"]:
+            print(f"uwaga: inne parametry poprzedniego przebiegu: {baseline.get('parameters')}")
+        if not compare(results, baseline.get("results", {}), args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# Wspólne narzędzia benchmarków - syntetyczne dane w formacie API IMGW
+# benchmarks/common.py
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from statistics import median
+from typing import Callable, Dict, Iterator, List
+
+# Benchmarki uruchamiane są z katalogu repozytorium: python benchmarks/<plik>.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Konserwacja uruchomiona przez benchmark (np. lider pobierania w aplikacji) zapisuje backupy
+# i archiwa w katalogu tymczasowym, a nie w katalogu, z którego uruchomiono benchmark.
+# Zmienne ustawiane są przed wczytaniem config - domyślne argumenty MaintenanceJob i ColdStore
+# odczytują Config przy imporcie; procesy aplikacji uruchamiane przez benchmarki je dziedziczą.
+WORK_DIR = tempfile.TemporaryDirectory(prefix="imgw-bench-")
+for _variable, _subdirectory in (("BACKUP_DIR", "backupy"), ("ARCHIVE_DIR", "archiwum"),
+                                 ("COLD_STORE_DIR", "archiwum_arrow")):
+    os.environ[_variable] = os.path.join(WORK_DIR.name, _subdirectory)
+
+from config import Constants  # noqa: E402
+
+STATIONS_COUNT = 60
+
+
+def synthetic_records(stations: int = STATIONS_COUNT, hours: int = 24,
+                      end: datetime = None, seed: int = 0) -> Iterator[dict]:
+    """Generuje godzinowe rekordy synop dla `stations` stacji z ostatnich `hours` godzin"""
+    rng = random.Random(seed)
+    end = (end or datetime.now(timezone.utc)).replace(minute=0, second=0, microsecond=0)
+    start = end - timedelta(hours=hours - 1)
+    for hour in range(hours):
+        moment = start + timedelta(hours=hour)
+        for station in range(stations):
+            yield {
+                "id_stacji": str(12100 + station * 5),
+                "stacja": f"Stacja {station:02d}",
+                "data_pomiaru": moment.strftime(Constants.DATE_FORMAT),
+                "godzina_pomiaru": str(moment.hour),
+                "temperatura": f"{rng.uniform(-15, 30):.1f}",
+                "predkosc_wiatru": str(rng.randint(0, 15)),
+                "kierunek_wiatru": str(rng.randrange(0, 360, 10)),
+                "wilgotnosc_wzgledna": f"{rng.uniform(30, 100):.1f}",
+                "suma_opadu": f"{max(0.0, rng.gauss(0, 1)):.1f}",
+                "cisnienie": f"{rng.uniform(990, 1035):.1f}",
+            }
+
+
+def chunks(records: Iterator[dict], size: int) -> Iterator[List[dict]]:
+    """Dzieli strumień rekordów na paczki o zadanym rozmiarze"""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def build_database(path: str, days: int, stations: int = STATIONS_COUNT):
+    """Tworzy bazę z `days` dniami godzinowych danych dla `stations` stacji"""
+    from database import DatabaseManager
+
+    if os.path.exists(path):
+        os.remove(path)
+    db_manager = DatabaseManager(path)
+    for batch in chunks(synthetic_records(stations, days * 24), 24 * stations):
+        db_manager.insert_weather_data(batch)
+    return db_manager
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Mediana i p99 czasów w milisekundach"""
+    samples = sorted(samples)
+    return {
+        "p50_ms": round(median(samples), 3),
+        "p99_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))], 3),
+    }
+
+
+def measure(func: Callable, repeat: int = 50) -> Dict[str, float]:
+    """Mierzy czas wywołania funkcji; zwraca medianę i p99 w milisekundach"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return percentiles(samples)
@@ -0,0 +1,123 @@
+# Lokalny zamiennik API IMGW (synop) do testów i benchmarków
+# benchmarks/imgw_stub.py
+#
+# Użycie jako serwer:
+#   python benchmarks/imgw_stub.py --port 8099 --delay 2 --fail-first 2 [--slow-first 1]
+#   IMGW_API_URL=http://127.0.0.1:8099/api/data/synop python main.py
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import STATIONS_COUNT, synthetic_records
+
+STUB_PATH = "/api/data/synop"
+
+
+class StubState:
+    """Konfiguracja i liczniki serwera zastępczego"""
+
+    def __init__(self, stations: int = STATIONS_COUNT, delay: float = 0.0,
+                 fail_first: int = 0, fail_status: int = 503, slow_first: int = 0):
+        self.delay = delay
+        # Opóźnienie tylko dla pierwszych `slow_first` zapytań (0 - dla wszystkich)
+        self.slow_first = slow_first
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.requests = 0
+        self.not_modified = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+        self.set_payload(list(synthetic_records(stations, hours=1)))
+
+    def set_payload(self, records: list):
+        """Podmienia dane zwracane przez serwer (nowy ETag i Last-Modified)"""
+        self.body = json.dumps(records, ensure_ascii=False).encode("utf-8")
+        self.etag = f'"{hashlib.md5(self.body).hexdigest()}"'
+        self.last_modified = formatdate(time.time(), usegmt=True)
+
+
+def make_handler(state: StubState):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body: bytes = b"", headers: dict = None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", str(len(body)))
+            try:
+                self.end_headers()
+                if body:
+                    self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # Klient (np. zatrzymywana aplikacja) zamknął połączenie przed odpowiedzią
+                pass
+
+        def do_GET(self):
+            if self.path != STUB_PATH:
+                self._send(404)
+                return
+            with state.lock:
+                state.requests += 1
+                failing = state.failures < state.fail_first
+                if failing:
+                    state.failures += 1
+                slow = state.delay and (not state.slow_first or state.requests <= state.slow_first)
+            if slow:
+                time.sleep(state.delay)
+            if failing:
+                self._send(state.fail_status)
+                return
+            if self.headers.get("If-None-Match") == state.etag:
+                with state.lock:
+                    state.not_modified += 1
+                self._send(304, headers={"ETag": state.etag})
+                return
+            self._send(200, state.body, {
+                "Content-Type": "application/json; charset=utf-8",
+                "ETag": state.etag,
+                "Last-Modified": state.last_modified
+            })
+
+    return StubHandler
+
+
+def start_stub(state: StubState, host: str = "127.0.0.1", port: int = 0):
+    """Uruchamia serwer w wątku w tle; zwraca (serwer, adres URL endpointu synop)"""
+    server = ThreadingHTTPServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}{STUB_PATH}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Zastępczy serwer API IMGW")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--stations", type=int, default=STATIONS_COUNT)
+    parser.add_argument("--delay", type=float, default=0.0, help="Opóźnienie każdej odpowiedzi (s)")
+    parser.add_argument("--fail-first", type=int, default=0, help="Liczba początkowych odpowiedzi z błędem")
+    parser.add_argument("--fail-status", type=int, default=503)
+    parser.add_argument("--slow-first", type=int, default=0, help="Opóźniaj tylko początkowe odpowiedzi (0 - wszystkie)")
+    args = parser.parse_args()
+
+    state = StubState(args.stations, args.delay, args.fail_first, args.fail_status, args.slow_first)
+    server, url = start_stub(state, args.host, args.port)
+    print(f"Serwer zastępczy IMGW: {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
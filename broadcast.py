@@ -0,0 +1,218 @@
+# Rozsyłanie zmian najnowszych pomiarów do subskrybentów (Server-Sent Events)
+# broadcast.py
+
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import AsyncIterator, Deque, Dict, List, Optional, Set, Tuple
+
+from config import Config
+from database import DatabaseManager
+from metrics import SERIALIZATION_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Sygnał końca strumienia (zamknięcie serwera lub zbyt wolny subskrybent)
+_CLOSE = None
+
+
+def sse_message(event: str, data: str, event_id: Optional[int] = None) -> bytes:
+    """Ramka Server-Sent Events"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {data}")
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class WeatherBroadcaster:
+    """Wspólny kanał zmian: każda zmiana jest serializowana raz i trafia do kolejek wszystkich subskrybentów
+
+    Stan (ostatni pomiar każdej stacji, numer zmiany, historia) modyfikowany jest wyłącznie
+    w pętli zdarzeń serwera, więc nie wymaga blokad. publish_changes() można wywołać z dowolnego wątku.
+    """
+
+    def __init__(self, db_manager: DatabaseManager,
+                 max_subscribers: int = Config.STREAM_MAX_SUBSCRIBERS,
+                 queue_size: int = Config.STREAM_QUEUE_SIZE,
+                 heartbeat_interval: float = Config.STREAM_HEARTBEAT,
+                 poll_interval: float = Config.CHANGE_POLL_INTERVAL,
+                 history_size: int = 32):
+        self.db_manager = db_manager
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.heartbeat_interval = heartbeat_interval
+        self.poll_interval = poll_interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._state: Optional[Dict[str, dict]] = None
+        self._state_lock: Optional[asyncio.Lock] = None
+        # Numeracja od czasu startu - Last-Event-ID sprzed restartu serwera nie pokryje się z nowymi
+        self._seq = int(time.time())
+        self._history: Deque[Tuple[int, bytes]] = deque(maxlen=history_size)
+        self._snapshot: Optional[bytes] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watch_task: Optional[asyncio.Task] = None
+        self._data_generation: Optional[int] = None
+        self._heartbeat = b": ping\n\n"
+        self.events_published = 0
+        self.messages_sent = 0
+        self.dropped_subscribers = 0
+
+    def attach(self, loop: asyncio.AbstractEventLoop):
+        """Wiąże kanał z pętlą zdarzeń serwera i uruchamia wspólny heartbeat"""
+        self._loop = loop
+        self._state_lock = asyncio.Lock()
+        self._heartbeat_task = loop.create_task(self._send_heartbeats())
+        self._watch_task = loop.create_task(self._watch_data_version())
+
+    async def close(self):
+        """Kończy strumienie wszystkich subskrybentów"""
+        for task in (self._heartbeat_task, self._watch_task):
+            if task is not None:
+                task.cancel()
+        self._heartbeat_task = self._watch_task = None
+        for queue in list(self._subscribers):
+            self._terminate(queue)
+        self._subscribers.clear()
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def is_full(self) -> bool:
+        return len(self._subscribers) >= self.max_subscribers
+
+    def publish_changes(self):
+        """Odczytuje najnowsze pomiary i rozsyła stacje, które się zmieniły (wywoływane po zapisie)"""
+        if self._loop is None or self._loop.is_closed():
+            return
+        records = self.db_manager.get_latest_data()
+        if not records:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._apply(records)
+        else:
+            self._loop.call_soon_threadsafe(self._apply, records)
+
+    def _apply(self, records: List[dict]):
+        if self._state is None:
+            # Nikt jeszcze nie subskrybował - stan zostanie wczytany przy pierwszym połączeniu
+            return
+        changed = [
+            record for record in records
+            if self._state.get(record["id_stacji"]) != record
+        ]
+        if not changed:
+            return
+        for record in changed:
+            self._state[record["id_stacji"]] = record
+        self._seq += 1
+        self._snapshot = None
+
+        message = sse_message("delta", self._payload(changed), self._seq)
+        self._history.append((self._seq, message))
+        self.events_published += 1
+        self.messages_sent += len(self._subscribers)
+        self._fan_out(message)
+
+    def _payload(self, stations: List[dict]) -> str:
+        with SERIALIZATION_SECONDS.time("stream"):
+            return json.dumps({
+                "seq": self._seq,
+                "stations": stations,
+                "total_count": len(stations),
+                "last_update": datetime.now(timezone.utc).isoformat()
+            }, ensure_ascii=False, separators=(",", ":"))
+
+    def _fan_out(self, message: bytes):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Zbyt wolny klient - rozłączamy; EventSource połączy się ponownie z Last-Event-ID
+                self._subscribers.discard(queue)
+                self._terminate(queue)
+                self.dropped_subscribers += 1
+
+    @staticmethod
+    def _terminate(queue: asyncio.Queue):
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(_CLOSE)
+
+    async def _send_heartbeats(self):
+        """Jeden wspólny zegar dla wszystkich połączeń zamiast osobnego na każdego klienta"""
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self._fan_out(self._heartbeat)
+
+    async def _watch_data_version(self):
+        """Wykrywa zapis dokonany przez inny proces (pobieranie w procesie-liderze)"""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self._subscribers:
+                continue
+            try:
+                # Odczyt SQLite w puli wątków - nie wstrzymuje pętli (zapytań i innych strumieni)
+                generation, _ = await self._loop.run_in_executor(None, self.db_manager.get_data_version)
+                if generation != self._data_generation:
+                    self._data_generation = generation
+                    await self._loop.run_in_executor(None, self.publish_changes)
+            except Exception as e:
+                logger.error(f"Błąd podczas sprawdzania wersji danych: {str(e)}")
+
+    async def _ensure_state(self):
+        async with self._state_lock:
+            if self._state is None:
+                self._data_generation, _ = await self._loop.run_in_executor(None, self.db_manager.get_data_version)
+                records = await self._loop.run_in_executor(None, self.db_manager.get_latest_data)
+                self._state = {record["id_stacji"]: record for record in records}
+
+    def _initial_messages(self, last_event_id: Optional[int]) -> List[bytes]:
+        """Pominięte zmiany (jeśli są jeszcze w historii) albo pełny stan wszystkich stacji"""
+        if last_event_id == self._seq:
+            return []
+        if last_event_id is not None and self._history and self._history[0][0] <= last_event_id + 1 <= self._seq:
+            return [message for seq, message in self._history if seq > last_event_id]
+        if self._snapshot is None:
+            self._snapshot = sse_message(
+                "snapshot", self._payload(list(self._state.values())), self._seq
+            )
+        return [self._snapshot]
+
+    async def subscribe(self, last_event_id: Optional[int] = None) -> AsyncIterator[bytes]:
+        """Strumień ramek SSE dla jednego klienta"""
+        await self._ensure_state()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        # Rejestracja i stan początkowy w jednym kroku pętli - żadna zmiana nie zostanie pominięta
+        initial = self._initial_messages(last_event_id)
+        self._subscribers.add(queue)
+        try:
+            yield f"retry: {int(Config.STREAM_RETRY_MS)}\n\n".encode("utf-8")
+            for message in initial:
+                yield message
+            while True:
+                message = await queue.get()
+                if message is _CLOSE:
+                    break
+                yield message
+        finally:
+            self._subscribers.discard(queue)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self._subscribers),
+            "seq": self._seq,
+            "events_published": self.events_published,
+            "messages_sent": self.messages_sent,
+            "dropped_subscribers": self.dropped_subscribers
+        }
@@ -0,0 +1,466 @@
+# Kolumnowe archiwum pomiarów (Apache Arrow / Parquet)
+# columnar.py
+#
+# Pomiary zapisywane są w plikach miesięcznych weather_data_RRRR-MM.<arrow|parquet> z typowanymi
+# kolumnami (observed_at jako timestamp UTC, pomiary jako float64, maska kontroli jakości qc_flags
+# jako int32 - pliki zapisane przed jej wprowadzeniem czytane są z qc_flags = 0). W pliku każda stacja to
+# osobny blok (record batch Arrow / row group Parquet), a kolejność stacji zapisana jest
+# w metadanych schematu - odczyt jednej stacji nie wymaga przeglądania całego miesiąca.
+#
+# Archiwum danych zimnych (Config.COLD_STORE): konserwacja przenosi pełne miesiące starsze
+# niż DATA_RETENTION_DAYS z SQLite do plików Arrow IPC bez kompresji w COLD_STORE_DIR.
+# Pliki są niezmienne (zastępowane w całości przez rename) i czytane przez mmap bez kopiowania.
+# Granicą między archiwum a bazą jest koniec najnowszego zarchiwizowanego miesiąca:
+# starsze godziny czytane są wyłącznie z plików, nowsze wyłącznie z SQLite.
+#
+# Parquet (zstd) służy do eksportu danych do analiz poza aplikacją (manage.py export-columnar).
+# pyarrow jest zależnością opcjonalną - bez niego archiwum kolumnowe jest niedostępne.
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from itertools import groupby
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import Config
+from database import (
+    MEASUREMENT_COLUMNS, QC_FLAGS_COLUMN, DatabaseManager, day_to_month_bucket, format_value,
+    from_observed_at, history_start_hour, month_bucket_days
+)
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet as pq
+except ImportError:  # archiwum kolumnowe niedostępne
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+COLUMNAR_FORMATS = ("arrow", "parquet")
+PARTITION_PATTERN = re.compile(r"^weather_data_(\d{4})-(\d{2})\.(arrow|parquet)$")
+
+# Wiersze miesiąca do zapisu w archiwum: stacja po stacji, godziny rosnąco
+MONTH_ROWS_SQL = f'''
+    SELECT w.id_stacji, s.stacja, w.observed_at,
+           {", ".join(f"w.{column}" for column in MEASUREMENT_COLUMNS)}, w.{QC_FLAGS_COLUMN}
+    FROM weather_data w
+    JOIN stations s ON s.id_stacji = w.id_stacji
+    WHERE w.observed_at >= ? AND w.observed_at < ?
+    ORDER BY w.id_stacji, w.observed_at
+'''
+
+if pa is not None:
+    TIMESTAMP_TYPE = pa.timestamp("s", tz="UTC")
+    RECORD_SCHEMA = pa.schema([
+        pa.field("id_stacji", pa.string(), nullable=False),
+        pa.field("stacja", pa.string()),
+        pa.field("observed_at", TIMESTAMP_TYPE, nullable=False),
+        *(pa.field(column, pa.float64()) for column in MEASUREMENT_COLUMNS),
+        pa.field(QC_FLAGS_COLUMN, pa.int32(), nullable=False)
+    ])
+
+
+def available() -> bool:
+    return pa is not None
+
+
+def partition_name(month: int, file_format: str = "arrow") -> str:
+    """Nazwa pliku miesiąca (kubełek RRRRMM)"""
+    year, number = divmod(month, 100)
+    return f"weather_data_{year:04d}-{number:02d}.{file_format}"
+
+
+def month_hours(month: int) -> Tuple[int, int]:
+    """Zakres godzin miesiąca [pierwsza, pierwsza następnego miesiąca)"""
+    first_day, last_day = month_bucket_days(month)
+    return first_day * 24, (last_day + 1) * 24
+
+
+def hour_to_month(hour: int) -> int:
+    return day_to_month_bucket(hour // 24)
+
+
+def months_between(start_hour: int, end_hour: int) -> List[int]:
+    """Kubełki RRRRMM miesięcy zawierających godziny z zakresu [start_hour, end_hour)"""
+    months = []
+    hour = start_hour
+    while hour < end_hour:
+        month = hour_to_month(hour)
+        months.append(month)
+        hour = month_hours(month)[1]
+    return months
+
+
+def rows_to_batches(rows: Sequence[tuple]) -> Dict[str, "pa.RecordBatch"]:
+    """Wiersze (id_stacji, stacja, observed_at, *pomiary, qc_flags) posortowane po stacji -> blok na stację"""
+    batches = {}
+    for station_id, station_rows in groupby(rows, key=lambda row: row[0]):
+        columns = list(zip(*station_rows))
+        batches[station_id] = pa.RecordBatch.from_arrays([
+            pa.array(columns[0], type=pa.string()),
+            pa.array(columns[1], type=pa.string()),
+            pa.array(np.asarray(columns[2], dtype=np.int64) * 3600, type=TIMESTAMP_TYPE),
+            *(pa.array(values, type=pa.float64()) for values in columns[3:-1]),
+            pa.array(columns[-1], type=pa.int32())
+        ], schema=RECORD_SCHEMA)
+    return batches
+
+
+def conform_batch(batch: "pa.RecordBatch") -> "pa.RecordBatch":
+    """Blok w schemacie RECORD_SCHEMA; plikom sprzed kontroli jakości dopisywane jest qc_flags = 0"""
+    columns = batch.columns
+    if QC_FLAGS_COLUMN not in batch.schema.names:
+        columns = [*columns, pa.array(np.zeros(batch.num_rows, dtype=np.int32))]
+    return pa.RecordBatch.from_arrays(columns, schema=RECORD_SCHEMA)
+
+
+def batch_hours(batch: "pa.RecordBatch") -> np.ndarray:
+    """Godziny od epoki dla wierszy bloku"""
+    return batch.column("observed_at").cast(pa.int64()).to_numpy() // 3600
+
+
+def write_partition(path: str, batches: Dict[str, "pa.RecordBatch"], file_format: str = "arrow"):
+    """Zapisuje plik miesiąca w całości (plik tymczasowy + rename), stacje w kolejności identyfikatorów"""
+    stations = sorted(batches)
+    schema = RECORD_SCHEMA.with_metadata({"stations": json.dumps(stations)})
+    temporary = f"{path}.tmp"
+    if file_format == "arrow":
+        # Bez kompresji - plik czytany jest przez mmap bez dekodowania
+        with pa.OSFile(temporary, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            for station_id in stations:
+                writer.write_batch(batches[station_id])
+    else:
+        with pq.ParquetWriter(temporary, schema, compression="zstd") as writer:
+            for station_id in stations:
+                writer.write_table(pa.Table.from_batches([batches[station_id]]))
+    os.replace(temporary, path)
+
+
+def merge_batches(old: "pa.RecordBatch", new: "pa.RecordBatch") -> "pa.RecordBatch":
+    """Blok stacji z dwóch źródeł; przy tej samej godzinie obowiązuje wiersz z `new`"""
+    keep = ~np.isin(batch_hours(old), batch_hours(new))
+    old = conform_batch(old).filter(pa.array(keep))
+    table = pa.Table.from_batches([old, new]).sort_by("observed_at").combine_chunks()
+    return table.to_batches()[0] if table.num_rows else new
+
+
+class Partition:
+    """Plik Arrow jednego miesiąca otwarty przez mmap"""
+
+    def __init__(self, month: int, path: str):
+        self.month = month
+        self.path = path
+        self.first_hour, self.end_hour = month_hours(month)
+        self._reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+        metadata = self._reader.schema.metadata or {}
+        order = json.loads(metadata.get(b"stations", b"[]"))
+        self._positions = {station_id: i for i, station_id in enumerate(order)}
+        self._hours: Dict[str, np.ndarray] = {}
+
+    @property
+    def station_ids(self) -> List[str]:
+        return sorted(self._positions)
+
+    def batches(self, stations: Optional[Sequence[str]] = None) -> Iterator[Tuple[str, "pa.RecordBatch"]]:
+        """Bloki wybranych stacji w kolejności identyfikatorów"""
+        station_ids = self.station_ids if not stations else sorted(set(stations) & self._positions.keys())
+        for station_id in station_ids:
+            yield station_id, self._reader.get_batch(self._positions[station_id])
+
+    def hours(self, station_id: str, batch: "pa.RecordBatch") -> np.ndarray:
+        hours = self._hours.get(station_id)
+        if hours is None:
+            hours = self._hours[station_id] = batch_hours(batch)
+        return hours
+
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+
+class ColdStore:
+    """Odczyt danych historycznych z archiwum Arrow (dane zimne) i SQLite (dane bieżące)
+
+    Bez włączonego archiwum (lub bez pyarrow) wszystkie zapytania trafiają do SQLite.
+    Lista plików sprawdzana jest nie częściej niż co `check_interval` sekund, więc
+    miesiąc zarchiwizowany przez proces-lidera widoczny jest we wszystkich procesach API.
+    """
+
+    def __init__(self, db_manager: DatabaseManager,
+                 directory: str = Config.COLD_STORE_DIR,
+                 enabled: bool = Config.COLD_STORE,
+                 check_interval: float = Config.CHANGE_POLL_INTERVAL):
+        self.db_manager = db_manager
+        self.directory = directory
+        self.check_interval = check_interval
+        self.enabled = enabled and available()
+        if enabled and not available():
+            logger.error("COLD_STORE wymaga pakietu pyarrow - archiwum kolumnowe wyłączone")
+        self._lock = threading.Lock()
+        self._partitions: Dict[int, Partition] = {}
+        self._files: Dict[str, Tuple[int, int]] = {}
+        self._checked_at = 0.0
+        self.cold_pages = 0
+        self.cold_series = 0
+
+    def partitions(self) -> Dict[int, Partition]:
+        """Otwarte pliki miesięcy (kubełek RRRRMM -> plik); ponownie otwierane po zmianie"""
+        if not self.enabled:
+            return {}
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return self._partitions
+            self._checked_at = now
+            files = {}
+            try:
+                with os.scandir(self.directory) as entries:
+                    for entry in entries:
+                        match = PARTITION_PATTERN.match(entry.name)
+                        if match and match.group(3) == "arrow":
+                            stat = entry.stat()
+                            files[entry.path] = (stat.st_mtime_ns, stat.st_size)
+            except FileNotFoundError:
+                pass
+            if files != self._files:
+                partitions = {}
+                for path in files:
+                    match = PARTITION_PATTERN.match(os.path.basename(path))
+                    month = int(match.group(1)) * 100 + int(match.group(2))
+                    previous = self._partitions.get(month)
+                    if previous is not None and self._files.get(path) == files[path]:
+                        partitions[month] = previous
+                        continue
+                    try:
+                        partitions[month] = Partition(month, path)
+                    except (OSError, pa.ArrowInvalid) as e:
+                        logger.error(f"Błąd podczas otwierania pliku archiwum {path}: {str(e)}")
+                self._partitions = partitions
+                self._files = files
+            return self._partitions
+
+    def boundary_hour(self) -> Optional[int]:
+        """Pierwsza godzina po najnowszym zarchiwizowanym miesiącu (None - archiwum puste)"""
+        partitions = self.partitions()
+        if not partitions:
+            return None
+        return partitions[max(partitions)].end_hour
+
+    def store_month(self, month: int, rows: Sequence[tuple]) -> str:
+        """Zapisuje wiersze miesiąca (MONTH_ROWS_SQL) do archiwum, łącząc je z istniejącym plikiem"""
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, partition_name(month))
+        batches = rows_to_batches(rows)
+        if os.path.exists(path):
+            for station_id, batch in Partition(month, path).batches():
+                batches[station_id] = merge_batches(batch, batches[station_id]) \
+                    if station_id in batches else conform_batch(batch)
+        write_partition(path, batches)
+        with self._lock:
+            self._checked_at = 0.0
+        return path
+
+    def historical_page(self, days_back: int = 7,
+                        stations: Optional[List[str]] = None,
+                        parameters: Optional[List[str]] = None,
+                        after: Optional[Tuple[int, str]] = None,
+                        limit: int = Config.MAX_RECORDS_PER_REQUEST,
+                        clean_only: bool = False
+                        ) -> Tuple[List[dict], Optional[Tuple[int, str]]]:
+        """Jak DatabaseManager.get_historical_page, ale godziny sprzed granicy archiwum czytane są z plików"""
+        boundary = self.boundary_hour()
+        if boundary is None:
+            return self.db_manager.get_historical_page(
+                days_back, stations, parameters, after, limit, clean_only=clean_only
+            )
+
+        records: List[dict] = []
+        if after is None or after[0] >= boundary:
+            records, next_key = self.db_manager.get_historical_page(
+                days_back, stations, parameters, after, limit, min_hour=boundary, clean_only=clean_only
+            )
+            if next_key is not None:
+                return records, next_key
+            after = None
+        start_hour = history_start_hour(days_back)
+        if start_hour >= boundary:
+            return records, None
+
+        self.cold_pages += 1
+        columns = parameters or MEASUREMENT_COLUMNS
+        unknown = set(columns) - set(MEASUREMENT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Nieznane parametry: {', '.join(sorted(unknown))}")
+        for month, partition in sorted(self.partitions().items(), reverse=True):
+            if partition.end_hour <= start_hour:
+                break
+            if after is not None and partition.first_hour > after[0]:
+                continue
+            records.extend(self._month_page(
+                partition, start_hour, stations, columns, after, limit - len(records), clean_only
+            ))
+            if len(records) >= limit:
+                break
+
+        next_key = None
+        if len(records) == limit:
+            last = records[-1]
+            next_key = (last.pop("_observed_at"), last["id_stacji"])
+        for record in records:
+            record.pop("_observed_at", None)
+        return records, next_key
+
+    def _month_page(self, partition: Partition, start_hour: int, stations: Optional[List[str]],
+                    columns: Sequence[str], after: Optional[Tuple[int, str]], limit: int,
+                    clean_only: bool = False) -> List[dict]:
+        """Najnowsze wiersze miesiąca w kolejności (observed_at, id_stacji) malejąco"""
+        selected = []
+        for station_id, batch in partition.batches(stations):
+            hours = partition.hours(station_id, batch)
+            mask = hours >= start_hour
+            if after is not None:
+                mask &= hours <= after[0] if station_id < after[1] else hours < after[0]
+            # Pliki sprzed kontroli jakości nie mają qc_flags - wszystkie wiersze są bez oznaczeń
+            if clean_only and QC_FLAGS_COLUMN in batch.schema.names:
+                mask &= batch.column(QC_FLAGS_COLUMN).to_numpy() == 0
+            rows = np.flatnonzero(mask)
+            if len(rows):
+                selected.append((station_id, batch, hours, rows))
+        if not selected:
+            return []
+
+        hours = np.concatenate([station_hours[rows] for _, _, station_hours, rows in selected])
+        ranks = np.concatenate([np.full(len(rows), rank) for rank, (_, _, _, rows) in enumerate(selected)])
+        positions = np.concatenate([rows for _, _, _, rows in selected])
+        order = np.lexsort((-ranks, -hours))[:limit]
+        hours, ranks, positions = hours[order], ranks[order], positions[order]
+
+        # Wartości wybranych wierszy zbierane kolumnami, blok po bloku
+        values = np.empty((len(columns), len(order)))
+        names = {}
+        for rank in np.unique(ranks).tolist():
+            station_id, batch, _, _ = selected[rank]
+            rows = ranks == rank
+            names[rank] = batch.column("stacja")[0].as_py()
+            for c, column in enumerate(columns):
+                values[c, rows] = batch.column(column).to_numpy(zero_copy_only=False)[positions[rows]]
+
+        records = []
+        dates = {}
+        for observed_at, rank, row in zip(hours.tolist(), ranks.tolist(), values.T.tolist()):
+            if observed_at not in dates:
+                dates[observed_at] = from_observed_at(observed_at)
+            data_pomiaru, godzina_pomiaru = dates[observed_at]
+            record = {
+                "id_stacji": selected[rank][0],
+                "stacja": names[rank],
+                "data_pomiaru": data_pomiaru,
+                "godzina_pomiaru": godzina_pomiaru,
+                "_observed_at": observed_at
+            }
+            for column, value in zip(columns, row):
+                record[column] = None if value != value else format_value(value)
+            records.append(record)
+        return records
+
+    def iter_historical_data(self, days_back: int = 7,
+                             stations: Optional[List[str]] = None,
+                             parameters: Optional[List[str]] = None,
+                             chunk_size: int = 5000, clean_only: bool = False) -> Iterator[dict]:
+        """Strumień danych historycznych w stałej pamięci (kolejne strony po kluczu)"""
+        after = None
+        while True:
+            records, after = self.historical_page(days_back, stations, parameters, after, chunk_size, clean_only)
+            yield from records
+            if after is None:
+                return
+
+    def fill_series(self, values: np.ndarray, start_hour: int, end_hour: int, station_ids: Sequence[str]):
+        """Wpisuje pomiary z archiwum do tablicy values[parametr, stacja, godzina - start_hour]"""
+        self.cold_series += 1
+        station_index = {station_id: i for i, station_id in enumerate(station_ids)}
+        for month, partition in sorted(self.partitions().items()):
+            if partition.end_hour <= start_hour or partition.first_hour >= end_hour:
+                continue
+            for station_id, batch in partition.batches(station_ids):
+                hours = partition.hours(station_id, batch)
+                inside = np.flatnonzero((hours >= start_hour) & (hours < end_hour))
+                if not len(inside):
+                    continue
+                targets = hours[inside] - start_hour
+                for p, column in enumerate(MEASUREMENT_COLUMNS):
+                    array = batch.column(column).to_numpy(zero_copy_only=False)
+                    values[p, station_index[station_id], targets] = array[inside]
+
+    def stats(self) -> dict:
+        partitions = self.partitions()
+        return {
+            "enabled": self.enabled,
+            "partitions": len(partitions),
+            "first_month": min(partitions) if partitions else None,
+            "boundary": self.boundary_hour(),
+            "bytes": sum(partition.size() for partition in partitions.values()),
+            "cold_pages": self.cold_pages,
+            "cold_series": self.cold_series
+        }
+
+
+def export_columnar(db_manager: DatabaseManager, cold_store: Optional[ColdStore], directory: str,
+                    file_format: str = "parquet", days_back: Optional[int] = None,
+                    overwrite: bool = False) -> Dict[str, int]:
+    """Eksport pomiarów (SQLite i archiwum Arrow) do plików miesięcznych w katalogu `directory`
+
+    Istniejące pliki miesięcy są pomijane (overwrite=False), z wyjątkiem miesiąca bieżącego.
+    Zwraca liczbę zapisanych i pominiętych plików oraz wierszy.
+    """
+    if not available():
+        raise RuntimeError("Eksport kolumnowy wymaga pakietu pyarrow")
+    if file_format not in COLUMNAR_FORMATS:
+        raise ValueError(f"Nieznany format: {file_format} (dostępne: {', '.join(COLUMNAR_FORMATS)})")
+    os.makedirs(directory, exist_ok=True)
+
+    partitions = cold_store.partitions() if cold_store is not None else {}
+    boundary = cold_store.boundary_hour() if cold_store is not None else None
+    with db_manager.pool.reader() as conn:
+        first_hour = conn.execute("SELECT MIN(observed_at) FROM weather_data").fetchone()[0]
+    now_hour = int(time.time()) // 3600
+    starts = [hour for hour in (first_hour, *(partition.first_hour for partition in partitions.values()))
+              if hour is not None]
+    if not starts:
+        return {"files_written": 0, "files_skipped": 0, "rows": 0}
+    start_hour = min(starts)
+    if days_back is not None:
+        start_hour = max(start_hour, history_start_hour(days_back))
+
+    report = {"files_written": 0, "files_skipped": 0, "rows": 0}
+    current_month = hour_to_month(now_hour)
+    for month in months_between(start_hour, now_hour + 1):
+        path = os.path.join(directory, partition_name(month, file_format))
+        if os.path.exists(path) and not overwrite and month != current_month:
+            report["files_skipped"] += 1
+            continue
+        first, end = month_hours(month)
+        if boundary is not None and end <= boundary:
+            partition = partitions.get(month)
+            batches = {
+                station_id: conform_batch(batch) for station_id, batch in partition.batches()
+            } if partition is not None else {}
+        else:
+            with db_manager.pool.reader() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                rows = cursor.execute(MONTH_ROWS_SQL, (max(first, boundary or first), end)).fetchall()
+            batches = rows_to_batches(rows)
+        if not batches:
+            continue
+        write_partition(path, batches, file_format)
+        report["files_written"] += 1
+        report["rows"] += sum(batch.num_rows for batch in batches.values())
+        logger.info(f"Zapisano {path}")
+    return report
@@ -1,8 +1,37 @@
 # Konfiguracja aplikacji IMGW Weather
 # config.py
 
+import math
 import os
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
+
+# Kolor temperatury spoza zdefiniowanych zakresów
+DEFAULT_TEMPERATURE_COLOR = "#757575"
+
+def build_wind_direction_table(directions: Dict[str, str]) -> Tuple[str, ...]:
+    """Nazwa kierunku dla każdego pełnego stopnia 0-360 (najbliższy klucz mapowania)"""
+    return tuple(
+        directions[min(directions.keys(), key=lambda x: abs(int(x) - deg))]
+        for deg in range(361)
+    )
+
+def build_temperature_color_table(ranges: Dict[str, Any]) -> Tuple[int, Tuple[str, ...]]:
+    """Kolor dla każdego pełnego stopnia od najniższej do najwyższej granicy zakresów
+    
+    Granice zakresów są pełnymi stopniami, więc o kolorze decyduje część całkowita
+    temperatury (floor). Zwraca najniższą granicę i tablicę kolorów.
+    """
+    low = min(int(config["min"]) for config in ranges.values())
+    high = max(int(config["max"]) for config in ranges.values())
+    table = []
+    for degree in range(low, high):
+        color = DEFAULT_TEMPERATURE_COLOR
+        for config in ranges.values():
+            if config["min"] <= degree < config["max"]:
+                color = config["color"]
+                break
+        table.append(color)
+    return low, tuple(table)
 
 class Config:
     """Klasa konfiguracji aplikacji"""
@@ -10,16 +39,38 @@ class Config:
     # Konfiguracja bazy danych
     DATABASE_PATH: str = os.getenv("DATABASE_PATH", "weather_data.db")
     DATABASE_BACKUP_INTERVAL: int = int(os.getenv("DATABASE_BACKUP_INTERVAL", "24"))  # godziny
+    DB_MMAP_SIZE: int = int(os.getenv("DB_MMAP_SIZE", "268435456"))  # bajty (256MB)
+    DB_CACHE_SIZE_KB: int = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))  # na połączenie
+    DB_BUSY_TIMEOUT: float = float(os.getenv("DB_BUSY_TIMEOUT", "5"))  # sekundy
     
     # Konfiguracja API IMGW
-    IMGW_API_URL: str = "https://danepubliczne.imgw.pl/api/data/synop"
+    IMGW_API_URL: str = os.getenv("IMGW_API_URL", "https://danepubliczne.imgw.pl/api/data/synop")
     API_TIMEOUT: int = int(os.getenv("API_TIMEOUT", "30"))  # sekundy
+    API_MAX_RETRIES: int = int(os.getenv("API_MAX_RETRIES", "3"))
+    API_RETRY_BACKOFF: float = float(os.getenv("API_RETRY_BACKOFF", "2.0"))  # sekundy, podwajane co próbę
     DATA_FETCH_INTERVAL: int = int(os.getenv("DATA_FETCH_INTERVAL", "60"))  # minuty
+    MIN_REFRESH_INTERVAL: int = int(os.getenv("MIN_REFRESH_INTERVAL", "60"))  # sekundy między pobraniami
+
+    # Wiele procesów API: kto pobiera dane (lock | external | embedded, opis w ingest.py)
+    INGEST_MODE: str = os.getenv("INGEST_MODE", "lock")
+    INGEST_LOCK_RETRY: int = int(os.getenv("INGEST_LOCK_RETRY", "30"))  # sekundy
+    CHANGE_POLL_INTERVAL: float = float(os.getenv("CHANGE_POLL_INTERVAL", "1.0"))  # sekundy
+
+    # Kanał zmian /api/weather/stream (Server-Sent Events)
+    STREAM_MAX_SUBSCRIBERS: int = int(os.getenv("STREAM_MAX_SUBSCRIBERS", "5000"))
+    STREAM_QUEUE_SIZE: int = int(os.getenv("STREAM_QUEUE_SIZE", "16"))  # zaległe zdarzenia na klienta
+    STREAM_HEARTBEAT: int = int(os.getenv("STREAM_HEARTBEAT", "20"))  # sekundy
+    STREAM_RETRY_MS: int = int(os.getenv("STREAM_RETRY_MS", "10000"))  # opóźnienie ponownego połączenia
     
     # Konfiguracja serwera
     HOST: str = os.getenv("HOST", "0.0.0.0")
     PORT: int = int(os.getenv("PORT", "8000"))
     DEBUG: bool = os.getenv("DEBUG", "False").lower() == "true"
+    # Procesy API uvicorna (python main.py; w usłudze systemd opcja --workers $WORKERS)
+    WORKERS: int = int(os.getenv("WORKERS", "1"))
+    # Wypełnianie pamięci podręcznych (indeks stacji, aktualne dane, analizy) w tle po starcie serwera;
+    # bez rozgrzewki wypełnia je pierwsze zapytanie (plik stacji wczytuje lider niezależnie od niej)
+    STARTUP_WARMUP: bool = os.getenv("STARTUP_WARMUP", "true").lower() == "true"
     
     # Konfiguracja logowania
     LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
@@ -30,32 +81,26 @@ class Config:
     # Konfiguracja historii danych
     DATA_RETENTION_DAYS: int = int(os.getenv("DATA_RETENTION_DAYS", "365"))
     MAX_RECORDS_PER_REQUEST: int = int(os.getenv("MAX_RECORDS_PER_REQUEST", "1000"))
+    API_LOGS_RETENTION_DAYS: int = int(os.getenv("API_LOGS_RETENTION_DAYS", "30"))
+    ARCHIVE_DIR: str = os.getenv("ARCHIVE_DIR", "archiwum")
+    BACKUP_DIR: str = os.getenv("BACKUP_DIR", "backupy")
+    BACKUP_KEEP: int = int(os.getenv("BACKUP_KEEP", "7"))  # liczba przechowywanych backupów
+    MAINTENANCE_INTERVAL: int = int(os.getenv("MAINTENANCE_INTERVAL", "24"))  # godziny
+    MAINTENANCE_BATCH_SIZE: int = int(os.getenv("MAINTENANCE_BATCH_SIZE", "5000"))
+    
+    # Archiwum kolumnowe (Arrow, wymaga pyarrow) zamiast CSV dla danych starszych niż retencja - opis w columnar.py
+    COLD_STORE: bool = os.getenv("COLD_STORE", "False").lower() == "true"
+    COLD_STORE_DIR: str = os.getenv("COLD_STORE_DIR", "archiwum_arrow")
+    COLD_STORE_MAX_DAYS: int = int(os.getenv("COLD_STORE_MAX_DAYS", "3650"))  # najdłuższy okres zapytań
     
     # Konfiguracja bezpieczeństwa
     ALLOWED_HOSTS: list = os.getenv("ALLOWED_HOSTS", "*").split(",")
     CORS_ORIGINS: list = os.getenv("CORS_ORIGINS", "*").split(",")
     
-    # Współrzędne geograficzne głównych stacji (do mapy)
-    STATION_COORDINATES: Dict[str, Dict[str, float]] = {
-        "12295": {"lat": 53.1325, "lon": 23.1688, "name": "Białystok"},
-        "12600": {"lat": 49.8224, "lon": 19.0444, "name": "Bielsko Biała"},
-        "12235": {"lat": 53.6983, "lon": 17.5583, "name": "Chojnice"},
-        "12550": {"lat": 50.8118, "lon": 19.1203, "name": "Częstochowa"},
-        "12160": {"lat": 54.1522, "lon": 19.4044, "name": "Elbląg"},
-        "12375": {"lat": 52.2297, "lon": 21.0122, "name": "Warszawa"},
-        "12566": {"lat": 50.0647, "lon": 19.9450, "name": "Kraków"},
-        "12115": {"lat": 54.3520, "lon": 18.6466, "name": "Gdańsk"},
-        "12250": {"lat": 52.4064, "lon": 16.9252, "name": "Poznań"},
-        "12424": {"lat": 51.7520, "lon": 19.4660, "name": "Łódź"},
-        "12560": {"lat": 50.2649, "lon": 19.0238, "name": "Katowice"},
-        "12465": {"lat": 51.2465, "lon": 22.5684, "name": "Lublin"},
-        "12400": {"lat": 51.1079, "lon": 17.0385, "name": "Wrocław"},
-        "12185": {"lat": 54.7158, "lon": 20.5060, "name": "Olsztyn"},
-        "12595": {"lat": 49.9747, "lon": 20.4568, "name": "Nowy Sącz"},
-        "12210": {"lat": 53.7784, "lon": 15.7201, "name": "Szczecin"},
-        "12495": {"lat": 50.8551, "lon": 20.6289, "name": "Kielce"},
-        "12125": {"lat": 54.4773, "lon": 17.0322, "name": "Słupsk"}
-    }
+    # Współrzędne stacji synoptycznych (wczytywane do tabeli stations, opis w stations.py)
+    STATIONS_FILE: str = os.getenv(
+        "STATIONS_FILE", os.path.join(os.path.dirname(os.path.abspath(__file__)), "stacje.csv")
+    )
     
     # Mapowanie kierunków wiatru
     WIND_DIRECTIONS: Dict[str, str] = {
@@ -81,30 +126,30 @@ class Config:
         "extreme_hot": {"min": 40, "max": 50, "color": "#B71C1C"}
     }
     
+    # Tablice wyliczone raz przy starcie - klasyfikacja pojedynczej wartości w czasie stałym
+    WIND_DIRECTION_TABLE: Tuple[str, ...] = build_wind_direction_table(WIND_DIRECTIONS)
+    TEMPERATURE_COLOR_OFFSET, TEMPERATURE_COLOR_TABLE = build_temperature_color_table(TEMPERATURE_COLORS)
+    
     @classmethod
     def get_temperature_color(cls, temperature: float) -> str:
         """Zwraca kolor dla danej temperatury"""
-        for _, config in cls.TEMPERATURE_COLORS.items():
-            if config["min"] <= temperature < config["max"]:
-                return config["color"]
-        return "#757575"  # Domyślny kolor szary
+        try:
+            index = math.floor(temperature) - cls.TEMPERATURE_COLOR_OFFSET
+        except (TypeError, ValueError, OverflowError):
+            return DEFAULT_TEMPERATURE_COLOR
+        if 0 <= index < len(cls.TEMPERATURE_COLOR_TABLE):
+            return cls.TEMPERATURE_COLOR_TABLE[index]
+        return DEFAULT_TEMPERATURE_COLOR  # Domyślny kolor szary
     
     @classmethod
     def get_wind_direction_name(cls, degrees: str) -> str:
         """Zwraca nazwę kierunku wiatru na podstawie stopni"""
         try:
             deg = int(float(degrees))
-            # Znajdź najbliższy kierunek
-            closest = min(cls.WIND_DIRECTIONS.keys(), 
-                         key=lambda x: abs(int(x) - deg))
-            return cls.WIND_DIRECTIONS[closest]
-        except (ValueError, KeyError):
+        except (TypeError, ValueError, OverflowError):
             return "N/A"
-    
-    @classmethod
-    def get_station_coordinates(cls, station_id: str) -> Dict[str, float]:
-        """Zwraca współrzędne stacji meteorologicznej"""
-        return cls.STATION_COORDINATES.get(station_id, {"lat": 52.0, "lon": 20.0})
+        # Wartości spoza 0-360 mają najbliższy kierunek na krańcu tablicy (N)
+        return cls.WIND_DIRECTION_TABLE[min(max(deg, 0), 360)]
 
 # Dodatkowe stałe
 class Constants:
@@ -143,6 +188,16 @@ class Constants:
         "suma_opadu": {"min": 0, "max": 200},
         "cisnienie": {"min": 900, "max": 1100}
     }
+    
+    # Największa zmiana na godzinę względem poprzedniego pomiaru stacji (kontrola skoków, quality.py);
+    # kierunek wiatru i suma opadu zmieniają się skokowo, więc nie są sprawdzane
+    SPIKE_LIMITS = {
+        "temperatura": 8,
+        "predkosc_wiatru": 20,
+        "wilgotnosc_wzgledna": 50,
+        "cisnienie": 6
+    }
+    SPIKE_MAX_GAP_HOURS = 3
 
 # Eksport konfiguracji
 config = Config()
@@ -0,0 +1,1104 @@
+# Warstwa bazy danych aplikacji IMGW Weather - SQLite
+# database.py
+
+import sqlite3
+import calendar
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from config import Config, Constants
+from metrics import DB_QUERY_SECONDS, timed
+
+logger = logging.getLogger(__name__)
+
+# Kolumny pomiarowe przechowywane jako REAL (kolejność jak w Constants.PARAMETER_NAMES)
+MEASUREMENT_COLUMNS: Tuple[str, ...] = tuple(Constants.PARAMETER_NAMES)
+
+# Maska wyników kontroli jakości (quality.py); 0 - bez zastrzeżeń
+QC_FLAGS_COLUMN = "qc_flags"
+# Kolumny zapisywane razem z kluczem (id_stacji, observed_at)
+STORED_COLUMNS: Tuple[str, ...] = (*MEASUREMENT_COLUMNS, QC_FLAGS_COLUMN)
+
+# Indeks częściowy tylko z oznaczonymi pomiarami - mały, bo większość wierszy ma qc_flags = 0
+FLAGGED_INDEX_SQL = f"CREATE INDEX IF NOT EXISTS idx_weather_data_flagged ON weather_data (observed_at) WHERE {QC_FLAGS_COLUMN} != 0"
+
+# Indeks pomocniczy - usuwany na czas importu archiwum (backfill.py) i tworzony ponownie po nim
+OBSERVED_AT_INDEX = "idx_weather_data_observed_at"
+OBSERVED_AT_INDEX_SQL = f"CREATE INDEX IF NOT EXISTS {OBSERVED_AT_INDEX} ON weather_data (observed_at)"
+
+# Schemat: wymiar stacji + pomiary kluczowane (stacja, godzina od epoki UTC)
+SCHEMA_SQL = f'''
+    CREATE TABLE IF NOT EXISTS stations (
+        id_stacji TEXT PRIMARY KEY,
+        stacja TEXT NOT NULL,
+        lat REAL,
+        lon REAL
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS weather_data (
+        id_stacji TEXT NOT NULL REFERENCES stations(id_stacji),
+        observed_at INTEGER NOT NULL,
+        {", ".join(f"{column} REAL" for column in MEASUREMENT_COLUMNS)},
+        {QC_FLAGS_COLUMN} INTEGER NOT NULL DEFAULT 0,
+        timestamp_dodania TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id_stacji, observed_at)
+    ) WITHOUT ROWID;
+
+    {OBSERVED_AT_INDEX_SQL};
+
+    CREATE TABLE IF NOT EXISTS latest_observation (
+        id_stacji TEXT PRIMARY KEY REFERENCES stations(id_stacji),
+        observed_at INTEGER NOT NULL,
+        {", ".join(f"{column} REAL" for column in MEASUREMENT_COLUMNS)}
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS rollup_daily (
+        id_stacji TEXT NOT NULL,
+        parameter TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        sum REAL,
+        min REAL,
+        max REAL,
+        PRIMARY KEY (id_stacji, parameter, bucket)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS rollup_monthly (
+        id_stacji TEXT NOT NULL,
+        parameter TEXT NOT NULL,
+        bucket INTEGER NOT NULL,
+        count INTEGER NOT NULL,
+        sum REAL,
+        min REAL,
+        max REAL,
+        PRIMARY KEY (id_stacji, parameter, bucket)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS api_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        status TEXT,
+        records_count INTEGER,
+        error_message TEXT,
+        records_inserted INTEGER,
+        records_updated INTEGER,
+        records_unchanged INTEGER
+    );
+
+    -- Numer wersji danych: zmienia się przy każdym zapisie nowych pomiarów,
+    -- pozwala procesom API wykryć zmiany dokonane przez proces pobierający
+    CREATE TABLE IF NOT EXISTS data_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        generation INTEGER NOT NULL,
+        updated_at TEXT
+    );
+    INSERT OR IGNORE INTO data_version (id, generation) VALUES (1, 0);
+
+    -- Od której godziny (observed_at) zmieniły się dane w danej wersji; 0 = wszystkie
+    CREATE TABLE IF NOT EXISTS data_changes (
+        generation INTEGER PRIMARY KEY,
+        changed_from INTEGER NOT NULL
+    );
+
+    -- Zaimportowane pliki archiwum (backfill.py) - ponowny import pomija je
+    CREATE TABLE IF NOT EXISTS import_checkpoints (
+        source TEXT PRIMARY KEY,
+        source_size INTEGER NOT NULL,
+        source_mtime REAL NOT NULL,
+        rows INTEGER NOT NULL,
+        imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) WITHOUT ROWID;
+
+    -- Rozmiar plików archiwum CSV.gz (maintenance.py) zatwierdzony razem z usunięciem
+    -- zarchiwizowanych wierszy - dopisane dane niezatwierdzonej paczki są obcinane
+    CREATE TABLE IF NOT EXISTS archive_files (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL
+    ) WITHOUT ROWID;
+
+    -- Liczby wierszy aktualizowane przy zapisie i usuwaniu - statystyki bez COUNT(*) na weather_data
+    CREATE TABLE IF NOT EXISTS row_counts (
+        table_name TEXT PRIMARY KEY,
+        rows INTEGER NOT NULL
+    ) WITHOUT ROWID;
+
+    CREATE INDEX IF NOT EXISTS idx_api_logs_timestamp ON api_logs (timestamp);
+'''
+
+BUMP_DATA_VERSION_SQL = "UPDATE data_version SET generation = generation + 1, updated_at = ? WHERE id = 1"
+LOG_DATA_CHANGE_SQL = "INSERT INTO data_changes SELECT generation, ? FROM data_version WHERE id = 1"
+
+LEGACY_TABLE = "weather_data_legacy"
+# PRAGMA user_version ustawiane przez lidera po utworzeniu schematu i odbudowie tabel pomocniczych -
+# procesy tylko do odczytu uznają wtedy bazę za gotową
+SCHEMA_VERSION = 1
+
+API_LOGS_COUNT_COLUMNS = ("records_inserted", "records_updated", "records_unchanged")
+
+ADJUST_ROW_COUNT_SQL = "UPDATE row_counts SET rows = rows + ? WHERE table_name = 'weather_data'"
+STATION_COORDINATE_COLUMNS = ("lat", "lon")
+
+
+# Warunek "wartości różnią się" (IS NOT traktuje NULL jak zwykłą wartość)
+def _values_differ(table: str, source: str, columns: Tuple[str, ...] = MEASUREMENT_COLUMNS) -> str:
+    return " OR ".join(f"{table}.{column} IS NOT {source}{column}" for column in columns)
+
+
+# Wiersze zapisu: (id_stacji, observed_at, *pomiary, qc_flags)
+INSERT_NEW_SQL = f'''
+    INSERT INTO weather_data
+    (id_stacji, observed_at, {", ".join(STORED_COLUMNS)})
+    VALUES (?, ?, {", ".join("?" for _ in STORED_COLUMNS)})
+    ON CONFLICT (id_stacji, observed_at) DO NOTHING
+'''
+
+# Parametry: nowe wartości, klucz (id_stacji, observed_at), ponownie nowe wartości do porównania
+UPDATE_CHANGED_SQL = f'''
+    UPDATE weather_data SET
+        {", ".join(f"{column} = ?" for column in STORED_COLUMNS)},
+        timestamp_dodania = CURRENT_TIMESTAMP
+    WHERE id_stacji = ? AND observed_at = ?
+      AND ({" OR ".join(f"{column} IS NOT ?" for column in STORED_COLUMNS)})
+'''
+
+# Utrzymanie tabeli najnowszych pomiarów - starszy pomiar nie nadpisuje nowszego,
+# a identyczny nie powoduje zapisu
+UPSERT_LATEST_SQL = f'''
+    INSERT INTO latest_observation
+    (id_stacji, observed_at, {", ".join(MEASUREMENT_COLUMNS)})
+    VALUES (?, ?, {", ".join("?" for _ in MEASUREMENT_COLUMNS)})
+    ON CONFLICT (id_stacji) DO UPDATE SET
+        observed_at = excluded.observed_at,
+        {", ".join(f"{column} = excluded.{column}" for column in MEASUREMENT_COLUMNS)}
+    WHERE excluded.observed_at > latest_observation.observed_at
+       OR (excluded.observed_at = latest_observation.observed_at
+           AND ({_values_differ("latest_observation", "excluded.")}))
+'''
+
+
+# Import archiwum z --replace: pomiar z archiwum zastępuje istniejący, jeśli się różni
+IMPORT_REPLACE_SQL = f'''
+    INSERT INTO weather_data
+    (id_stacji, observed_at, {", ".join(STORED_COLUMNS)})
+    VALUES (?, ?, {", ".join("?" for _ in STORED_COLUMNS)})
+    ON CONFLICT (id_stacji, observed_at) DO UPDATE SET
+        {", ".join(f"{column} = excluded.{column}" for column in STORED_COLUMNS)},
+        timestamp_dodania = CURRENT_TIMESTAMP
+    WHERE {_values_differ("weather_data", "excluded.", STORED_COLUMNS)}
+'''
+
+
+# Agregaty: rollup_daily.bucket to numer dnia od epoki (UTC), rollup_monthly.bucket to RRRRMM.
+# Przeliczenie jednego dnia stacji dla parametru - 24 wiersze odczytane po kluczu głównym
+ROLLUP_DAILY_REFRESH_SQL = {
+    column: f'''
+        INSERT OR REPLACE INTO rollup_daily (id_stacji, parameter, bucket, count, sum, min, max)
+        SELECT ?1, '{column}', ?2, COUNT({column}), SUM({column}), MIN({column}), MAX({column})
+        FROM weather_data
+        WHERE id_stacji = ?1 AND observed_at BETWEEN ?2 * 24 AND ?2 * 24 + 23
+    '''
+    for column in MEASUREMENT_COLUMNS
+}
+
+# Przeliczenie miesiąca na podstawie agregatów dziennych (?3-?4 to zakres dni miesiąca)
+ROLLUP_MONTHLY_REFRESH_SQL = '''
+    INSERT OR REPLACE INTO rollup_monthly (id_stacji, parameter, bucket, count, sum, min, max)
+    SELECT ?1, ?5, ?2, COALESCE(SUM(count), 0), SUM(sum), MIN(min), MAX(max)
+    FROM rollup_daily
+    WHERE id_stacji = ?1 AND parameter = ?5 AND bucket BETWEEN ?3 AND ?4
+'''
+
+EPOCH_DAY = date(1970, 1, 1)
+
+# Rozdzielczości agregatów: źródło danych i sposób grupowania kubełków
+AGGREGATE_RESOLUTIONS = ("hour", "day", "week", "month", "year")
+
+
+def day_to_month_bucket(day: int) -> int:
+    """Numer dnia od epoki -> kubełek miesięczny RRRRMM"""
+    moment = EPOCH_DAY + timedelta(days=day)
+    return moment.year * 100 + moment.month
+
+
+def month_bucket_days(bucket: int) -> Tuple[int, int]:
+    """Kubełek RRRRMM -> zakres numerów dni (pierwszy, ostatni)"""
+    year, month = divmod(bucket, 100)
+    first = date(year, month, 1)
+    following = date(year + month // 12, month % 12 + 1, 1)
+    return (first - EPOCH_DAY).days, (following - EPOCH_DAY).days - 1
+
+
+class UpsertResult(NamedTuple):
+    """Wynik zapisu paczki rekordów"""
+    inserted: int
+    updated: int
+    unchanged: int
+    skipped: int = 0
+
+    @property
+    def changed(self) -> int:
+        return self.inserted + self.updated
+
+
+@lru_cache(maxsize=4096)
+def _day_start_hour(data_pomiaru: str) -> int:
+    # strptime jest kosztowne, a paczka danych zawiera zwykle kilka różnych dni
+    day = datetime.strptime(data_pomiaru, Constants.DATE_FORMAT)
+    return calendar.timegm(day.timetuple()) // 3600
+
+
+def to_observed_at(data_pomiaru: str, godzina_pomiaru) -> int:
+    """Zamienia datę i godzinę pomiaru IMGW na liczbę godzin od epoki (UTC)"""
+    return _day_start_hour(data_pomiaru) + int(godzina_pomiaru)
+
+
+@lru_cache(maxsize=16384)
+def from_observed_at(observed_at: int) -> Tuple[str, str]:
+    """Zamienia godzinę od epoki na parę (data_pomiaru, godzina_pomiaru)"""
+    moment = datetime.fromtimestamp(observed_at * 3600, timezone.utc)
+    return moment.strftime(Constants.DATE_FORMAT), str(moment.hour)
+
+
+def history_start_hour(days_back: int) -> int:
+    """Pierwsza godzina okresu `days_back` dni wstecz (od początku doby UTC)"""
+    start_day = (datetime.now(timezone.utc) - timedelta(days=days_back)).strftime(Constants.DATE_FORMAT)
+    return to_observed_at(start_day, 0)
+
+
+def parse_value(value) -> Optional[float]:
+    """Zamienia wartość pomiaru (tekst z API IMGW) na liczbę lub None"""
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def format_value(value: Optional[float]) -> Optional[str]:
+    """Formatuje wartość REAL tak, jak zwraca ją API IMGW (np. "1", "20.3")"""
+    if value is None:
+        return None
+    return f"{value:g}"
+
+
+def parse_record(record: dict) -> Optional[tuple]:
+    """Zamienia rekord API IMGW na krotkę (id_stacji, observed_at, *pomiary)"""
+    try:
+        observed_at = to_observed_at(record["data_pomiaru"], record["godzina_pomiaru"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return (
+        str(record.get("id_stacji")),
+        observed_at,
+        *(parse_value(record.get(column)) for column in MEASUREMENT_COLUMNS),
+    )
+
+
+def row_to_record(row: sqlite3.Row) -> dict:
+    """Zamienia wiersz bazy na słownik w formacie API (wartości tekstowe)"""
+    data_pomiaru, godzina_pomiaru = from_observed_at(row["observed_at"])
+    record = {
+        "id_stacji": row["id_stacji"],
+        "stacja": row["stacja"],
+        "data_pomiaru": data_pomiaru,
+        "godzina_pomiaru": godzina_pomiaru,
+    }
+    # Przy wyborze podzbioru parametrów wiersz zawiera tylko wybrane kolumny
+    for column in MEASUREMENT_COLUMNS:
+        if column in row.keys():
+            record[column] = format_value(row[column])
+    return record
+
+
+def rows_to_records(rows: List[sqlite3.Row]) -> List[dict]:
+    """row_to_record dla całej strony wyników - położenie kolumn ustalane raz, a nie dla każdego wiersza"""
+    if not rows:
+        return []
+    position = {name: i for i, name in enumerate(rows[0].keys())}
+    id_index, name_index, hour_index = position["id_stacji"], position["stacja"], position["observed_at"]
+    columns = [(column, position[column]) for column in MEASUREMENT_COLUMNS if column in position]
+    records = []
+    for row in rows:
+        values = tuple(row)
+        data_pomiaru, godzina_pomiaru = from_observed_at(values[hour_index])
+        record = {
+            "id_stacji": values[id_index],
+            "stacja": values[name_index],
+            "data_pomiaru": data_pomiaru,
+            "godzina_pomiaru": godzina_pomiaru,
+        }
+        for column, index in columns:
+            value = values[index]
+            record[column] = None if value is None else f"{value:g}"
+        records.append(record)
+    return records
+
+
+def encode_cursor(key: Tuple[int, str]) -> str:
+    """Kursor stronicowania: klucz (observed_at, id_stacji) ostatniego zwróconego wiersza"""
+    return f"{key[0]}:{key[1]}"
+
+
+def decode_cursor(cursor: str) -> Tuple[int, str]:
+    """Odczytuje kursor stronicowania; ValueError dla niepoprawnej wartości"""
+    observed_at, separator, station_id = cursor.partition(":")
+    if not separator or not station_id:
+        raise ValueError(f"Niepoprawny kursor: {cursor}")
+    return int(observed_at), station_id
+
+
+class ConnectionPool:
+    """Trwałe połączenia SQLite: osobne do odczytu dla każdego wątku i jedno wspólne do zapisu"""
+
+    def __init__(self, db_path: str,
+                 mmap_size: int = Config.DB_MMAP_SIZE,
+                 cache_size_kb: int = Config.DB_CACHE_SIZE_KB,
+                 busy_timeout: float = Config.DB_BUSY_TIMEOUT,
+                 read_only: bool = False):
+        self.db_path = db_path
+        # Proces API, który nie jest liderem - nie otwiera połączenia zapisującego
+        self.read_only = read_only
+        self.mmap_size = mmap_size
+        self.cache_size_kb = cache_size_kb
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        # RLock - metody zapisujące mogą wywoływać się nawzajem
+        self._writer_lock = threading.RLock()
+
+    def _connect(self, query_only: bool) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            check_same_thread=query_only,
+            cached_statements=256
+        )
+        conn.row_factory = sqlite3.Row
+        if not query_only:
+            # Musi poprzedzać przejście na WAL; istniejącą bazę przełącza 'python manage.py vacuum'
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        # WAL: zapis nie blokuje odczytów; NORMAL jest bezpieczne dla WAL i dużo szybsze
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        conn.execute(f"PRAGMA cache_size = {-int(self.cache_size_kb)}")
+        if query_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """Połączenie tylko do odczytu przypisane do bieżącego wątku"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect(query_only=True)
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        yield conn
+
+    @contextmanager
+    def writer(self) -> Iterator[sqlite3.Connection]:
+        """Jedyne połączenie zapisujące; transakcja zatwierdzana na wyjściu z bloku"""
+        if self.read_only:
+            raise sqlite3.OperationalError("Baza otwarta tylko do odczytu - zapisuje proces-lider")
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._connect(query_only=False)
+            try:
+                yield self._writer
+                self._writer.commit()
+            except Exception:
+                self._writer.rollback()
+                raise
+
+    def close(self):
+        """Zamyka wszystkie połączenia puli"""
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._readers_lock:
+            for conn in self._readers:
+                try:
+                    conn.close()
+                except sqlite3.ProgrammingError:
+                    # Połączenie utworzone w innym wątku - zostanie zamknięte przy jego zakończeniu
+                    pass
+            self._readers.clear()
+        self._local = threading.local()
+
+
+def timed_query(method):
+    """Czas wykonania metody w histogramie imgw_db_query_duration_seconds (etykieta: nazwa metody)"""
+    return timed(DB_QUERY_SECONDS, method.__name__)(method)
+
+
+class DatabaseManager:
+    """Klasa do zarządzania bazą danych SQLite"""
+
+    def __init__(self, db_path: str, read_only: bool = False):
+        """read_only - proces API bez zapisu: schemat i tabele pomocnicze aktualizuje lider (open_for_writing)"""
+        self.db_path = db_path
+        self.pool = ConnectionPool(db_path, read_only=read_only)
+        if not read_only:
+            self.init_database()
+
+    def open_for_writing(self):
+        """Proces zostaje liderem: zapis dozwolony, schemat i tabele pomocnicze aktualizowane"""
+        self.pool.read_only = False
+        self.init_database()
+
+    def init_database(self):
+        """Inicjalizacja bazy danych i utworzenie tabel"""
+        try:
+            with self.pool.writer() as conn:
+                if self._has_legacy_schema(conn):
+                    # Stara tabela (wartości TEXT) zostaje przeniesiona do migracji wsadowej
+                    conn.execute(f"ALTER TABLE weather_data RENAME TO {LEGACY_TABLE}")
+                    logger.warning(
+                        "Wykryto stary schemat weather_data - uruchom 'python manage.py migrate'"
+                    )
+                conn.executescript(SCHEMA_SQL)
+                self._add_missing_columns(conn, "api_logs", API_LOGS_COUNT_COLUMNS)
+                self._add_missing_columns(conn, "stations", STATION_COORDINATE_COLUMNS, "REAL")
+                self._add_missing_columns(conn, "weather_data", (QC_FLAGS_COLUMN,), "INTEGER NOT NULL DEFAULT 0")
+                conn.execute(FLAGGED_INDEX_SQL)
+                if conn.execute("SELECT 1 FROM row_counts WHERE table_name = 'weather_data'").fetchone() is None:
+                    # Jednorazowe zliczenie w bazie utworzonej przez starszą wersję
+                    conn.execute("INSERT INTO row_counts SELECT 'weather_data', COUNT(*) FROM weather_data")
+                has_data = conn.execute("SELECT 1 FROM weather_data LIMIT 1").fetchone() is not None
+                needs_latest = has_data and conn.execute(
+                    "SELECT 1 FROM latest_observation LIMIT 1"
+                ).fetchone() is None
+                needs_rollups = has_data and conn.execute(
+                    "SELECT 1 FROM rollup_daily LIMIT 1"
+                ).fetchone() is None
+                logger.info("Baza danych została zainicjalizowana")
+            if needs_latest:
+                self.rebuild_latest_observations()
+            if needs_rollups:
+                self.rebuild_rollups()
+            with self.pool.writer() as conn:
+                conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        except Exception as e:
+            logger.error(f"Błąd podczas inicjalizacji bazy danych: {str(e)}")
+
+    def is_ready(self) -> bool:
+        """Schemat aktualny i tabele pomocnicze odbudowane (przez lidera)"""
+        try:
+            with self.pool.reader() as conn:
+                return conn.execute("PRAGMA user_version").fetchone()[0] >= SCHEMA_VERSION
+        except sqlite3.Error:
+            return False
+
+    @staticmethod
+    def _add_missing_columns(conn: sqlite3.Connection, table: str, columns: Tuple[str, ...],
+                             column_type: str = "INTEGER"):
+        """Dodaje kolumny brakujące w tabeli utworzonej przez starszą wersję"""
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for column in columns:
+            if column not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+    @staticmethod
+    def _has_legacy_schema(conn: sqlite3.Connection) -> bool:
+        """Sprawdza, czy weather_data ma stary schemat z kolumnami tekstowymi"""
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(weather_data)")}
+        return "data_pomiaru" in columns
+
+    def migrate_legacy_data(self, batch_size: int = 5000, pause: float = 0.0) -> int:
+        """Przenosi dane ze starej tabeli do nowego schematu w małych transakcjach"""
+        migrated = 0
+        with self.pool.reader() as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (LEGACY_TABLE,)
+            ).fetchone()
+        if not exists:
+            logger.info("Brak danych do migracji")
+            return 0
+
+        while True:
+            # Każda paczka to osobna transakcja - między paczkami zapisuje aplikacja
+            with self.pool.writer() as conn:
+                batch = self._migrate_legacy_batch(conn, batch_size)
+            if batch == 0:
+                break
+            migrated += batch
+            logger.info(f"Zmigrowano {migrated} rekordów")
+            if pause:
+                time.sleep(pause)
+
+        with self.pool.writer() as conn:
+            conn.execute(f"DROP TABLE {LEGACY_TABLE}")
+        logger.info(f"Migracja zakończona, przeniesiono {migrated} rekordów")
+        self.rebuild_latest_observations()
+        self.rebuild_rollups()
+        return migrated
+
+    def _migrate_legacy_batch(self, conn: sqlite3.Connection, batch_size: int) -> int:
+        """Migruje jedną paczkę rekordów; przeniesione wiersze są usuwane ze starej tabeli"""
+        rows = conn.execute(f'''
+            SELECT * FROM {LEGACY_TABLE}
+            ORDER BY id
+            LIMIT ?
+        ''', (batch_size,)).fetchall()
+        if not rows:
+            return 0
+
+        stations = {}
+        measurements = []
+        for row in rows:
+            record = dict(row)
+            parsed = parse_record(record)
+            if parsed is None:
+                continue
+            stations[parsed[0]] = record["stacja"]
+            # Dane sprzed kontroli jakości zapisywane są bez oznaczeń
+            measurements.append((*parsed, 0))
+
+        conn.executemany('''
+            INSERT INTO stations (id_stacji, stacja) VALUES (?, ?)
+            ON CONFLICT (id_stacji) DO UPDATE SET stacja = excluded.stacja
+        ''', stations.items())
+        # Dane zapisane już w nowym schemacie (np. przez bieżące pobieranie) mają pierwszeństwo
+        self.adjust_row_count(conn, conn.executemany(INSERT_NEW_SQL, measurements).rowcount)
+        conn.execute(
+            f"DELETE FROM {LEGACY_TABLE} WHERE id <= ?", (rows[-1]["id"],)
+        )
+        return len(rows)
+
+    @timed_query
+    def insert_weather_data(self, data: List[dict],
+                            quality_check: Optional[Callable[[List[tuple]], List[tuple]]] = None) -> UpsertResult:
+        """Wstawia dane pogodowe do bazy danych; zapisuje tylko nowe i zmienione rekordy
+        
+        quality_check (QualityControl.check) dopisuje do wierszy maskę qc_flags; bez niej
+        wiersze zapisywane są bez oznaczeń. Błąd zapisu (transakcja wycofana) przekazywany
+        jest wywołującemu - paczka nie może zostać uznana za zapisaną.
+        """
+        stations = {}
+        measurements = {}
+        skipped = 0
+        for record in data:
+            parsed = parse_record(record)
+            if parsed is None or not record.get('stacja'):
+                skipped += 1
+                continue
+            stations[parsed[0]] = record['stacja']
+            # Duplikat w tej samej paczce - obowiązuje ostatni rekord
+            measurements[parsed[:2]] = parsed
+
+        if skipped:
+            logger.warning(f"Pominięto {skipped} rekordów bez stacji lub poprawnej daty")
+        if not measurements:
+            return UpsertResult(0, 0, 0, skipped)
+
+        rows = list(measurements.values())
+        rows = quality_check(rows) if quality_check is not None else [(*row, 0) for row in rows]
+        latest = {}
+        for row in rows:
+            if row[0] not in latest or row[1] > latest[row[0]][1]:
+                latest[row[0]] = row[:-1]
+
+        with self.pool.writer() as conn:
+            conn.executemany('''
+                INSERT INTO stations (id_stacji, stacja) VALUES (?, ?)
+                ON CONFLICT (id_stacji) DO UPDATE SET stacja = excluded.stacja
+                WHERE stacja IS NOT excluded.stacja
+            ''', stations.items())
+            inserted = conn.executemany(INSERT_NEW_SQL, rows).rowcount
+            self.adjust_row_count(conn, inserted)
+            # Istniejące rekordy nadpisujemy tylko, gdy wartości faktycznie się różnią
+            updated = conn.executemany(
+                UPDATE_CHANGED_SQL,
+                [(*row[2:], row[0], row[1], *row[2:]) for row in rows]
+            ).rowcount
+            conn.executemany(UPSERT_LATEST_SQL, latest.values())
+            if inserted or updated:
+                self._refresh_rollups(conn, {(row[0], row[1] // 24) for row in rows})
+                self.bump_data_version(conn, min(row[1] for row in rows))
+
+        result = UpsertResult(inserted, updated, len(rows) - inserted - updated, skipped)
+        logger.info(
+            f"Zapisano dane: {result.inserted} nowych, {result.updated} zmienionych, "
+            f"{result.unchanged} bez zmian"
+        )
+        return result
+
+    @staticmethod
+    def _refresh_rollups(conn: sqlite3.Connection, days: set):
+        """Przelicza agregaty dzienne i miesięczne tylko dla dotkniętych par (stacja, dzień)"""
+        days = sorted(days)
+        for sql in ROLLUP_DAILY_REFRESH_SQL.values():
+            conn.executemany(sql, days)
+
+        months = {(station, day_to_month_bucket(day)) for station, day in days}
+        conn.executemany(ROLLUP_MONTHLY_REFRESH_SQL, [
+            (station, month, *month_bucket_days(month), column)
+            for station, month in sorted(months)
+            for column in MEASUREMENT_COLUMNS
+        ])
+
+    @timed_query
+    def rebuild_rollups(self) -> int:
+        """Przelicza agregaty w zakresie dostępnych danych surowych
+
+        Starsze kubełki (np. po usunięciu danych surowych) pozostają bez zmian.
+        """
+        try:
+            with self.pool.writer() as conn:
+                first_hour = conn.execute("SELECT MIN(observed_at) FROM weather_data").fetchone()[0]
+                if first_hour is None:
+                    return 0
+                first_day = first_hour // 24
+                first_month = day_to_month_bucket(first_day)
+
+                conn.execute("DELETE FROM rollup_daily WHERE bucket >= ?", (first_day,))
+                # Jeden przebieg po danych surowych dla wszystkich parametrów (tabela tymczasowa
+                # ma tylko jeden wiersz na stację i dzień)
+                conn.execute("DROP TABLE IF EXISTS temp.rollup_rebuild")
+                conn.execute(f'''
+                    CREATE TEMP TABLE rollup_rebuild AS
+                    SELECT id_stacji, observed_at / 24 AS bucket, {", ".join(
+                        f"COUNT({column}) AS {column}_count, SUM({column}) AS {column}_sum, "
+                        f"MIN({column}) AS {column}_min, MAX({column}) AS {column}_max"
+                        for column in MEASUREMENT_COLUMNS
+                    )}
+                    FROM weather_data
+                    GROUP BY id_stacji, observed_at / 24
+                ''')
+                for column in MEASUREMENT_COLUMNS:
+                    conn.execute(f'''
+                        INSERT INTO rollup_daily (id_stacji, parameter, bucket, count, sum, min, max)
+                        SELECT id_stacji, '{column}', bucket,
+                               {column}_count, {column}_sum, {column}_min, {column}_max
+                        FROM rollup_rebuild
+                    ''')
+                conn.execute("DROP TABLE temp.rollup_rebuild")
+
+                conn.execute("DELETE FROM rollup_monthly WHERE bucket >= ?", (first_month,))
+                cursor = conn.execute('''
+                    INSERT INTO rollup_monthly (id_stacji, parameter, bucket, count, sum, min, max)
+                    SELECT id_stacji, parameter,
+                           CAST(strftime('%Y%m', bucket * 86400, 'unixepoch') AS INTEGER) AS month,
+                           SUM(count), SUM(sum), MIN(min), MAX(max)
+                    FROM rollup_daily
+                    WHERE bucket >= ?
+                    GROUP BY id_stacji, parameter, month
+                ''', (month_bucket_days(first_month)[0],))
+                logger.info(f"Przeliczono {cursor.rowcount} agregatów miesięcznych")
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Błąd podczas przeliczania agregatów: {str(e)}")
+            return 0
+
+    @timed_query
+    def get_aggregates(self, resolution: str, days_back: int,
+                       stations: Optional[List[str]] = None,
+                       parameters: Optional[List[str]] = None) -> Tuple[str, List[dict]]:
+        """Agregaty (count/mean/min/max/sum) z najgrubszej tabeli spełniającej rozdzielczość
+
+        Zwraca nazwę tabeli źródłowej i listę kubełków. Koszt zależy od liczby kubełków,
+        nie od liczby surowych pomiarów (poza rozdzielczością godzinową).
+        """
+        columns = parameters or MEASUREMENT_COLUMNS
+        unknown = set(columns) - set(MEASUREMENT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Nieznane parametry: {', '.join(sorted(unknown))}")
+        if resolution not in AGGREGATE_RESOLUTIONS:
+            raise ValueError(f"Nieznana rozdzielczość: {resolution}")
+
+        start_day = (datetime.now(timezone.utc).date() - EPOCH_DAY).days - days_back
+        if resolution == "hour":
+            return "weather_data", self._hourly_aggregates(start_day, stations, columns)
+
+        if resolution in ("day", "week"):
+            table, start = "rollup_daily", start_day
+            # Tygodnie od poniedziałku (1970-01-01 był czwartkiem)
+            period = "bucket" if resolution == "day" else "((bucket + 3) / 7) * 7 - 3"
+        else:
+            table, start = "rollup_monthly", day_to_month_bucket(start_day)
+            period = "bucket" if resolution == "month" else "bucket / 100"
+
+        conditions = [f"parameter IN ({', '.join('?' for _ in columns)})", "bucket >= ?"]
+        params: list = [*columns, start]
+        if stations:
+            conditions.append(f"id_stacji IN ({', '.join('?' for _ in stations)})")
+            params.extend(stations)
+
+        with self.pool.reader() as conn:
+            rows = conn.execute(f'''
+                SELECT id_stacji, parameter, {period} AS period,
+                       SUM(count) AS count, SUM(sum) AS sum, MIN(min) AS min, MAX(max) AS max
+                FROM {table}
+                WHERE {" AND ".join(conditions)}
+                GROUP BY id_stacji, parameter, period
+                ORDER BY id_stacji, parameter, period
+            ''', params).fetchall()
+
+        return table, [
+            {
+                "id_stacji": row["id_stacji"],
+                "parameter": row["parameter"],
+                "period": self._period_label(resolution, row["period"]),
+                "count": row["count"],
+                "mean": round(row["sum"] / row["count"], 2) if row["count"] else None,
+                "min": row["min"],
+                "max": row["max"],
+                "sum": round(row["sum"], 2) if row["sum"] is not None else None,
+            }
+            for row in rows
+        ]
+
+    @staticmethod
+    def _period_label(resolution: str, period: int) -> str:
+        if resolution in ("day", "week"):
+            return (EPOCH_DAY + timedelta(days=period)).isoformat()
+        if resolution == "month":
+            return f"{period // 100:04d}-{period % 100:02d}"
+        return f"{period:04d}"
+
+    def _hourly_aggregates(self, start_day: int, stations: Optional[List[str]],
+                           columns: Tuple[str, ...]) -> List[dict]:
+        """Rozdzielczość godzinowa - pojedyncze pomiary z weather_data"""
+        conditions = ["observed_at >= ?"]
+        params: list = [start_day * 24]
+        if stations:
+            conditions.append(f"id_stacji IN ({', '.join('?' for _ in stations)})")
+            params.extend(stations)
+        with self.pool.reader() as conn:
+            rows = conn.execute(f'''
+                SELECT id_stacji, observed_at, {", ".join(columns)}
+                FROM weather_data
+                WHERE {" AND ".join(conditions)}
+                ORDER BY id_stacji, observed_at
+            ''', params).fetchall()
+
+        buckets = []
+        for column in columns:
+            for row in rows:
+                value = row[column]
+                buckets.append({
+                    "id_stacji": row["id_stacji"],
+                    "parameter": column,
+                    "period": datetime.fromtimestamp(row["observed_at"] * 3600, timezone.utc).strftime("%Y-%m-%d %H:00"),
+                    "count": int(value is not None),
+                    "mean": value,
+                    "min": value,
+                    "max": value,
+                    "sum": value,
+                })
+        buckets.sort(key=lambda bucket: (bucket["id_stacji"], bucket["parameter"]))
+        return buckets
+
+    @timed_query
+    def get_latest_data(self, limit: int = 100) -> List[dict]:
+        """Pobiera najnowsze dane pogodowe"""
+        try:
+            with self.pool.reader() as conn:
+                cursor = conn.cursor()
+
+                # Odczyt z utrzymywanej tabeli - koszt zależy od liczby stacji, nie od historii
+                cursor.execute('''
+                    SELECT s.stacja, l.* FROM latest_observation l
+                    JOIN stations s ON s.id_stacji = l.id_stacji
+                    ORDER BY s.stacja
+                    LIMIT ?
+                ''', (limit,))
+
+                rows = cursor.fetchall()
+                return rows_to_records(rows)
+
+        except Exception as e:
+            logger.error(f"Błąd podczas pobierania danych: {str(e)}")
+            return []
+
+    @timed_query
+    def get_import_checkpoints(self) -> Dict[str, Tuple[int, float]]:
+        """Zaimportowane pliki archiwum: źródło -> (rozmiar, czas modyfikacji)"""
+        with self.pool.reader() as conn:
+            return {
+                row[0]: (row[1], row[2]) for row in
+                conn.execute("SELECT source, source_size, source_mtime FROM import_checkpoints")
+            }
+
+    @timed_query
+    def import_batch(self, rows: List[tuple], stations: Dict[str, str],
+                     checkpoints: List[tuple], replace: bool = False) -> int:
+        """Zapis paczki importu archiwum w jednej transakcji razem z punktami kontrolnymi plików
+        
+        rows: (id_stacji, observed_at, *pomiary, qc_flags); checkpoints: (źródło, rozmiar, czas modyfikacji,
+        liczba wierszy pliku). Agregaty, najnowsze pomiary i wersja danych
+        aktualizowane są raz po zakończeniu importu, a przy `replace` także liczba wierszy
+        (recount_rows). Zwraca liczbę zapisanych wierszy.
+        """
+        with self.pool.writer() as conn:
+            # Nazwy z bieżącego API IMGW mają pierwszeństwo przed nazwami z archiwum
+            conn.executemany(
+                "INSERT INTO stations (id_stacji, stacja) VALUES (?, ?) ON CONFLICT (id_stacji) DO NOTHING",
+                stations.items()
+            )
+            written = conn.executemany(IMPORT_REPLACE_SQL if replace else INSERT_NEW_SQL, rows).rowcount
+            if not replace:
+                self.adjust_row_count(conn, written)
+            conn.executemany('''
+                INSERT OR REPLACE INTO import_checkpoints
+                (source, source_size, source_mtime, rows)
+                VALUES (?, ?, ?, ?)
+            ''', checkpoints)
+            return written
+
+    def drop_observed_at_index(self):
+        """Usuwa indeks pomocniczy na czas masowego importu (odtwarza go także init_database)"""
+        with self.pool.writer() as conn:
+            conn.execute(f"DROP INDEX IF EXISTS {OBSERVED_AT_INDEX}")
+
+    def create_observed_at_index(self):
+        with self.pool.writer() as conn:
+            conn.execute(OBSERVED_AT_INDEX_SQL)
+
+    @timed_query
+    def upsert_station_coordinates(self, stations: List[tuple]) -> int:
+        """Zapisuje współrzędne stacji (id_stacji, stacja, lat, lon); zwraca liczbę zmienionych stacji
+        
+        Nazwa z pliku stacji używana jest tylko dla stacji, których IMGW jeszcze nie przysłało.
+        """
+        with self.pool.writer() as conn:
+            before = conn.total_changes
+            conn.executemany('''
+                INSERT INTO stations (id_stacji, stacja, lat, lon) VALUES (?, ?, ?, ?)
+                ON CONFLICT (id_stacji) DO UPDATE SET lat = excluded.lat, lon = excluded.lon
+                WHERE lat IS NOT excluded.lat OR lon IS NOT excluded.lon
+            ''', stations)
+            return conn.total_changes - before
+
+    @timed_query
+    def get_stations(self) -> List[tuple]:
+        """Wszystkie stacje: (id_stacji, stacja, lat, lon); lat i lon mogą być NULL"""
+        with self.pool.reader() as conn:
+            return [
+                tuple(row) for row in
+                conn.execute("SELECT id_stacji, stacja, lat, lon FROM stations ORDER BY id_stacji")
+            ]
+
+    @staticmethod
+    def adjust_row_count(conn: sqlite3.Connection, delta: int):
+        """Zmiana liczby wierszy weather_data w tej samej transakcji co zapis lub usunięcie"""
+        if delta:
+            conn.execute(ADJUST_ROW_COUNT_SQL, (delta,))
+
+    def recount_rows(self) -> int:
+        """Zlicza wiersze weather_data od nowa (po imporcie z nadpisywaniem)"""
+        with self.pool.writer() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM weather_data").fetchone()[0]
+            conn.execute("INSERT OR REPLACE INTO row_counts VALUES ('weather_data', ?)", (count,))
+        return count
+
+    @staticmethod
+    def bump_data_version(conn: sqlite3.Connection, changed_from: int):
+        """Nowa wersja danych wraz z najwcześniejszą godziną, której dotyczy zmiana (w transakcji zapisu lub usunięcia)"""
+        conn.execute(BUMP_DATA_VERSION_SQL, (datetime.now(timezone.utc).isoformat(),))
+        conn.execute(LOG_DATA_CHANGE_SQL, (changed_from,))
+
+    @timed_query
+    def get_changed_from(self, generation: int) -> int:
+        """Najwcześniejsza godzina zmieniona od wersji `generation`; 0, gdy log nie sięga tak daleko"""
+        with self.pool.reader() as conn:
+            row = conn.execute(
+                "SELECT MIN(generation), MIN(changed_from) FROM data_changes WHERE generation > ?",
+                (generation,)
+            ).fetchone()
+        if row[0] is None or row[0] != generation + 1:
+            return 0
+        return row[1]
+
+    @timed_query
+    def get_data_version(self) -> Tuple[int, Optional[str]]:
+        """Numer wersji danych i czas ostatniej zmiany (współdzielone przez wszystkie procesy)"""
+        with self.pool.reader() as conn:
+            row = conn.execute("SELECT generation, updated_at FROM data_version WHERE id = 1").fetchone()
+        return (row[0], row[1]) if row else (0, None)
+
+    @timed_query
+    def rebuild_latest_observations(self) -> int:
+        """Odbudowuje tabelę latest_observation na podstawie weather_data"""
+        try:
+            with self.pool.writer() as conn:
+                conn.execute("DELETE FROM latest_observation")
+                cursor = conn.execute(f'''
+                    INSERT INTO latest_observation
+                    (id_stacji, observed_at, {", ".join(MEASUREMENT_COLUMNS)})
+                    SELECT w.id_stacji, w.observed_at, {", ".join(f"w.{column}" for column in MEASUREMENT_COLUMNS)}
+                    FROM stations s
+                    -- CROSS JOIN wymusza kolejność: dla każdej stacji jedno wyszukanie po kluczu
+                    -- zamiast przeglądania całej tabeli weather_data
+                    CROSS JOIN weather_data w ON w.id_stacji = s.id_stacji
+                    AND w.observed_at = (
+                        SELECT MAX(observed_at) FROM weather_data
+                        WHERE id_stacji = s.id_stacji
+                    )
+                ''')
+                self.bump_data_version(conn, 0)
+                logger.info(f"Odbudowano latest_observation dla {cursor.rowcount} stacji")
+                return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Błąd podczas odbudowy latest_observation: {str(e)}")
+            return 0
+
+    def get_historical_data(self, days_back: int = 7) -> List[dict]:
+        """Pobiera dane historyczne z określonego okresu"""
+        try:
+            return list(self.iter_historical_data(days_back))
+        except Exception as e:
+            logger.error(f"Błąd podczas pobierania danych historycznych: {str(e)}")
+            return []
+
+    @timed_query
+    def get_historical_page(self, days_back: int = 7,
+                            stations: Optional[List[str]] = None,
+                            parameters: Optional[List[str]] = None,
+                            after: Optional[Tuple[int, str]] = None,
+                            limit: int = Config.MAX_RECORDS_PER_REQUEST,
+                            min_hour: Optional[int] = None,
+                            clean_only: bool = False
+                            ) -> Tuple[List[dict], Optional[Tuple[int, str]]]:
+        """Jedna strona danych historycznych (od najnowszych) i klucz następnej strony
+
+        Stronicowanie po kluczu (observed_at, id_stacji) - koszt strony nie zależy od
+        jej numeru, a zapytanie korzysta z indeksu idx_weather_data_observed_at.
+        `min_hour` dodatkowo ogranicza okres (granica archiwum kolumnowego), a `clean_only`
+        pomija wiersze oznaczone przez kontrolę jakości (qc_flags != 0).
+        """
+        columns = parameters or MEASUREMENT_COLUMNS
+        unknown = set(columns) - set(MEASUREMENT_COLUMNS)
+        if unknown:
+            raise ValueError(f"Nieznane parametry: {', '.join(sorted(unknown))}")
+
+        conditions = ["w.observed_at >= ?"]
+        params: list = [max(history_start_hour(days_back), min_hour or 0)]
+        if stations:
+            conditions.append(f"w.id_stacji IN ({', '.join('?' for _ in stations)})")
+            params.extend(stations)
+        if after is not None:
+            conditions.append("(w.observed_at, w.id_stacji) < (?, ?)")
+            params.extend(after)
+        if clean_only:
+            conditions.append(f"w.{QC_FLAGS_COLUMN} = 0")
+        params.append(limit)
+
+        with self.pool.reader() as conn:
+            rows = conn.execute(f'''
+                SELECT w.id_stacji, s.stacja, w.observed_at,
+                       {", ".join(f"w.{column}" for column in columns)}
+                FROM weather_data w
+                JOIN stations s ON s.id_stacji = w.id_stacji
+                WHERE {" AND ".join(conditions)}
+                ORDER BY w.observed_at DESC, w.id_stacji DESC
+                LIMIT ?
+            ''', params).fetchall()
+
+        next_key = None
+        if len(rows) == limit:
+            next_key = (rows[-1]["observed_at"], rows[-1]["id_stacji"])
+        return rows_to_records(rows), next_key
+
+    def iter_historical_data(self, days_back: int = 7,
+                             stations: Optional[List[str]] = None,
+                             parameters: Optional[List[str]] = None,
+                             chunk_size: int = 5000, clean_only: bool = False) -> Iterator[dict]:
+        """Strumień danych historycznych w stałej pamięci (kolejne strony po kluczu)"""
+        after = None
+        while True:
+            records, after = self.get_historical_page(
+                days_back, stations, parameters, after, chunk_size, clean_only=clean_only
+            )
+            yield from records
+            if after is None:
+                return
+
+    @timed_query
+    def get_flagged_records(self, days_back: int = 7, stations: Optional[List[str]] = None,
+                            limit: int = Config.MAX_RECORDS_PER_REQUEST) -> List[dict]:
+        """Pomiary oznaczone przez kontrolę jakości (od najnowszych) - z indeksu idx_weather_data_flagged"""
+        conditions = [f"w.{QC_FLAGS_COLUMN} != 0", "w.observed_at >= ?"]
+        params: list = [history_start_hour(days_back)]
+        if stations:
+            conditions.append(f"w.id_stacji IN ({', '.join('?' for _ in stations)})")
+            params.extend(stations)
+        params.append(limit)
+
+        with self.pool.reader() as conn:
+            rows = conn.execute(f'''
+                SELECT w.id_stacji, s.stacja, w.observed_at, w.{QC_FLAGS_COLUMN},
+                       {", ".join(f"w.{column}" for column in MEASUREMENT_COLUMNS)}
+                FROM weather_data w INDEXED BY idx_weather_data_flagged
+                JOIN stations s ON s.id_stacji = w.id_stacji
+                WHERE {" AND ".join(conditions)}
+                ORDER BY w.observed_at DESC, w.id_stacji
+                LIMIT ?
+            ''', params).fetchall()
+        return [
+            {**record, QC_FLAGS_COLUMN: row[QC_FLAGS_COLUMN]}
+            for record, row in zip(rows_to_records(rows), rows)
+        ]
+
+    @timed_query
+    def log_api_call(self, status: str, records_count: int = 0, error_message: str = None,
+                     result: Optional[UpsertResult] = None):
+        """Loguje wywołanie API (opcjonalnie z liczbą nowych/zmienionych/niezmienionych rekordów)"""
+        counts = (result.inserted, result.updated, result.unchanged) if result else (None, None, None)
+        try:
+            with self.pool.writer() as conn:
+                conn.execute('''
+                    INSERT INTO api_logs (status, records_count, error_message,
+                                          records_inserted, records_updated, records_unchanged)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (status, records_count, error_message, *counts))
+        except Exception as e:
+            logger.error(f"Błąd podczas logowania API: {str(e)}")
+
+    @timed_query
+    def count_records(self) -> int:
+        """Liczba rekordów w tabeli weather_data (z tabeli row_counts)"""
+        with self.pool.reader() as conn:
+            row = conn.execute("SELECT rows FROM row_counts WHERE table_name = 'weather_data'").fetchone()
+        return row[0] if row else 0
+
+    @timed_query
+    def get_statistics(self) -> dict:
+        """Statystyki bazy danych dla /api/stats"""
+        with self.pool.reader() as conn:
+            row = conn.execute("SELECT rows FROM row_counts WHERE table_name = 'weather_data'").fetchone()
+            total_records = row[0] if row else 0
+            # Stacje z pomiarami (tabela stations zawiera też stacje z pliku współrzędnych)
+            stations_count = conn.execute("SELECT COUNT(*) FROM latest_observation").fetchone()[0]
+            last_update = conn.execute(
+                "SELECT datetime(MAX(observed_at) * 3600, 'unixepoch') FROM latest_observation"
+            ).fetchone()[0]
+            api_logs = {
+                row["status"]: row["count"] for row in conn.execute('''
+                    SELECT status, COUNT(*) as count
+                    FROM api_logs
+                    WHERE timestamp > datetime('now', '-24 hours')
+                    GROUP BY status
+                ''')
+            }
+        return {
+            "total_records": total_records,
+            "stations_count": stations_count,
+            "last_update": last_update,
+            "api_calls_24h": api_logs
+        }
+
+    def close(self):
+        self.pool.close()
@@ -0,0 +1,260 @@
+# Pobieranie danych z API IMGW
+# fetcher.py
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime, timezone
+from functools import partial
+from typing import Optional
+
+import httpx
+
+from config import Config
+from database import DatabaseManager
+from metrics import FETCH_BYTES, FETCH_RECORDS, FETCH_SECONDS
+from quality import QualityControl
+
+logger = logging.getLogger(__name__)
+
+# Kody odpowiedzi, po których ponawiamy zapytanie
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class WeatherDataFetcher:
+    """Klasa do pobierania danych z API IMGW"""
+
+    def __init__(self, db_manager: DatabaseManager, current_cache=None, broadcaster=None,
+                 api_url: str = Config.IMGW_API_URL,
+                 timeout: float = Config.API_TIMEOUT,
+                 max_retries: int = Config.API_MAX_RETRIES,
+                 retry_backoff: float = Config.API_RETRY_BACKOFF,
+                 min_refresh_interval: float = Config.MIN_REFRESH_INTERVAL,
+                 quality: Optional[QualityControl] = None):
+        self.db_manager = db_manager
+        # Kontrola jakości przed zapisem - pamięć ostatnich pomiarów stacji żyje razem z procesem pobierającym
+        self.quality = quality or QualityControl(db_manager)
+        self.current_cache = current_cache
+        self.broadcaster = broadcaster
+        self.api_url = api_url
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Walidatory ostatniej zapisanej odpowiedzi (zapytania warunkowe)
+        self._etag: Optional[str] = None
+        self._last_modified: Optional[str] = None
+        # Stan pojedynczego trwającego pobierania (single-flight)
+        self.min_refresh_interval = min_refresh_interval
+        self._in_flight: Optional[asyncio.Future] = None
+        self._last_finished_monotonic: Optional[float] = None
+        self.last_started: Optional[str] = None
+        self.last_finished: Optional[str] = None
+        self.last_duration: Optional[float] = None
+        self.last_result: Optional[bool] = None
+        self.fetch_count = 0
+        self.coalesced_count = 0
+        self.throttled_count = 0
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        """Zwraca klienta HTTP z pulą połączeń keep-alive dla bieżącej pętli zdarzeń"""
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._client_loop is not loop:
+            await self._close_foreign_client()
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout),
+                limits=httpx.Limits(max_connections=4, max_keepalive_connections=2),
+                headers={"Accept": "application/json"}
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def _close_foreign_client(self):
+        """Zamyka klienta utworzonego w innej pętli zdarzeń przed utworzeniem nowego
+        
+        Połączenia klienta należą do jego pętli - zamykane są w niej, jeśli nadal działa.
+        Zatrzymana pętla nie pozwala już zamknąć połączeń, dlatego właściciel pętli
+        jednorazowej wywołuje close() przed jej zakończeniem (run_in_server_loop).
+        """
+        client, client_loop = self._client, self._client_loop
+        self._client = None
+        self._client_loop = None
+        try:
+            if client_loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(client.aclose(), client_loop))
+            else:
+                logger.warning("Klient HTTP poprzedniej pętli zdarzeń nie został zamknięty przed jej zatrzymaniem")
+        except Exception as e:
+            logger.warning(f"Błąd podczas zamykania klienta HTTP innej pętli zdarzeń: {str(e)}")
+
+    async def close(self):
+        """Zamyka połączenia klienta HTTP"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._client_loop = None
+
+    async def _download(self) -> Optional[httpx.Response]:
+        """Zapytanie warunkowe z ponowieniami; zwraca None, gdy dane się nie zmieniły (304)"""
+        headers = {}
+        if self._etag:
+            headers["If-None-Match"] = self._etag
+        if self._last_modified:
+            headers["If-Modified-Since"] = self._last_modified
+
+        client = await self._get_client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = await client.get(self.api_url, headers=headers)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    break
+                error = httpx.HTTPStatusError(
+                    f"Serwer IMGW zwrócił kod {response.status_code}",
+                    request=response.request,
+                    response=response
+                )
+            except httpx.TransportError as e:
+                error = e
+
+            if attempt == self.max_retries:
+                raise error
+            delay = self.retry_backoff * 2 ** attempt
+            logger.warning(f"Próba {attempt + 1} pobrania danych nieudana ({error!r}), ponowienie za {delay:.1f} s")
+            await asyncio.sleep(delay)
+
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        return response
+
+    def _remember_validators(self, response: httpx.Response):
+        self._etag = response.headers.get("ETag")
+        self._last_modified = response.headers.get("Last-Modified")
+
+    def is_fetching(self) -> bool:
+        return self._in_flight is not None and not self._in_flight.done()
+
+    def is_throttled(self) -> bool:
+        """Czy od ostatniego pobrania minęło mniej niż min_refresh_interval"""
+        return (
+            self._last_finished_monotonic is not None
+            and time.monotonic() - self._last_finished_monotonic < self.min_refresh_interval
+        )
+
+    async def refresh(self, force: bool = False) -> bool:
+        """Pobiera dane, współdzieląc jedno trwające pobieranie między wszystkimi wywołującymi"""
+        if self.is_fetching():
+            self.coalesced_count += 1
+            # shield - anulowanie jednego oczekującego nie przerywa pobierania pozostałym
+            return await asyncio.shield(self._in_flight)
+
+        if not force and self.is_throttled():
+            self.throttled_count += 1
+            logger.info("Pominięto odświeżanie - dane pobrano niedawno")
+            return bool(self.last_result)
+
+        self._in_flight = asyncio.ensure_future(self._tracked_fetch())
+        return await asyncio.shield(self._in_flight)
+
+    async def _tracked_fetch(self) -> bool:
+        self.fetch_count += 1
+        self.last_started = datetime.now(timezone.utc).isoformat()
+        started = time.monotonic()
+        try:
+            self.last_result = await self.fetch_data_from_imgw()
+            return self.last_result
+        finally:
+            self._last_finished_monotonic = time.monotonic()
+            self.last_duration = round(self._last_finished_monotonic - started, 3)
+            self.last_finished = datetime.now(timezone.utc).isoformat()
+
+    def status(self) -> dict:
+        """Stan pobierania danych (dla /api/weather/refresh/status)"""
+        return {
+            "in_flight": self.is_fetching(),
+            "throttled": self.is_throttled(),
+            "min_refresh_interval": self.min_refresh_interval,
+            "last_started": self.last_started,
+            "last_finished": self.last_finished,
+            "last_duration": self.last_duration,
+            "last_result": self.last_result,
+            "fetch_count": self.fetch_count,
+            "coalesced_count": self.coalesced_count,
+            "throttled_count": self.throttled_count
+        }
+
+    async def fetch_data_from_imgw(self) -> bool:
+        """Pobiera dane z API IMGW i zapisuje do bazy danych"""
+        started = time.perf_counter()
+        try:
+            logger.info("Rozpoczynam pobieranie danych z API IMGW")
+
+            response = await self._download()
+
+            if response is None:
+                logger.info("Dane IMGW nie zmieniły się od ostatniego pobrania")
+                self._log_fetch(started, "NOT_MODIFIED", 0)
+                return True
+
+            FETCH_BYTES.observe(len(response.content))
+            data = response.json()
+
+            if not data:
+                logger.warning("Brak danych w odpowiedzi API")
+                self._log_fetch(started, "WARNING", 0, "Brak danych w odpowiedzi")
+                return False
+
+            # Kontrola jakości i zapis do SQLite w puli wątków, aby nie blokować pętli zdarzeń.
+            # Walidatory (ETag/Last-Modified) i pamięć kontroli jakości aktualizowane są dopiero
+            # po zatwierdzeniu zapisu - po błędzie kolejne pobranie nie dostanie 304 dla tej paczki.
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                None, self.db_manager.insert_weather_data, data, partial(self.quality.check, remember=False)
+            )
+            self.quality.commit()
+            self._remember_validators(response)
+            if result.changed and self.current_cache is not None:
+                self.current_cache.invalidate()
+            if result.changed and self.broadcaster is not None:
+                await loop.run_in_executor(None, self.broadcaster.publish_changes)
+
+            logger.info(f"Pomyślnie pobrano {len(data)} rekordów, zapisano {result.changed}")
+            for outcome in result._fields:
+                FETCH_RECORDS.inc(outcome, amount=getattr(result, outcome))
+            self._log_fetch(started, "SUCCESS", result.changed, result=result)
+
+            return True
+
+        except httpx.HTTPError as e:
+            error_msg = f"Błąd HTTP podczas pobierania danych: {str(e) or type(e).__name__}"
+            logger.error(error_msg)
+            self._log_fetch(started, "ERROR", 0, error_msg)
+            return False
+
+        except sqlite3.Error as e:
+            error_msg = f"Błąd zapisu danych do bazy: {str(e)}"
+            logger.error(error_msg)
+            self._log_fetch(started, "ERROR", 0, error_msg)
+            return False
+
+        except json.JSONDecodeError as e:
+            error_msg = f"Błąd dekodowania JSON: {str(e)}"
+            logger.error(error_msg)
+            self._log_fetch(started, "ERROR", 0, error_msg)
+            return False
+
+        except Exception as e:
+            error_msg = f"Nieoczekiwany błąd: {str(e)}"
+            logger.error(error_msg)
+            self._log_fetch(started, "ERROR", 0, error_msg)
+            return False
+
+    def _log_fetch(self, started: float, status: str, records_count: int, error_message: str = None,
+                   result=None):
+        """Wynik pobrania: histogram czasu (etykieta - status) i wpis w api_logs"""
+        FETCH_SECONDS.observe(time.perf_counter() - started, status.lower())
+        self.db_manager.log_api_call(status, records_count, error_message, result)
@@ -306,9 +306,54 @@ class WeatherApp {
     }
 
     startAutoRefresh() {
-        setInterval(() => {
-            this.refreshData();
-        }, 3600000);
+        // Without SSE support fall back to hourly polling
+        if (!window.EventSource) {
+            setInterval(() => {
+                this.refreshData();
+            }, 3600000);
+            return;
+        }
+
+        // Server pushes the full state on connect and then only changed stations;
+        // EventSource reconnects on its own and resumes from the last event id
+        const source = new EventSource('/api/weather/stream');
+        const applyStations = (event) => {
+            try {
+                const payload = JSON.parse(event.data);
+                this.applyStationUpdates(payload.stations, event.type === 'snapshot');
+            } catch (error) {
+                console.error('Error applying stream update:', error);
+            }
+        };
+        source.addEventListener('snapshot', applyStations);
+        source.addEventListener('delta', applyStations);
+        source.onerror = () => console.warn('Weather stream disconnected, reconnecting...');
+    }
+
+    applyStationUpdates(stations, replace) {
+        if (!stations || (replace && stations.length === 0)) {
+            return;
+        }
+        const byId = new Map(this.weatherData.map(station => [station.id_stacji, station]));
+        if (replace) {
+            this.weatherData = stations.map(station => Object.assign(byId.get(station.id_stacji) || {}, station));
+        } else {
+            stations.forEach(station => {
+                const existing = byId.get(station.id_stacji);
+                if (existing) {
+                    Object.assign(existing, station);
+                } else {
+                    this.weatherData.push(station);
+                }
+            });
+        }
+
+        this.filteredData = [...this.weatherData];
+        this.updateDashboardStats();
+        this.updateMapMarkers();
+        this.populateTable();
+        this.updateCharts();
+        this.updateLastRefresh();
     }
 
     initializeMap() {
@@ -325,13 +370,30 @@ class WeatherApp {
                 attribution: '© OpenStreetMap contributors'
             }).addTo(this.map);
 
+            // Only stations inside the viewport are requested from the server
+            this.map.on('moveend', () => this.loadStationsInView());
             this.updateMapMarkers();
+            this.loadStationsInView();
             console.log('Map initialized successfully');
         } catch (error) {
             console.error('Error initializing map:', error);
         }
     }
 
+    async loadStationsInView() {
+        if (!this.map) return;
+        try {
+            const bbox = this.map.getBounds().toBBoxString();
+            const response = await fetch(`/api/stations?bbox=${bbox}`);
+            if (!response.ok) return;
+            const payload = await response.json();
+            this.stationsInView = new Map(payload.stations.map(station => [station.id_stacji, station]));
+            this.updateMapMarkers();
+        } catch (error) {
+            console.error('Error loading stations in view:', error);
+        }
+    }
+
     updateMapMarkers() {
         if (!this.map) return;
 
@@ -344,6 +406,9 @@ class WeatherApp {
 
         // Add markers for each station
         this.weatherData.forEach(station => {
+            // Coordinates come from /api/stations for the current viewport
+            const location = this.stationsInView ? this.stationsInView.get(station.id_stacji) : station;
+            if (!location || location.lat == null || location.lon == null) return;
             const temp = parseFloat(station.temperatura);
             let markerColor = '#1E40AF';
             
@@ -359,7 +424,7 @@ class WeatherApp {
                 iconAnchor: [10, 10]
             });
 
-            const marker = L.marker([station.lat, station.lon], { icon: customIcon });
+            const marker = L.marker([location.lat, location.lon], { icon: customIcon });
             
             const popupContent = `
                 <div>
@@ -0,0 +1,251 @@
+# Pobieranie danych i konserwacja bazy w jednym procesie (lider)
+# ingest.py
+#
+# Przy wielu procesach API (uvicorn --workers N) tylko jeden z nich może pobierać dane
+# z IMGW i zapisywać bazę. Tryby (Config.INGEST_MODE):
+#   lock      - procesy API wybierają lidera blokadą pliku; pozostałe tylko czytają
+#   external  - procesy API tylko czytają; pobieranie działa jako osobny proces:
+#               python ingest.py
+#   embedded  - jeden proces API robi wszystko (bez blokady)
+# Procesy API otwierają bazę tylko do odczytu; schemat, migracje i odbudowy tabel pomocniczych
+# wykonuje lider (DatabaseManager.open_for_writing) po przejęciu tej roli.
+
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+import schedule
+
+from columnar import ColdStore
+from config import Config
+from database import DatabaseManager
+from fetcher import WeatherDataFetcher
+from maintenance import MaintenanceJob
+from stations import import_station_file
+
+try:
+    import fcntl
+except ImportError:  # Windows - tylko tryb jednoprocesowy
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+INGEST_MODES = ("lock", "external", "embedded")
+
+
+def lock_path(db_path: str) -> str:
+    return f"{db_path}.ingest.lock"
+
+
+def refresh_request_path(db_path: str) -> str:
+    return f"{db_path}.refresh"
+
+
+def status_path(db_path: str) -> str:
+    return f"{db_path}.ingest.json"
+
+
+def request_refresh(db_path: str):
+    """Zleca odświeżenie danych procesowi-liderowi (zmiana czasu modyfikacji pliku)"""
+    path = refresh_request_path(db_path)
+    with open(path, "a"):
+        os.utime(path, None)
+
+
+def read_status(db_path: str) -> Optional[dict]:
+    """Ostatni stan zapisany przez proces-lidera"""
+    try:
+        with open(status_path(db_path), encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+class IngestLock:
+    """Wyłączna blokada pliku (flock) - zwalniana automatycznie po zakończeniu procesu"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = None
+
+    @property
+    def held(self) -> bool:
+        return self._file is not None
+
+    def acquire(self) -> bool:
+        if self._file is not None:
+            return True
+        if fcntl is None:
+            logger.warning("Brak fcntl - blokada pobierania działa tylko w obrębie jednego procesu")
+            self._file = open(self.path, "a+")
+            return True
+        file = open(self.path, "a+")
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            file.close()
+            return False
+        file.seek(0)
+        file.truncate()
+        file.write(str(os.getpid()))
+        file.flush()
+        self._file = file
+        return True
+
+    def release(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class IngestService:
+    """Harmonogram pobierania danych i konserwacji; działa wyłącznie w procesie-liderze"""
+
+    def __init__(self, db_manager: DatabaseManager, fetcher: WeatherDataFetcher,
+                 maintenance_job: MaintenanceJob,
+                 mode: str = Config.INGEST_MODE,
+                 lock_retry: float = Config.INGEST_LOCK_RETRY,
+                 poll_interval: float = Config.CHANGE_POLL_INTERVAL,
+                 stations_file: Optional[str] = Config.STATIONS_FILE):
+        if mode not in INGEST_MODES:
+            raise ValueError(f"Nieznany tryb pobierania: {mode} (dostępne: {', '.join(INGEST_MODES)})")
+        self.db_manager = db_manager
+        self.fetcher = fetcher
+        self.maintenance_job = maintenance_job
+        self.mode = mode
+        self.lock_retry = lock_retry
+        self.poll_interval = poll_interval
+        self.stations_file = stations_file
+        self.lock = IngestLock(lock_path(db_manager.db_path))
+        self._refresh_mtime = self._request_mtime()
+        # Ustawiane po otwarciu bazy do zapisu - wcześniej proces obsługuje zapytania jak pozostałe
+        self._leading = threading.Event()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leading.is_set()
+
+    def start(self, run_coroutine: Callable):
+        """Uruchamia harmonogram w wątku procesu API (tryby lock i embedded)"""
+        if self.mode == "external":
+            logger.info("Tryb external - dane pobiera osobny proces (python ingest.py)")
+            return
+        threading.Thread(target=self._run, args=(run_coroutine,), daemon=True).start()
+
+    def _run(self, run_coroutine: Callable):
+        # Pozostałe procesy czekają - przejmą pobieranie, jeśli lider się zakończy
+        while self.mode == "lock" and not self.lock.acquire():
+            time.sleep(self.lock_retry)
+        logger.info(f"Proces {os.getpid()} odpowiada za pobieranie danych")
+        self.run_forever(run_coroutine)
+
+    def run_forever(self, run_coroutine: Callable):
+        """Pobiera dane od razu, a następnie zgodnie z harmonogramem lub na żądanie"""
+        # Schemat, migracje i odbudowy tabel pomocniczych wykonuje tylko lider - pozostałe procesy
+        # API otwierają bazę tylko do odczytu
+        self.db_manager.open_for_writing()
+        self._leading.set()
+        # Współrzędne stacji zapisuje tylko lider - procesy API odczytują je z tabeli stations
+        if self.stations_file:
+            import_station_file(self.db_manager, self.stations_file)
+        scheduler = schedule.Scheduler()
+        # Pobieranie danych co godzinę
+        scheduler.every().hour.do(self.fetch, run_coroutine)
+        # Konserwacja bazy w osobnym wątku, aby nie opóźniać pobierania danych
+        scheduler.every(Config.MAINTENANCE_INTERVAL).hours.do(
+            lambda: threading.Thread(target=self.run_maintenance, daemon=True).start()
+        )
+
+        self.fetch(run_coroutine)
+        while True:
+            scheduler.run_pending()
+            if self._refresh_requested():
+                self.fetch(run_coroutine)
+            time.sleep(self.poll_interval)
+
+    def fetch(self, run_coroutine: Callable):
+        try:
+            run_coroutine(self.fetcher.refresh())
+        except Exception as e:
+            logger.error(f"Błąd podczas pobierania danych: {str(e)}")
+        self.write_status()
+
+    def run_maintenance(self):
+        self.maintenance_job.run()
+        self.write_status()
+
+    def _request_mtime(self) -> float:
+        try:
+            return os.path.getmtime(refresh_request_path(self.db_manager.db_path))
+        except OSError:
+            return 0.0
+
+    def _refresh_requested(self) -> bool:
+        mtime = self._request_mtime()
+        if mtime > self._refresh_mtime:
+            self._refresh_mtime = mtime
+            return True
+        return False
+
+    def write_status(self):
+        """Zapisuje stan lidera do pliku, z którego korzystają pozostałe procesy"""
+        path = status_path(self.db_manager.db_path)
+        try:
+            with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+                json.dump(self.local_status(), file)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.error(f"Błąd podczas zapisu stanu pobierania: {str(e)}")
+
+    def local_status(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "fetcher": self.fetcher.status(),
+            "maintenance": self.maintenance_job.last_report
+        }
+
+    def status(self) -> dict:
+        """Stan pobierania - własny (lider) lub odczytany z pliku lidera"""
+        if self.is_leader:
+            status = self.local_status()
+        else:
+            status = read_status(self.db_manager.db_path) or {"pid": None, "fetcher": None, "maintenance": None}
+        return {"mode": self.mode, "leader": self.is_leader, **status}
+
+
+def main() -> int:
+    """Samodzielny proces pobierania danych (INGEST_MODE=external)"""
+    logging.basicConfig(
+        level=getattr(logging, Config.LOG_LEVEL, logging.INFO),
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    # Schemat aktualizuje run_forever po przejęciu blokady
+    db_manager = DatabaseManager(Config.DATABASE_PATH, read_only=True)
+    fetcher = WeatherDataFetcher(db_manager)
+    maintenance_job = MaintenanceJob(db_manager, cold_store=ColdStore(db_manager))
+    service = IngestService(db_manager, fetcher, maintenance_job, mode="lock")
+    if not service.lock.acquire():
+        logger.error(f"Dane pobiera już inny proces (blokada {service.lock.path})")
+        return 1
+
+    logger.info(f"Proces pobierania danych uruchomiony (PID {os.getpid()})")
+    loop = asyncio.new_event_loop()
+    try:
+        service.run_forever(loop.run_until_complete)
+    except KeyboardInterrupt:
+        logger.info("Zatrzymywanie procesu pobierania danych")
+    finally:
+        loop.run_until_complete(fetcher.close())
+        loop.close()
+        db_manager.close()
+        service.lock.release()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
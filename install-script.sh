@@ -4,6 +4,9 @@
 
 set -e
 
+# Liczba procesów API (uvicorn --workers); dane pobiera jeden z nich (INGEST_MODE=lock)
+WORKERS="${WORKERS:-2}"
+
 echo "=== INSTALACJA APLIKACJI IMGW WEATHER ===" 
 
 # Aktualizacja systemu
@@ -85,7 +88,8 @@ Type=simple
 User=www-data
 WorkingDirectory=/opt/imgw-weather
 Environment=PATH=/opt/imgw-weather/venv/bin
-ExecStart=/opt/imgw-weather/venv/bin/python -m uvicorn main:app --host 127.0.0.1 --port 8000
+Environment=WORKERS=${WORKERS}
+ExecStart=/opt/imgw-weather/venv/bin/python -m uvicorn main:app --host 127.0.0.1 --port 8000 --workers \$WORKERS --timeout-graceful-shutdown 5
 Restart=always
 RestartSec=10
 StandardOutput=journal
@@ -0,0 +1,309 @@
+# Konserwacja bazy danych: retencja, archiwizacja, backup
+# maintenance.py
+
+import csv
+import glob
+import gzip
+import io
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from columnar import MONTH_ROWS_SQL, ColdStore, hour_to_month, month_hours, months_between
+from config import Config
+from database import MEASUREMENT_COLUMNS, QC_FLAGS_COLUMN, DatabaseManager, row_to_record
+
+logger = logging.getLogger(__name__)
+
+# Liczba zachowywanych wpisów logu zmian danych (data_changes)
+DATA_CHANGES_KEEP = 1000
+
+ARCHIVE_COLUMNS = ["id_stacji", "stacja", "data_pomiaru", "godzina_pomiaru", *MEASUREMENT_COLUMNS, QC_FLAGS_COLUMN]
+
+
+class MaintenanceJob:
+    """Okresowa konserwacja: archiwizacja i usuwanie starych danych, vacuum, backup"""
+
+    def __init__(self, db_manager: DatabaseManager,
+                 retention_days: int = Config.DATA_RETENTION_DAYS,
+                 api_logs_retention_days: int = Config.API_LOGS_RETENTION_DAYS,
+                 archive_dir: str = Config.ARCHIVE_DIR,
+                 backup_dir: str = Config.BACKUP_DIR,
+                 backup_interval_hours: int = Config.DATABASE_BACKUP_INTERVAL,
+                 backup_keep: int = Config.BACKUP_KEEP,
+                 batch_size: int = Config.MAINTENANCE_BATCH_SIZE,
+                 pause: float = 0.05,
+                 cold_store: Optional[ColdStore] = None):
+        self.db_manager = db_manager
+        self.cold_store = cold_store
+        self.retention_days = retention_days
+        self.api_logs_retention_days = api_logs_retention_days
+        self.archive_dir = archive_dir
+        self.backup_dir = backup_dir
+        self.backup_interval_hours = backup_interval_hours
+        self.backup_keep = backup_keep
+        self.batch_size = batch_size
+        self.pause = pause
+        self._run_lock = threading.Lock()
+        self.last_report: Optional[dict] = None
+
+    def run(self, force_backup: bool = False) -> dict:
+        """Wykonuje pełną konserwację; zwraca raport (także dostępny w /api/stats)"""
+        if not self._run_lock.acquire(blocking=False):
+            logger.info("Konserwacja już trwa - pomijam")
+            return self.last_report or {}
+        started = time.monotonic()
+        report = {"started": datetime.now(timezone.utc).isoformat()}
+        try:
+            logger.info("Rozpoczynam konserwację bazy danych")
+
+            size_before = self._database_size()
+            report["rows_archived"] = self.archive_expired_rows()
+            report["api_logs_deleted"] = self.trim_api_logs()
+            report["vacuumed_pages"] = self.incremental_vacuum()
+            report["reclaimed_bytes"] = max(0, size_before - self._database_size())
+            report["backup_file"] = self.backup_if_due(force=force_backup)
+
+            report["duration"] = round(time.monotonic() - started, 3)
+            report["status"] = "SUCCESS"
+            logger.info(f"Konserwacja zakończona: {report}")
+        except Exception as e:
+            report["duration"] = round(time.monotonic() - started, 3)
+            report["status"] = "ERROR"
+            report["error"] = str(e)
+            logger.error(f"Błąd podczas konserwacji bazy danych: {str(e)}")
+        finally:
+            self._run_lock.release()
+
+        self.last_report = report
+        return report
+
+    def _database_size(self) -> int:
+        """Rozmiar pliku bazy w bajtach (liczba stron * rozmiar strony)"""
+        with self.db_manager.pool.reader() as conn:
+            page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+
+    def archive_expired_rows(self) -> int:
+        """Przenosi pomiary starsze niż retention_days do skompresowanych plików miesięcznych
+
+        Każda paczka to osobna, krótka transakcja: zapis do archiwum, potem usunięcie.
+        Pliki są dopisywane (kolejne człony gzip), a ich rozmiar zatwierdzany jest w tabeli
+        archive_files razem z usunięciem wierszy. Po błędzie lub przerwaniu przed zatwierdzeniem
+        plik obcinany jest do zatwierdzonego rozmiaru, więc ponowna archiwizacja nie tworzy duplikatów.
+        Przy włączonym archiwum kolumnowym (COLD_STORE) dane trafiają do plików Arrow.
+        """
+        if self.cold_store is not None and self.cold_store.enabled:
+            return self.archive_to_cold_store()
+        cutoff = int(time.time()) // 3600 - self.retention_days * 24
+        archived = 0
+        os.makedirs(self.archive_dir, exist_ok=True)
+
+        while self._register_archive_files(cutoff):
+            with self.db_manager.pool.writer() as conn:
+                rows = conn.execute(f'''
+                    SELECT w.id_stacji, s.stacja, w.observed_at,
+                           {", ".join(f"w.{column}" for column in MEASUREMENT_COLUMNS)}, w.{QC_FLAGS_COLUMN}
+                    FROM weather_data w
+                    JOIN stations s ON s.id_stacji = w.id_stacji
+                    WHERE w.observed_at < ?
+                    ORDER BY w.observed_at, w.id_stacji
+                    LIMIT ?
+                ''', (cutoff, self.batch_size)).fetchall()
+                if not rows:
+                    break
+
+                self._write_archive(conn, rows)
+                last = rows[-1]
+                deleted = conn.execute('''
+                    DELETE FROM weather_data
+                    WHERE observed_at < ? AND (observed_at, id_stacji) <= (?, ?)
+                ''', (cutoff, last["observed_at"], last["id_stacji"])).rowcount
+                self.db_manager.adjust_row_count(conn, -deleted)
+                # Procesy API (analizy, pamięci podręczne) przeładują dane od pierwszej usuniętej godziny
+                self.db_manager.bump_data_version(conn, rows[0]["observed_at"])
+
+            archived += len(rows)
+            if self.pause:
+                time.sleep(self.pause)
+
+        if archived:
+            logger.info(f"Zarchiwizowano i usunięto {archived} rekordów starszych niż {self.retention_days} dni")
+        return archived
+
+    def archive_to_cold_store(self) -> int:
+        """Przenosi pełne miesiące starsze niż retention_days do archiwum kolumnowego
+
+        Jeden miesiąc to jedna transakcja: odczyt, zapis pliku (połączonego z istniejącym),
+        usunięcie wierszy. Miesiąc, w którym mija okres retencji, pozostaje w bazie do końca.
+        """
+        cutoff = month_hours(hour_to_month(int(time.time()) // 3600 - self.retention_days * 24))[0]
+        with self.db_manager.pool.reader() as conn:
+            first_hour = conn.execute("SELECT MIN(observed_at) FROM weather_data").fetchone()[0]
+        if first_hour is None or first_hour >= cutoff:
+            return 0
+
+        archived = 0
+        for month in months_between(first_hour, cutoff):
+            first, end = month_hours(month)
+            with self.db_manager.pool.writer() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                rows = cursor.execute(MONTH_ROWS_SQL, (first, end)).fetchall()
+                if not rows:
+                    continue
+                path = self.cold_store.store_month(month, rows)
+                deleted = conn.execute(
+                    "DELETE FROM weather_data WHERE observed_at >= ? AND observed_at < ?", (first, end)
+                ).rowcount
+                self.db_manager.adjust_row_count(conn, -deleted)
+                self.db_manager.bump_data_version(conn, first)
+            archived += len(rows)
+            logger.info(f"Przeniesiono {len(rows)} rekordów do archiwum kolumnowego {path}")
+            if self.pause:
+                time.sleep(self.pause)
+        return archived
+
+    def _archive_path(self, month: str) -> str:
+        return os.path.join(self.archive_dir, f"weather_data_{month}.csv.gz")
+
+    def _register_archive_files(self, cutoff: int) -> bool:
+        """Zakłada pliki miesięcy kolejnej paczki z zatwierdzonym rozmiarem 0; False - brak danych do archiwizacji
+
+        Plik bez wpisu w archive_files (zapisany przez starszą wersję) przyjmowany jest w całości,
+        więc nowy plik musi zostać zarejestrowany, zanim trafi do niego pierwsza paczka.
+        """
+        with self.db_manager.pool.writer() as conn:
+            first, last = conn.execute('''
+                SELECT MIN(observed_at), MAX(observed_at) FROM (
+                    SELECT observed_at FROM weather_data
+                    WHERE observed_at < ?
+                    ORDER BY observed_at, id_stacji
+                    LIMIT ?
+                )
+            ''', (cutoff, self.batch_size)).fetchone()
+            if first is None:
+                return False
+            for month in months_between(first, last + 1):
+                path = self._archive_path(f"{month // 100:04d}-{month % 100:02d}")
+                if os.path.exists(path) and os.path.getsize(path):
+                    continue
+                conn.execute("INSERT OR IGNORE INTO archive_files (path, size) VALUES (?, 0)", (os.path.abspath(path),))
+                open(path, "ab").close()
+        return True
+
+    def _write_archive(self, conn: sqlite3.Connection, rows: List[sqlite3.Row]):
+        """Dopisuje wiersze do plików archiwum_RRRR-MM.csv.gz w transakcji `conn`
+
+        Plik miesiąca rozpoczęty przed wprowadzeniem kontroli jakości zachowuje swój nagłówek
+        (bez qc_flags) - kolejne wiersze dopisywane są w tych samych kolumnach.
+        """
+        by_month: Dict[str, List[dict]] = {}
+        for row in rows:
+            record = row_to_record(row)
+            record[QC_FLAGS_COLUMN] = row[QC_FLAGS_COLUMN]
+            by_month.setdefault(record["data_pomiaru"][:7], []).append(record)
+
+        for month, records in by_month.items():
+            path = self._archive_path(month)
+            self._truncate_uncommitted(conn, path)
+            fieldnames = self._archive_header(path)
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=fieldnames or ARCHIVE_COLUMNS,
+                                    extrasaction="ignore", lineterminator="\n")
+            if fieldnames is None:
+                writer.writeheader()
+            writer.writerows(records)
+            with open(path, "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="ab") as archive:
+                    archive.write(buffer.getvalue().encode("utf-8"))
+                # Dane na dysku przed zatwierdzeniem rozmiaru i usunięciem wierszy z bazy
+                raw.flush()
+                os.fsync(raw.fileno())
+            conn.execute(
+                "INSERT OR REPLACE INTO archive_files (path, size) VALUES (?, ?)",
+                (os.path.abspath(path), os.path.getsize(path))
+            )
+
+    @staticmethod
+    def _truncate_uncommitted(conn: sqlite3.Connection, path: str):
+        """Obcina plik archiwum do rozmiaru zatwierdzonego w bazie (człony gzip niezatwierdzonych paczek)"""
+        row = conn.execute("SELECT size FROM archive_files WHERE path = ?", (os.path.abspath(path),)).fetchone()
+        # Plik spoza tabeli (zapisany przez starszą wersję) przyjmowany jest w całości
+        if row is None or not os.path.exists(path) or os.path.getsize(path) <= row[0]:
+            return
+        logger.warning(f"Plik archiwum {path} zawiera niezatwierdzone dane - obcinam do {row[0]} bajtów")
+        with open(path, "r+b") as raw:
+            raw.truncate(row[0])
+
+    @staticmethod
+    def _archive_header(path: str) -> Optional[List[str]]:
+        """Kolumny istniejącego pliku archiwum (None - pliku jeszcze nie ma lub jest pusty)"""
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as archive:
+            return next(csv.reader(archive), None) or ARCHIVE_COLUMNS
+
+    def trim_api_logs(self) -> int:
+        """Usuwa wpisy api_logs starsze niż api_logs_retention_days oraz stary log zmian danych"""
+        with self.db_manager.pool.writer() as conn:
+            cursor = conn.execute(
+                "DELETE FROM api_logs WHERE timestamp < datetime('now', ?)",
+                (f"-{self.api_logs_retention_days} days",)
+            )
+            # Procesy z wersją starszą niż zachowany log po prostu wczytają dane od nowa
+            conn.execute(
+                "DELETE FROM data_changes WHERE generation < (SELECT generation FROM data_version) - ?",
+                (DATA_CHANGES_KEEP,)
+            )
+        return cursor.rowcount
+
+    def incremental_vacuum(self) -> int:
+        """Zwalnia wolne strony pliku bazy (wymaga auto_vacuum = INCREMENTAL)"""
+        with self.db_manager.pool.writer() as conn:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                logger.info("auto_vacuum nie jest ustawione na INCREMENTAL - uruchom 'python manage.py vacuum'")
+                return 0
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            # executescript wykonuje pragmę do końca; execute zwalnia tylko jedną stronę na krok
+            conn.executescript("PRAGMA incremental_vacuum")
+        return free_pages
+
+    def backup_if_due(self, force: bool = False) -> Optional[str]:
+        """Tworzy backup, jeśli od ostatniego minęło backup_interval_hours godzin"""
+        os.makedirs(self.backup_dir, exist_ok=True)
+        backups = sorted(glob.glob(os.path.join(self.backup_dir, "weather_data_*.db.gz")))
+        if backups and not force:
+            age_hours = (time.time() - os.path.getmtime(backups[-1])) / 3600
+            if age_hours < self.backup_interval_hours:
+                return None
+
+        path = self.backup()
+        backups = sorted(glob.glob(os.path.join(self.backup_dir, "weather_data_*.db.gz")))
+        for old in backups[:-self.backup_keep]:
+            os.remove(old)
+        return path
+
+    def backup(self) -> str:
+        """Backup online przez API SQLite (kopiowanie paczkami stron), następnie kompresja gzip"""
+        target = os.path.join(self.backup_dir, f"weather_data_{datetime.now(timezone.utc):%Y%m%d_%H%M%S}.db")
+        source = sqlite3.connect(self.db_manager.db_path)
+        destination = sqlite3.connect(target)
+        try:
+            # Paczki po 1024 strony z krótką przerwą - zapis aplikacji nie jest blokowany
+            source.backup(destination, pages=1024, sleep=0.005)
+        finally:
+            destination.close()
+            source.close()
+
+        with open(target, "rb") as raw, gzip.open(f"{target}.gz", "wb") as compressed:
+            shutil.copyfileobj(raw, compressed)
+        os.remove(target)
+        logger.info(f"Utworzono backup bazy danych: {target}.gz")
+        return f"{target}.gz"
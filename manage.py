@@ -0,0 +1,185 @@
+# Narzędzia administracyjne aplikacji IMGW Weather
+# manage.py
+#
+# Użycie:
+#   python manage.py migrate [--batch-size 5000] [--pause 0.05]
+#   python manage.py rebuild-latest
+#   python manage.py rebuild-rollups
+#   python manage.py maintenance [--force-backup]
+#   python manage.py backup
+#   python manage.py vacuum
+#   python manage.py import-stations [plik.csv]
+#   python manage.py backfill <katalog> [--workers 4] [--batch-size 100000] [--replace] [--keep-index]
+#   python manage.py export-columnar <katalog> [--format parquet] [--days 365] [--overwrite]
+
+import argparse
+import logging
+import sys
+
+from backfill import IMPORT_FORMATS, BackfillImporter
+from columnar import COLUMNAR_FORMATS, ColdStore, export_columnar
+from config import Config
+from database import DatabaseManager
+from maintenance import MaintenanceJob
+from stations import StationDirectory, import_station_file
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("manage")
+
+
+def cmd_migrate(args) -> int:
+    """Migruje starą tabelę weather_data (TEXT) do schematu z kolumnami REAL"""
+    db_manager = DatabaseManager(args.db)
+    migrated = db_manager.migrate_legacy_data(batch_size=args.batch_size, pause=args.pause)
+    logger.info(f"Przeniesiono {migrated} rekordów")
+    return 0
+
+
+def cmd_rebuild_latest(args) -> int:
+    """Odbudowuje tabelę najnowszych pomiarów na podstawie całej historii"""
+    db_manager = DatabaseManager(args.db)
+    stations = db_manager.rebuild_latest_observations()
+    logger.info(f"Najnowsze pomiary odtworzone dla {stations} stacji")
+    return 0
+
+
+def cmd_rebuild_rollups(args) -> int:
+    """Przelicza agregaty dzienne i miesięczne na podstawie danych surowych"""
+    db_manager = DatabaseManager(args.db)
+    months = db_manager.rebuild_rollups()
+    logger.info(f"Agregaty przeliczone ({months} kubełków miesięcznych)")
+    return 0
+
+
+def cmd_maintenance(args) -> int:
+    """Archiwizacja starych danych, czyszczenie api_logs, vacuum i backup"""
+    db_manager = DatabaseManager(args.db)
+    job = MaintenanceJob(db_manager, cold_store=ColdStore(db_manager))
+    report = job.run(force_backup=args.force_backup)
+    return 0 if report.get("status") == "SUCCESS" else 1
+
+
+def cmd_backup(args) -> int:
+    """Tworzy backup bazy danych bez względu na DATABASE_BACKUP_INTERVAL"""
+    job = MaintenanceJob(DatabaseManager(args.db))
+    path = job.backup_if_due(force=True)
+    logger.info(f"Backup zapisany w {path}")
+    return 0
+
+
+def cmd_vacuum(args) -> int:
+    """Pełny VACUUM - przełącza istniejącą bazę na auto_vacuum = INCREMENTAL"""
+    db_manager = DatabaseManager(args.db)
+    with db_manager.pool.writer() as conn:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.commit()
+        conn.execute("VACUUM")
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    logger.info(f"VACUUM zakończony (auto_vacuum = {mode})")
+    return 0
+
+
+def cmd_import_stations(args) -> int:
+    """Wczytuje współrzędne stacji z pliku CSV (id_stacji, stacja, lat, lon)"""
+    db_manager = DatabaseManager(args.db)
+    changed = import_station_file(db_manager, args.file)
+    directory = StationDirectory(db_manager)
+    logger.info(f"Zaktualizowano współrzędne {changed} stacji; w indeksie: {len(directory.index())}")
+    return 0
+
+
+def cmd_backfill(args) -> int:
+    """Import historycznych danych z plików archiwum IMGW (ZIP/CSV)"""
+    importer = BackfillImporter(
+        DatabaseManager(args.db), workers=args.workers, batch_size=args.batch_size,
+        replace=args.replace, file_format=args.format, keep_index=args.keep_index
+    )
+    report = importer.run(args.directory)
+    logger.info(
+        f"Import zakończony: {report['files_imported']} plików ({report['files_skipped']} pominiętych), "
+        f"{report['rows_parsed']} wierszy, zapisanych {report['rows_written']}, błędnych {report['rows_invalid']}, "
+        f"oznaczonych przez kontrolę jakości {report['rows_flagged']}, "
+        f"{report['duration']} s, {report['rows_per_second']} wierszy/s"
+    )
+    return 0
+
+
+def cmd_export_columnar(args) -> int:
+    """Eksport pomiarów do miesięcznych plików Parquet/Arrow (także z archiwum kolumnowego)"""
+    db_manager = DatabaseManager(args.db)
+    report = export_columnar(db_manager, ColdStore(db_manager), args.directory,
+                             file_format=args.format, days_back=args.days, overwrite=args.overwrite)
+    logger.info(
+        f"Eksport zakończony: {report['files_written']} plików ({report['files_skipped']} pominiętych), "
+        f"{report['rows']} wierszy"
+    )
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Zarządzanie bazą danych IMGW Weather")
+    parser.add_argument("--db", default=Config.DATABASE_PATH, help="Ścieżka do pliku bazy SQLite")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    migrate = commands.add_parser("migrate", help="Migracja danych do nowego schematu")
+    migrate.add_argument("--batch-size", type=int, default=5000,
+                         help="Liczba rekordów przenoszonych w jednej transakcji")
+    migrate.add_argument("--pause", type=float, default=0.05,
+                         help="Przerwa (s) między paczkami, aby nie blokować zapisu aplikacji")
+    migrate.set_defaults(handler=cmd_migrate)
+
+    rebuild = commands.add_parser("rebuild-latest", help="Odbudowa tabeli latest_observation")
+    rebuild.set_defaults(handler=cmd_rebuild_latest)
+
+    rollups = commands.add_parser("rebuild-rollups", help="Przeliczenie agregatów dziennych i miesięcznych")
+    rollups.set_defaults(handler=cmd_rebuild_rollups)
+
+    maintenance = commands.add_parser("maintenance", help="Retencja, archiwizacja, vacuum i backup")
+    maintenance.add_argument("--force-backup", action="store_true",
+                             help="Wykonaj backup nawet jeśli ostatni jest świeży")
+    maintenance.set_defaults(handler=cmd_maintenance)
+
+    backup = commands.add_parser("backup", help="Backup bazy danych (SQLite backup API)")
+    backup.set_defaults(handler=cmd_backup)
+
+    vacuum = commands.add_parser("vacuum", help="Pełny VACUUM i przełączenie na auto_vacuum INCREMENTAL")
+    vacuum.set_defaults(handler=cmd_vacuum)
+
+    import_stations = commands.add_parser("import-stations", help="Wczytanie współrzędnych stacji z pliku CSV")
+    import_stations.add_argument("file", nargs="?", default=Config.STATIONS_FILE)
+    import_stations.set_defaults(handler=cmd_import_stations)
+
+    backfill = commands.add_parser(
+        "backfill", help="Import historii z plików archiwum IMGW (ZIP/CSV)",
+        description="Import historii z plików archiwum IMGW (ZIP/CSV). Domyślnie indeks po czasie pomiaru "
+                    "jest usuwany na czas importu - zatrzymaj API albo użyj --keep-index."
+    )
+    backfill.add_argument("directory", help="Katalog z pobranymi plikami archiwum")
+    backfill.add_argument("--workers", type=int, default=None, help="Procesy parsujące (domyślnie liczba CPU)")
+    backfill.add_argument("--batch-size", type=int, default=100000, help="Wierszy na transakcję")
+    backfill.add_argument("--replace", action="store_true", help="Zastępuj istniejące pomiary danymi z archiwum")
+    backfill.add_argument("--format", choices=IMPORT_FORMATS, default="auto")
+    backfill.add_argument("--keep-index", action="store_true",
+                          help="Nie usuwaj indeksu po czasie pomiaru (import przy działającym API)")
+    backfill.set_defaults(handler=cmd_backfill)
+
+    export = commands.add_parser("export-columnar", help="Eksport do plików kolumnowych (miesiąc, blok na stację)")
+    export.add_argument("directory", help="Katalog docelowy")
+    export.add_argument("--format", choices=COLUMNAR_FORMATS, default="parquet")
+    export.add_argument("--days", type=int, default=None, help="Tylko ostatnie N dni (domyślnie wszystko)")
+    export.add_argument("--overwrite", action="store_true", help="Zapisz ponownie istniejące pliki miesięcy")
+    export.set_defaults(handler=cmd_export_columnar)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+# Metryki aplikacji w formacie tekstowym Prometheus (/metrics)
+# metrics.py
+#
+# Liczniki i histogramy trzymane są w pamięci procesu. Każdy wątek zapisuje do własnej kopii
+# (shard), więc pomiar w ścieżce zapytania nie wymaga blokady - /metrics sumuje kopie
+# wszystkich wątków. Przy wielu procesach API (uvicorn --workers N) każdy proces ma własne
+# metryki; odróżnia je etykieta `pid` w imgw_process_info.
+
+import bisect
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Granice przedziałów czasu (sekundy): od dziesiątek mikrosekund (odczyty SQLite) do pobierania z IMGW
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Starlette dopisuje "; charset=utf-8"
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Registry:
+    """Zbiór metryk procesu"""
+
+    def __init__(self):
+        self._metrics: List["_Metric"] = []
+
+    def register(self, metric: "_Metric"):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric(ABC):
+    """Wspólna część metryk; podklasy określają `kind` i format próbek"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 registry: Registry = REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[dict] = []
+        self._shards_lock = threading.Lock()
+        registry.register(self)
+
+    def _shard(self) -> dict:
+        """Kopia wartości bieżącego wątku (blokada tylko przy pierwszym użyciu w wątku)"""
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            return values
+
+    def _merged(self) -> Iterator[Tuple[tuple, object]]:
+        with self._shards_lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # list(dict.items()) wykonywane jest atomowo względem zapisów innych wątków
+            yield from list(shard.items())
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Wiersze próbek w formacie tekstowym Prometheus"""
+
+
+class Counter(_Metric):
+    """Licznik rosnący"""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> Dict[tuple, float]:
+        totals: Dict[tuple, float] = {}
+        for labels, value in self._merged():
+            totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def value(self, *labels: str) -> float:
+        return self.values().get(labels, 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_format_number(value)}"
+            for labels, value in sorted(self.values().items())
+        ]
+
+
+class Histogram(_Metric):
+    """Histogram wartości (domyślnie czasów w sekundach)"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, registry: Registry = REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labels: str):
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            # [liczności przedziałów (ostatni: +Inf), suma]
+            entry = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def values(self) -> Dict[tuple, Tuple[List[int], float]]:
+        totals: Dict[tuple, Tuple[List[int], float]] = {}
+        for labels, (counts, total) in self._merged():
+            merged = totals.get(labels)
+            if merged is None:
+                totals[labels] = (list(counts), total)
+            else:
+                totals[labels] = ([a + b for a, b in zip(merged[0], counts)], merged[1] + total)
+        return totals
+
+    def summary(self, *labels: str) -> dict:
+        """Liczba pomiarów, średnia i przybliżone percentyle (górne granice przedziałów)"""
+        counts, total = self.values().get(labels, ([0] * (len(self.buckets) + 1), 0.0))
+        count = sum(counts)
+        result = {"count": count, "mean": round(total / count, 6) if count else None}
+        for name, q in (("p50", 0.5), ("p99", 0.99)):
+            result[name] = None
+            if count:
+                cumulative = 0
+                for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += bucket
+                    if cumulative >= q * count:
+                        result[name] = bound if bound != float("inf") else None
+                        break
+        return result
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total) in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """Wartości odczytywane przy pobraniu /metrics z liczników prowadzonych przez komponenty"""
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Dict[tuple, float]],
+                 labelnames: Sequence[str] = (), kind: str = "gauge", registry: Registry = REGISTRY):
+        super().__init__(name, documentation, labelnames, registry)
+        self.kind = kind
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        return [
+            f"{self.name}{_labels(self.labelnames, labels)} {_format_number(value)}"
+            for labels, value in sorted(values.items()) if value is not None
+        ]
+
+
+def timed(histogram: Histogram, *labels: str):
+    """Dekorator: czas wykonania funkcji w histogramie"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, *labels)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """Middleware ASGI: czas obsługi i kody odpowiedzi według szablonu trasy
+
+    Etykietą jest szablon trasy FastAPI (np. /api/weather/historical), dla aplikacji
+    zamontowanych - ich prefiks, a dla nieznanych ścieżek "other" (ograniczona liczba serii).
+    Zapytania o ścieżki z `untimed` (strumienie bez końca) są tylko zliczane.
+    """
+
+    def __init__(self, app, untimed: Sequence[str] = ()):
+        self.app = app
+        self.untimed = tuple(untimed)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        started = time.perf_counter()
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Router uzupełnia scope o dopasowaną trasę (FastAPI) lub endpoint aplikacji zamontowanej
+            route = getattr(scope.get("route"), "path", None)
+            if route is None and "endpoint" in scope:
+                route = scope.get("root_path")
+            route = route or "other"
+            method = scope["method"]
+            HTTP_REQUESTS.inc(route, method, status)
+            if not path.startswith(self.untimed):
+                HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, route, method)
+
+
+def summary() -> dict:
+    """Skrót metryk dla /api/stats: zapytania według tras, operacje bazy, pobieranie, pamięci podręczne,
+    wartości oznaczone przez kontrolę jakości"""
+    requests = {
+        f"{method} {route}": HTTP_REQUEST_SECONDS.summary(route, method)
+        for route, method in sorted(HTTP_REQUEST_SECONDS.values())
+    }
+    statuses: Dict[str, float] = {}
+    for (_, _, status), count in HTTP_REQUESTS.values().items():
+        statuses[status] = statuses.get(status, 0) + count
+    caches: Dict[str, Dict[str, float]] = {}
+    for (cache, result), count in CACHE_REQUESTS.values().items():
+        caches.setdefault(cache, {})[result] = count
+    for counts in caches.values():
+        # not_modified (odpowiedzi 304) liczone są dodatkowo do trafień - nie wchodzą do mianownika
+        lookups = counts.get("hit", 0) + counts.get("partial", 0) + counts.get("miss", 0)
+        counts["hit_ratio"] = round(counts.get("hit", 0) / lookups, 4) if lookups else None
+    quality: Dict[str, Dict[str, float]] = {}
+    for (parameter, check), count in sorted(QC_FLAGGED_VALUES.values().items()):
+        quality.setdefault(check, {})[parameter] = count
+    return {
+        "requests": requests,
+        "responses_by_status": statuses,
+        "database": {
+            method: DB_QUERY_SECONDS.summary(method)
+            for (method,) in sorted(DB_QUERY_SECONDS.values())
+        },
+        "fetch": {
+            "duration": {status: FETCH_SECONDS.summary(status) for (status,) in sorted(FETCH_SECONDS.values())},
+            "records": {outcome: count for (outcome,), count in sorted(FETCH_RECORDS.values().items())}
+        },
+        "caches": caches,
+        "quality": quality
+    }
+
+
+# Metryki wspólne dla modułów aplikacji
+HTTP_REQUEST_SECONDS = Histogram(
+    "imgw_http_request_duration_seconds", "Czas obsługi zapytania HTTP", ("route", "method")
+)
+HTTP_REQUESTS = Counter(
+    "imgw_http_requests_total", "Zapytania HTTP według trasy i kodu odpowiedzi", ("route", "method", "status")
+)
+DB_QUERY_SECONDS = Histogram(
+    "imgw_db_query_duration_seconds", "Czas operacji DatabaseManager (SQLite)", ("method",)
+)
+FETCH_SECONDS = Histogram(
+    "imgw_fetch_duration_seconds", "Czas pobierania danych z API IMGW (z ponowieniami i zapisem)", ("result",)
+)
+FETCH_BYTES = Histogram(
+    "imgw_fetch_response_bytes", "Rozmiar odpowiedzi API IMGW", buckets=SIZE_BUCKETS
+)
+FETCH_RECORDS = Counter(
+    "imgw_fetch_records_total", "Rekordy pobrane z API IMGW według wyniku zapisu", ("result",)
+)
+SERIALIZATION_SECONDS = Histogram(
+    "imgw_serialization_duration_seconds", "Czas serializacji odpowiedzi", ("kind",)
+)
+CACHE_REQUESTS = Counter(
+    "imgw_cache_requests_total", "Odczyty pamięci podręcznych odpowiedzi", ("cache", "result")
+)
+QC_FLAGGED_VALUES = Counter(
+    "imgw_qc_flagged_values_total", "Wartości oznaczone przez kontrolę jakości przy zapisie", ("parameter", "check")
+)
+PROCESS_INFO = CallbackMetric(
+    "imgw_process_info", "Proces API, z którego pochodzą metryki",
+    lambda: {(str(os.getpid()),): 1}, ("pid",)
+)
+PROCESS_START_TIME = CallbackMetric(
+    "imgw_process_start_time_seconds", "Czas uruchomienia procesu (epoka)",
+    lambda start=time.time(): {(): start}
+)
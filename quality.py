@@ -0,0 +1,197 @@
+# Kontrola jakości pomiarów przed zapisem do bazy (NumPy)
+# quality.py
+#
+# Wiersze (id_stacji, observed_at, *pomiary) sprawdzane są całą paczką naraz:
+#   zakres - wartość spoza Constants.PARAMETER_LIMITS jest niemożliwa fizycznie,
+#            zapisywana jest jako NULL (nie trafia do agregatów ani analiz)
+#   skok   - zmiana względem poprzedniego pomiaru stacji większa niż Constants.SPIKE_LIMITS
+#            na godzinę (przy przerwie do SPIKE_MAX_GAP_HOURS godzin); wartość zostaje
+# Wynik zapisywany jest w weather_data.qc_flags jako maska bitów: bit i oznacza zakres,
+# a bit QC_SPIKE_SHIFT + i skok parametru i (kolejność MEASUREMENT_COLUMNS); 0 - bez zastrzeżeń.
+# Dane historyczne i eksport z qc=clean pomijają oznaczone wiersze. Agregaty (rollup_*) i analizy
+# (SeriesStore) obejmują wartości ze skokiem - zostały zapisane jako zmierzone - a nie obejmują
+# wartości spoza zakresu, bo te są zapisane jako NULL.
+#
+# Poprzednie pomiary stacji pochodzą z pamięci ostatnich wartości - jedno zapytanie przy
+# pierwszym użyciu, potem aktualizowana przy każdej paczce, bez odczytu bazy dla wiersza.
+# Przy remember=False paczka trafia do pamięci dopiero po commit() - pobieranie z API woła
+# je po udanym zapisie, więc paczka odrzucona przez bazę nie staje się "poprzednim pomiarem".
+
+import logging
+import threading
+from operator import add, itemgetter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import Constants
+from database import MEASUREMENT_COLUMNS, DatabaseManager
+from metrics import QC_FLAGGED_VALUES
+
+logger = logging.getLogger(__name__)
+
+QC_CHECKS = ("range", "spike")
+# Filtr odczytu danych historycznych: wszystkie wiersze albo tylko bez oznaczeń (qc_flags = 0)
+QC_FILTERS = ("all", "clean")
+QC_SPIKE_SHIFT = len(MEASUREMENT_COLUMNS)
+
+_BITS = np.int64(1) << np.arange(len(MEASUREMENT_COLUMNS), dtype=np.int64)
+
+
+def describe_flags(flags: int) -> Dict[str, List[str]]:
+    """Maska qc_flags -> parametry oznaczone przez każdą kontrolę"""
+    return {
+        check: [
+            column for i, column in enumerate(MEASUREMENT_COLUMNS)
+            if flags >> (shift * QC_SPIKE_SHIFT + i) & 1
+        ]
+        for shift, check in enumerate(QC_CHECKS)
+    }
+
+
+class QualityControl:
+    """Kontrola zakresu i skoków dla paczek wierszy z pamięcią ostatnich wartości stacji
+
+    Dla każdej stacji pamiętane są dwa ostatnie pomiary (godzina, wartości) - ponowny zapis
+    tej samej godziny (poprawione dane IMGW) porównywany jest z pomiarem poprzedzającym.
+    """
+
+    def __init__(self, db_manager: Optional[DatabaseManager] = None,
+                 limits: Dict[str, dict] = Constants.PARAMETER_LIMITS,
+                 spike_limits: Dict[str, float] = Constants.SPIKE_LIMITS,
+                 max_gap_hours: int = Constants.SPIKE_MAX_GAP_HOURS):
+        self.db_manager = db_manager
+        nan = float("nan")
+        self.low = np.array([limits.get(column, {}).get("min", -np.inf) for column in MEASUREMENT_COLUMNS])
+        self.high = np.array([limits.get(column, {}).get("max", np.inf) for column in MEASUREMENT_COLUMNS])
+        # NaN - parametr bez kontroli skoków (porównanie z NaN zawsze fałszywe)
+        self.spike_limits = np.array([spike_limits.get(column, nan) for column in MEASUREMENT_COLUMNS])
+        self.max_gap_hours = max_gap_hours
+        self._lock = threading.Lock()
+        # id_stacji -> ((godzina, wartości), (godzina, wartości) poprzedniego pomiaru)
+        self._last: Dict[str, Tuple[tuple, tuple]] = {}
+        # Ostatnie pomiary paczki sprawdzonej z remember=False (czekają na commit)
+        self._pending: List[Tuple[str, int, tuple]] = []
+        self._loaded = db_manager is None
+
+    def _load(self):
+        """Ostatnie pomiary stacji z bazy - jedno zapytanie po indeksie czasu"""
+        with self.db_manager.pool.reader() as conn:
+            rows = conn.execute(f'''
+                SELECT id_stacji, observed_at, {", ".join(MEASUREMENT_COLUMNS)}
+                FROM weather_data
+                WHERE observed_at >= (SELECT MAX(observed_at) FROM latest_observation) - ?
+                ORDER BY id_stacji, observed_at
+            ''', (self.max_gap_hours,)).fetchall()
+        for row in rows:
+            self._remember(row[0], row[1], tuple(np.nan if value is None else value for value in row[2:]))
+        logger.info(f"Kontrola jakości: wczytano ostatnie pomiary {len(self._last)} stacji")
+
+    def _remember(self, station_id: str, hour: int, values: tuple):
+        entry = self._last.get(station_id)
+        if entry is None:
+            self._last[station_id] = ((hour, values), (-1, None))
+        elif hour > entry[0][0]:
+            self._last[station_id] = ((hour, values), entry[0])
+        elif hour == entry[0][0]:
+            self._last[station_id] = ((hour, values), entry[1])
+
+    def check(self, rows: List[tuple], remember: bool = True) -> List[tuple]:
+        """Zwraca wiersze z maską qc_flags na końcu; wartości spoza zakresu zastąpione przez None
+
+        Przy remember=False ostatnie pomiary paczki zapamiętywane są dopiero przez commit().
+        """
+        if not rows:
+            return []
+        with self._lock:
+            if not self._loaded:
+                self._load()
+                self._loaded = True
+            result, last = self._check(rows)
+            if remember:
+                self._pending = []
+                for station_id, hour, values in last:
+                    self._remember(station_id, hour, values)
+            else:
+                self._pending = last
+            return result
+
+    def commit(self):
+        """Zapamiętuje ostatnie pomiary paczki sprawdzonej z remember=False (po udanym zapisie)"""
+        with self._lock:
+            for station_id, hour, values in self._pending:
+                self._remember(station_id, hour, values)
+            self._pending = []
+
+    def _check(self, rows: List[tuple]) -> Tuple[List[tuple], List[Tuple[str, int, tuple]]]:
+        count = len(rows)
+        # Kolumna po kolumnie przez map/fromiter - bez pętli w Pythonie po wierszach
+        ids = list(map(itemgetter(0), rows))
+        station_ids = list(dict.fromkeys(ids))
+        index = {station_id: code for code, station_id in enumerate(station_ids)}
+        codes = np.fromiter(map(index.__getitem__, ids), dtype=np.int64, count=count)
+        hours = np.fromiter(map(itemgetter(1), rows), dtype=np.int64, count=count)
+        # None -> NaN; porównania z NaN są fałszywe, więc brak pomiaru nie jest oznaczany
+        values = np.empty((count, len(MEASUREMENT_COLUMNS)))
+        for i in range(len(MEASUREMENT_COLUMNS)):
+            values[:, i] = np.fromiter(map(itemgetter(2 + i), rows), dtype=np.float64, count=count)
+
+        with np.errstate(invalid="ignore"):
+            out_of_range = (values < self.low) | (values > self.high)
+        values[out_of_range] = np.nan
+
+        # Poprzedni pomiar: wcześniejszy wiersz tej samej stacji w paczce, dla pierwszego - pamięć
+        order = np.lexsort((hours, codes))
+        codes, hours, values = codes[order], hours[order], values[order]
+        first = np.ones(count, dtype=bool)
+        first[1:] = codes[1:] != codes[:-1]
+        previous_hours = np.empty(count, dtype=np.int64)
+        previous_hours[1:] = hours[:-1]
+        previous_values = np.empty_like(values)
+        previous_values[1:] = values[:-1]
+
+        cached_hours = np.full((2, len(station_ids)), -1, dtype=np.int64)
+        cached_values = np.full((2, len(station_ids), len(MEASUREMENT_COLUMNS)), np.nan)
+        for code, station_id in enumerate(station_ids):
+            for level, (hour, cached) in enumerate(self._last.get(station_id, ())):
+                if cached is not None:
+                    cached_hours[level, code] = hour
+                    cached_values[level, code] = cached
+        first_codes = codes[first]
+        # Ta sama godzina co ostatni zapamiętany pomiar - porównanie z pomiarem przed nim
+        level = (hours[first] == cached_hours[0, first_codes]).astype(np.int64)
+        previous_hours[first] = cached_hours[level, first_codes]
+        previous_values[first] = cached_values[level, first_codes]
+
+        gaps = hours - previous_hours
+        comparable = (previous_hours >= 0) & (gaps > 0) & (gaps <= self.max_gap_hours)
+        with np.errstate(invalid="ignore"):
+            spikes = np.abs(values - previous_values) > self.spike_limits * gaps[:, None]
+        spikes &= comparable[:, None]
+
+        flags = np.empty(count, dtype=np.int64)
+        flags[order] = (spikes @ _BITS) << QC_SPIKE_SHIFT
+        flags |= out_of_range @ _BITS
+
+        last = np.ones(count, dtype=bool)
+        last[:-1] = codes[1:] != codes[:-1]
+        last_values = [
+            (station_ids[code], hour, tuple(row_values))
+            for code, hour, row_values in zip(codes[last].tolist(), hours[last].tolist(), values[last].tolist())
+        ]
+
+        for i, column in enumerate(MEASUREMENT_COLUMNS):
+            for check, mask in (("range", out_of_range), ("spike", spikes)):
+                flagged = int(np.count_nonzero(mask[:, i]))
+                if flagged:
+                    QC_FLAGGED_VALUES.inc(column, check, amount=flagged)
+
+        result = list(map(add, rows, zip(flags.tolist())))
+        for position in np.flatnonzero(out_of_range.any(axis=1)).tolist():
+            row = rows[position]
+            result[position] = (
+                row[0], row[1],
+                *(None if bad else value for value, bad in zip(row[2:], out_of_range[position].tolist())),
+                flags[position].item()
+            )
+        return result, last_values
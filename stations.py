@@ -0,0 +1,233 @@
+# Metadane stacji i indeks przestrzenny
+# stations.py
+#
+# Współrzędne stacji synoptycznych pochodzą z dołączonego pliku stacje.csv
+# (Config.STATIONS_FILE), wczytywanego do tabeli stations przez proces pobierający dane
+# (lider, ingest.py) albo manage.py import-stations. Indeks - siatka komórek o boku
+# `cell_size` stopni - trzymany jest w pamięci każdego procesu API (tylko odczyt tabeli)
+# i odbudowywany po zmianie tabeli. Długość geograficzna nie jest zawijana na 180°
+# (sieć krajowa).
+
+import csv
+import heapq
+import logging
+import math
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from config import Config
+from database import DatabaseManager, parse_value
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0088
+
+
+class Station(NamedTuple):
+    id_stacji: str
+    stacja: str
+    lat: float
+    lon: float
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Odległość po powierzchni Ziemi w kilometrach"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((phi2 - phi1) / 2) ** 2
+         + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def read_station_file(path: str) -> List[Station]:
+    """Wczytuje plik CSV z kolumnami id_stacji, stacja, lat, lon; pomija błędne wiersze"""
+    stations = []
+    with open(path, encoding="utf-8", newline="") as file:
+        for line, row in enumerate(csv.DictReader(file), start=2):
+            try:
+                lat, lon = float(row["lat"]), float(row["lon"])
+                if not row["id_stacji"] or not -90 <= lat <= 90 or not -180 <= lon <= 180:
+                    raise ValueError("niepoprawny identyfikator lub współrzędne")
+                stations.append(Station(row["id_stacji"].strip(), row["stacja"].strip(), lat, lon))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"Pominięto wiersz {line} pliku {path}: {str(e)}")
+    return stations
+
+
+def import_station_file(db_manager: DatabaseManager, path: str) -> int:
+    """Wczytuje współrzędne stacji z pliku CSV do bazy; zwraca liczbę zmienionych stacji"""
+    try:
+        changed = db_manager.upsert_station_coordinates(read_station_file(path))
+        if changed:
+            logger.info(f"Zaktualizowano współrzędne {changed} stacji z pliku {path}")
+        return changed
+    except OSError as e:
+        logger.error(f"Błąd podczas wczytywania pliku stacji {path}: {str(e)}")
+        return 0
+
+
+def idw(distances: Sequence[float], values: Sequence[float], power: float = 2.0) -> float:
+    """Interpolacja odwrotnych odległości; punkt pokrywający się ze stacją przyjmuje jej wartość"""
+    weights = []
+    for distance, value in zip(distances, values):
+        if distance < 1e-6:
+            return value
+        weights.append(distance ** -power)
+    return sum(weight * value for weight, value in zip(weights, values)) / sum(weights)
+
+
+class StationIndex:
+    """Siatka regularna: zapytania o prostokąt mapy i k najbliższych stacji"""
+
+    def __init__(self, stations: Sequence[Station], cell_size: float = 1.0):
+        self.cell_size = cell_size
+        self.stations: Tuple[Station, ...] = tuple(sorted(stations, key=lambda station: station.id_stacji))
+        self._by_id = {station.id_stacji: station for station in self.stations}
+        self._grid: Dict[Tuple[int, int], List[Station]] = {}
+        for station in self.stations:
+            self._grid.setdefault(self._cell(station.lat, station.lon), []).append(station)
+        if self._grid:
+            rows = [cell[0] for cell in self._grid]
+            columns = [cell[1] for cell in self._grid]
+            self._extent = (min(rows), max(rows), min(columns), max(columns))
+            # Dolne ograniczenie odległości w kierunku wschód-zachód zależy od najdalszej od równika stacji
+            self._cos_max_lat = math.cos(math.radians(max(abs(station.lat) for station in self.stations)))
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def get(self, station_id: str) -> Optional[Station]:
+        return self._by_id.get(station_id)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return math.floor(lat / self.cell_size), math.floor(lon / self.cell_size)
+
+    def within(self, min_lat: float, min_lon: float, max_lat: float, max_lon: float) -> List[Station]:
+        """Stacje w prostokącie (np. widoku mapy)"""
+        if not self._grid:
+            return []
+        row_min, row_max, column_min, column_max = self._extent
+        low_row, low_column = self._cell(min_lat, min_lon)
+        high_row, high_column = self._cell(max_lat, max_lon)
+        result = []
+        for row in range(max(low_row, row_min), min(high_row, row_max) + 1):
+            for column in range(max(low_column, column_min), min(high_column, column_max) + 1):
+                for station in self._grid.get((row, column), ()):
+                    if min_lat <= station.lat <= max_lat and min_lon <= station.lon <= max_lon:
+                        result.append(station)
+        result.sort(key=lambda station: station.id_stacji)
+        return result
+
+    def _ring(self, row: int, column: int, radius: int):
+        """Komórki w odległości (Czebyszewa) dokładnie `radius` od komórki punktu, w granicach siatki"""
+        row_min, row_max, column_min, column_max = self._extent
+        for current in range(max(row - radius, row_min), min(row + radius, row_max) + 1):
+            if abs(current - row) == radius:
+                for other in range(max(column - radius, column_min), min(column + radius, column_max) + 1):
+                    yield current, other
+            else:
+                for other in (column - radius, column + radius):
+                    if column_min <= other <= column_max:
+                        yield current, other
+
+    def _unsearched_bound(self, lat: float, lon: float, row: int, column: int, radius: int) -> float:
+        """Najmniejsza możliwa odległość (km) do stacji poza przeszukanym kwadratem komórek"""
+        size = self.cell_size
+        dlat = min(lat - (row - radius) * size, (row + radius + 1) * size - lat)
+        dlon = min(lon - (column - radius) * size, (column + radius + 1) * size - lon, 180.0)
+        lat_bound = math.radians(dlat)
+        lon_bound = 2 * math.asin(min(1.0, math.sqrt(
+            math.cos(math.radians(lat)) * self._cos_max_lat * math.sin(math.radians(dlon) / 2) ** 2
+        )))
+        return EARTH_RADIUS_KM * min(lat_bound, lon_bound)
+
+    def nearest(self, lat: float, lon: float, k: int = 1,
+                accept: Optional[Callable[[Station], bool]] = None) -> List[Tuple[Station, float]]:
+        """k najbliższych stacji (spełniających `accept`) z odległością w km, od najbliższej
+
+        Przeszukiwanie pierścieniami komórek wokół punktu kończy się, gdy k-ta znaleziona
+        stacja jest bliżej niż jakakolwiek stacja poza przeszukanym obszarem.
+        """
+        if not self._grid or k < 1:
+            return []
+        row, column = self._cell(lat, lon)
+        row_min, row_max, column_min, column_max = self._extent
+        max_radius = max(row - row_min, row_max - row, column - column_min, column_max - column, 0)
+        best: List[Tuple[float, str, Station]] = []  # kopiec z ujemną odległością (największa na szczycie)
+        for radius in range(max_radius + 1):
+            for cell in self._ring(row, column, radius):
+                for station in self._grid.get(cell, ()):
+                    if accept is not None and not accept(station):
+                        continue
+                    distance = haversine_km(lat, lon, station.lat, station.lon)
+                    if len(best) < k:
+                        heapq.heappush(best, (-distance, station.id_stacji, station))
+                    elif distance < -best[0][0]:
+                        heapq.heapreplace(best, (-distance, station.id_stacji, station))
+            if len(best) == k and -best[0][0] <= self._unsearched_bound(lat, lon, row, column, radius):
+                break
+        return [(station, -distance) for distance, _, station in sorted(best, reverse=True)]
+
+
+class StationDirectory:
+    """Metadane stacji z bazy danych z indeksem przestrzennym w pamięci
+
+    Tabela stations jest sprawdzana nie częściej niż co `check_interval` sekund; indeks
+    przebudowywany jest tylko wtedy, gdy jej zawartość się zmieniła.
+    """
+
+    def __init__(self, db_manager: DatabaseManager,
+                 check_interval: float = Config.CHANGE_POLL_INTERVAL,
+                 cell_size: float = 1.0):
+        self.db_manager = db_manager
+        self.check_interval = check_interval
+        self.cell_size = cell_size
+        self._lock = threading.Lock()
+        self._rows: Optional[list] = None
+        self._index = StationIndex([], cell_size)
+        self._checked_at = 0.0
+        self.rebuilds = 0
+
+    def index(self) -> StationIndex:
+        """Aktualny indeks stacji ze współrzędnymi"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._checked_at < self.check_interval:
+                return self._index
+            self._checked_at = now
+        rows = self.db_manager.get_stations()
+        with self._lock:
+            if rows != self._rows:
+                located = [Station(*row) for row in rows if row[2] is not None and row[3] is not None]
+                if len(located) < len(rows):
+                    logger.info(f"{len(rows) - len(located)} stacji nie ma współrzędnych (brak w pliku stacji)")
+                self._index = StationIndex(located, self.cell_size)
+                self._rows = rows
+                self.rebuilds += 1
+            return self._index
+
+    def interpolate(self, lat: float, lon: float, parameter: str, k: int = 6,
+                    power: float = 2.0) -> Tuple[Optional[float], List[Tuple[Station, float, float]]]:
+        """Wartość parametru w punkcie (IDW z k najbliższych stacji z aktualnym pomiarem)
+
+        Zwraca wartość i listę (stacja, odległość km, wartość) użytych stacji.
+        """
+        latest = {}
+        for record in self.db_manager.get_latest_data(limit=len(self.index()) + 1000):
+            value = parse_value(record.get(parameter))
+            if value is not None:
+                latest[record["id_stacji"]] = value
+        neighbours = self.index().nearest(lat, lon, k, accept=lambda station: station.id_stacji in latest)
+        if not neighbours:
+            return None, []
+        used = [(station, distance, latest[station.id_stacji]) for station, distance in neighbours]
+        value = idw([distance for _, distance, _ in used], [value for _, _, value in used], power)
+        return value, used
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "stations": len(self._index),
+                "without_coordinates": len(self._rows) - len(self._index) if self._rows is not None else None,
+                "index_rebuilds": self.rebuilds
+            }
@@ -0,0 +1,61 @@
+# Wspólne przygotowanie testów: ścieżki modułów, baza tymczasowa i zamiennik API IMGW
+# tests/conftest.py
+
+import importlib.util
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Moduły aplikacji oraz imgw_stub i common z katalogu benchmarków
+sys.path[:0] = [REPO_DIR, os.path.join(REPO_DIR, "benchmarks")]
+
+from config import Config  # noqa: E402
+from database import DatabaseManager  # noqa: E402
+from imgw_stub import StubState, start_stub  # noqa: E402
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "weather_data.db"))
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def imgw_stub():
+    """Uruchamia serwer zastępczy IMGW: imgw_stub(StubState(...)) -> adres URL endpointu synop"""
+    servers = []
+
+    def start(state: StubState) -> str:
+        server, url = start_stub(state)
+        servers.append(server)
+        return url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def load_app(tmp_path, monkeypatch):
+    """Wczytuje backend-main.py z bazą w katalogu tymczasowym: load_app(INGEST_MODE=...) -> moduł"""
+    counter = iter(range(1000))
+
+    def load(**settings):
+        # Plik logu tworzony jest w katalogu bieżącym
+        monkeypatch.chdir(tmp_path)
+        settings.setdefault("DATABASE_PATH", str(tmp_path / "weather_data.db"))
+        settings.setdefault("STATIONS_FILE", "")
+        for name, value in settings.items():
+            monkeypatch.setattr(Config, name, value)
+        spec = importlib.util.spec_from_file_location(
+            f"backend_main_{next(counter)}", os.path.join(REPO_DIR, "backend-main.py")
+        )
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
+    return load
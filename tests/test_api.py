@@ -0,0 +1,52 @@
+# Testy endpointów HTTP (aplikacja w procesie, baza w katalogu tymczasowym)
+# tests/test_api.py
+
+import time
+
+from fastapi.testclient import TestClient
+
+from common import synthetic_records
+from database import DatabaseManager
+
+
+def wait_for_status(client: TestClient, status: str, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while True:
+        body = client.get("/api/health").json()
+        if body["status"] == status or time.monotonic() > deadline:
+            return body
+        time.sleep(0.02)
+
+
+def test_health_reports_warming_up_until_leader_prepares_database(load_app, tmp_path):
+    # Tryb external - schemat tworzy dopiero osobny proces pobierania (tu: DatabaseManager do zapisu)
+    module = load_app(INGEST_MODE="external", STARTUP_WARMUP=False, CHANGE_POLL_INTERVAL=0.02)
+    with TestClient(module.app) as client:
+        body = client.get("/api/health").json()
+        assert body["status"] == "warming_up"
+        assert body["timestamp"].endswith("+00:00")
+
+        leader = DatabaseManager(module.DATABASE_PATH)
+        try:
+            assert wait_for_status(client, "healthy")["status"] == "healthy"
+        finally:
+            leader.close()
+
+
+def test_gzip_and_identity_responses_have_distinct_etags(load_app, db_manager):
+    db_manager.insert_weather_data(list(synthetic_records(3, hours=1)))
+    module = load_app(INGEST_MODE="external", CHANGE_POLL_INTERVAL=0.02)
+    with TestClient(module.app) as client:
+        wait_for_status(client, "healthy")
+        identity = client.get("/api/weather/current", headers={"Accept-Encoding": "identity"})
+        compressed = client.get("/api/weather/current", headers={"Accept-Encoding": "gzip"})
+        assert identity.status_code == compressed.status_code == 200
+        assert compressed.headers["Content-Encoding"] == "gzip"
+        assert identity.headers["ETag"] != compressed.headers["ETag"]
+        assert compressed.json() == identity.json()
+
+        # Każdy z walidatorów (także słaby W/) daje 304 niezależnie od wybranej reprezentacji
+        for etag in (identity.headers["ETag"], compressed.headers["ETag"], f"W/{compressed.headers['ETag']}"):
+            response = client.get("/api/weather/current",
+                                  headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+            assert response.status_code == 304
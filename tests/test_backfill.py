@@ -0,0 +1,47 @@
+# Testy importu historii z plików archiwum
+# tests/test_backfill.py
+
+from backfill import BackfillImporter, find_sources
+from database import OBSERVED_AT_INDEX
+
+HEADER = "id_stacji,stacja,data_pomiaru,godzina_pomiaru,temperatura\n"
+
+
+def write_csv(path, station_id: str, day: str):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"{HEADER}{station_id},Stacja,{day},12,1.5\n", encoding="utf-8")
+
+
+def has_observed_at_index(db_manager) -> bool:
+    with db_manager.pool.reader() as conn:
+        return conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (OBSERVED_AT_INDEX,)
+        ).fetchone() is not None
+
+
+def test_same_file_names_in_subdirectories_are_imported_separately(db_manager, tmp_path):
+    directory = tmp_path / "archiwum"
+    write_csv(directory / "2023" / "dane.csv", "12375", "2023-05-01")
+    write_csv(directory / "2024" / "dane.csv", "12375", "2024-05-01")
+
+    assert sorted(source.key for source in find_sources(str(directory))) == ["2023/dane.csv", "2024/dane.csv"]
+    report = BackfillImporter(db_manager, workers=1).run(str(directory))
+    assert report["files_imported"] == 2
+    assert report["rows_written"] == 2
+
+    # Ponowny import pomija oba pliki
+    report = BackfillImporter(db_manager, workers=1).run(str(directory))
+    assert report["files_imported"] == 0
+    assert report["files_skipped"] == 2
+
+
+def test_keep_index_leaves_observed_at_index_in_place(db_manager, tmp_path):
+    directory = tmp_path / "archiwum"
+    write_csv(directory / "dane.csv", "12375", "2024-05-01")
+    dropped = []
+    db_manager.drop_observed_at_index = lambda: dropped.append(True)
+
+    report = BackfillImporter(db_manager, workers=1, keep_index=True).run(str(directory))
+    assert report["rows_written"] == 1
+    assert dropped == []
+    assert has_observed_at_index(db_manager)
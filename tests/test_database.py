@@ -0,0 +1,53 @@
+# Testy DatabaseManager: procesy tylko do odczytu i przejęcie zapisu przez lidera
+# tests/test_database.py
+
+import sqlite3
+
+import pytest
+
+from database import DatabaseManager
+
+
+def table_names(manager: DatabaseManager) -> set:
+    with manager.pool.reader() as conn:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def test_read_only_manager_does_not_create_schema_or_write(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "weather_data.db"), read_only=True)
+    try:
+        assert table_names(manager) == set()
+        with pytest.raises(sqlite3.OperationalError):
+            with manager.pool.writer():
+                pass
+    finally:
+        manager.close()
+
+
+def test_open_for_writing_creates_schema(tmp_path):
+    manager = DatabaseManager(str(tmp_path / "weather_data.db"), read_only=True)
+    try:
+        manager.open_for_writing()
+        assert {"weather_data", "latest_observation", "data_version"} <= table_names(manager)
+        with manager.pool.writer() as conn:
+            conn.execute("INSERT INTO stations (id_stacji, stacja) VALUES ('12375', 'Warszawa')")
+    finally:
+        manager.close()
+
+
+def test_is_ready_after_leader_initialisation(tmp_path):
+    path = str(tmp_path / "weather_data.db")
+    follower = DatabaseManager(path, read_only=True)
+    try:
+        assert not follower.is_ready()
+        leader = DatabaseManager(path)
+        assert follower.is_ready()
+        # Baza starszej wersji (bez PRAGMA user_version) czeka na lidera
+        with leader.pool.writer() as conn:
+            conn.execute("PRAGMA user_version = 0")
+        assert not follower.is_ready()
+        leader.open_for_writing()
+        assert follower.is_ready()
+        leader.close()
+    finally:
+        follower.close()
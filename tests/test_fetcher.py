@@ -0,0 +1,90 @@
+# Testy WeatherDataFetcher z lokalnym zamiennikiem API IMGW (benchmarks/imgw_stub.py)
+# tests/test_fetcher.py
+
+import asyncio
+import time
+
+import pytest
+
+from fetcher import WeatherDataFetcher
+from imgw_stub import StubState
+
+STATIONS = 5
+
+
+def make_fetcher(db_manager, url: str, **options) -> WeatherDataFetcher:
+    options.setdefault("timeout", 2.0)
+    options.setdefault("max_retries", 2)
+    options.setdefault("retry_backoff", 0.01)
+    return WeatherDataFetcher(db_manager, api_url=url, min_refresh_interval=0, **options)
+
+
+def run(fetcher: WeatherDataFetcher, coroutine):
+    """Wykonuje scenariusz w nowej pętli i zamyka klienta HTTP przed jej końcem"""
+    async def scenario():
+        try:
+            return await coroutine
+        finally:
+            await fetcher.close()
+
+    return asyncio.run(scenario())
+
+
+def last_log_status(db_manager) -> str:
+    with db_manager.pool.reader() as conn:
+        return conn.execute("SELECT status FROM api_logs ORDER BY id DESC LIMIT 1").fetchone()[0]
+
+
+def test_slow_response_times_out_and_is_retried(db_manager, imgw_stub):
+    state = StubState(STATIONS, delay=1.0, slow_first=1)
+    fetcher = make_fetcher(db_manager, imgw_stub(state), timeout=0.2)
+
+    assert run(fetcher, fetcher.fetch_data_from_imgw()) is True
+    assert state.requests == 2
+    assert db_manager.count_records() == STATIONS
+
+
+@pytest.mark.parametrize("status", [429, 500, 503])
+def test_retryable_status_backs_off_then_fails_cleanly(db_manager, imgw_stub, status):
+    state = StubState(STATIONS, fail_first=100, fail_status=status)
+    fetcher = make_fetcher(db_manager, imgw_stub(state), max_retries=2, retry_backoff=0.05)
+
+    started = time.monotonic()
+    assert run(fetcher, fetcher.fetch_data_from_imgw()) is False
+    # Opóźnienia 0.05 s i 0.1 s przed kolejnymi próbami
+    assert time.monotonic() - started >= 0.15
+    assert state.requests == 3
+    assert last_log_status(db_manager) == "ERROR"
+    assert db_manager.count_records() == 0
+    # Po błędzie nie ma walidatorów - następne zapytanie nie będzie warunkowe
+    assert fetcher._etag is None
+
+
+def test_not_modified_keeps_data_and_skips_write(db_manager, imgw_stub):
+    state = StubState(STATIONS)
+    fetcher = make_fetcher(db_manager, imgw_stub(state))
+
+    async def scenario():
+        assert await fetcher.fetch_data_from_imgw() is True
+        version = db_manager.get_data_version()
+        assert await fetcher.fetch_data_from_imgw() is True
+        return version
+
+    version = run(fetcher, scenario())
+    assert state.not_modified == 1
+    assert db_manager.get_data_version() == version
+    assert db_manager.count_records() == STATIONS
+    assert last_log_status(db_manager) == "NOT_MODIFIED"
+
+
+def test_concurrent_refreshes_share_one_fetch(db_manager, imgw_stub):
+    state = StubState(STATIONS, delay=0.2)
+    fetcher = make_fetcher(db_manager, imgw_stub(state))
+
+    async def scenario():
+        return await asyncio.gather(*(fetcher.refresh() for _ in range(10)))
+
+    assert run(fetcher, scenario()) == [True] * 10
+    assert state.requests == 1
+    assert fetcher.fetch_count == 1
+    assert fetcher.coalesced_count == 9
@@ -0,0 +1,68 @@
+# Testy archiwizacji pomiarów starszych niż okres retencji
+# tests/test_maintenance.py
+
+import csv
+import glob
+import gzip
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from common import synthetic_records
+from maintenance import MaintenanceJob
+
+STATIONS = 3
+
+
+@pytest.fixture
+def old_rows(db_manager):
+    """Dwa dni pomiarów sprzed 30 dni i jeden dzień bieżących"""
+    old_end = datetime.now(timezone.utc) - timedelta(days=30)
+    db_manager.insert_weather_data(list(synthetic_records(STATIONS, hours=48, end=old_end)))
+    db_manager.insert_weather_data(list(synthetic_records(STATIONS, hours=24)))
+    return 48 * STATIONS
+
+
+def archived_rows(archive_dir: str) -> list:
+    rows = []
+    for path in sorted(glob.glob(os.path.join(archive_dir, "*.csv.gz"))):
+        with gzip.open(path, "rt", encoding="utf-8") as archive:
+            rows.extend(csv.DictReader(archive))
+    return rows
+
+
+def test_archiving_bumps_data_version(db_manager, old_rows, tmp_path):
+    job = MaintenanceJob(db_manager, retention_days=7, archive_dir=str(tmp_path / "archiwum"),
+                         backup_dir=str(tmp_path / "backupy"), batch_size=50)
+    generation, _ = db_manager.get_data_version()
+
+    assert job.archive_expired_rows() == old_rows
+    new_generation, _ = db_manager.get_data_version()
+    assert new_generation > generation
+    # Procesy API przeładują dane od pierwszej usuniętej godziny
+    assert 0 < db_manager.get_changed_from(generation) < int(datetime.now(timezone.utc).timestamp()) // 3600
+    assert db_manager.count_records() == 24 * STATIONS
+
+
+def test_archiving_is_idempotent_when_delete_fails(db_manager, old_rows, tmp_path):
+    archive_dir = str(tmp_path / "archiwum")
+    job = MaintenanceJob(db_manager, retention_days=7, archive_dir=archive_dir,
+                         backup_dir=str(tmp_path / "backupy"), batch_size=50)
+    with db_manager.pool.writer() as conn:
+        conn.execute('''
+            CREATE TRIGGER fail_delete BEFORE DELETE ON weather_data
+            BEGIN SELECT RAISE(ABORT, 'usuwanie zablokowane'); END
+        ''')
+    with pytest.raises(sqlite3.IntegrityError):
+        job.archive_expired_rows()
+
+    with db_manager.pool.writer() as conn:
+        conn.execute("DROP TRIGGER fail_delete")
+    assert job.archive_expired_rows() == old_rows
+
+    rows = archived_rows(archive_dir)
+    keys = [(row["id_stacji"], row["data_pomiaru"], row["godzina_pomiaru"]) for row in rows]
+    assert len(keys) == old_rows
+    assert len(set(keys)) == old_rows